@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Chunk Store Benchmark - pickled List[Chunk] vs columnar ChunkStore
+Compares disk size, save time, time to open and random row lookups, and checks
+that every chunk round-trips unchanged
+"""
+
+import argparse
+import pickle
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from modules.m3_rag_pipeline.chunker import Chunk
+from modules.m3_rag_pipeline.chunk_store import ChunkStore
+
+
+def generate_chunks(num_chunks: int, chunks_per_doc: int = 40, chars: int = 1500, seed: int = 0) -> list:
+    """Chunks shaped like DocumentChunker output: per-chunk copies of the paper's metadata."""
+    rng = random.Random(seed)
+    words = ["attention", "model", "gradient", "layer", "training", "loss", "token", "$x_i$", "Table", "3.2"]
+    chunks = []
+    for i in range(num_chunks):
+        doc_id = f"2401.{i // chunks_per_doc:05d}"
+        if i % chunks_per_doc == 0:
+            paper = {
+                "title": f"A Study of Method {i // chunks_per_doc} for Long-Context Language Modeling",
+                "authors": [f"Author {rng.randint(0, 999)}" for _ in range(8)],
+                "arxiv_id": doc_id
+            }
+        metadata = paper.copy()
+        text = " ".join(rng.choice(words) for _ in range(chars // 7))
+        chunks.append(Chunk(
+            chunk_id=f"{doc_id}_chunk_{i % chunks_per_doc}",
+            doc_id=doc_id,
+            text=text,
+            start_idx=i * 1000,
+            end_idx=i * 1000 + len(text),
+            metadata=metadata,
+            token_count=len(text) // 4
+        ))
+    return chunks
+
+
+def dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.iterdir())
+
+
+def heap_mb(open_fn) -> float:
+    """Python heap held by whatever `open_fn` returns (memory-mapped pages are not counted)."""
+    tracemalloc.start()
+    opened = open_fn()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del opened
+    return held / (1 << 20)
+
+
+def load_pickle(path: Path) -> list:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def load_store(path: Path) -> ChunkStore:
+    store = ChunkStore(path)
+    store.load()
+    return store
+
+
+def run(num_chunks: int, lookups: int):
+    """Time both formats and verify the round trip."""
+    chunks = generate_chunks(num_chunks)
+    rows = [random.randrange(num_chunks) for _ in range(lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+
+        pkl_path = tmp / "chunks.pkl"
+        start = time.perf_counter()
+        with open(pkl_path, "wb") as f:
+            pickle.dump(chunks, f)
+        pkl_save = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = load_pickle(pkl_path)
+        pkl_open = time.perf_counter() - start
+        start = time.perf_counter()
+        for row in rows:
+            loaded[row]
+        pkl_lookup = time.perf_counter() - start
+        del loaded
+
+        store_dir = tmp / "chunks"
+        start = time.perf_counter()
+        ChunkStore.from_chunks(chunks).save(store_dir)
+        store_save = time.perf_counter() - start
+        start = time.perf_counter()
+        store = load_store(store_dir)
+        store_open = time.perf_counter() - start
+        start = time.perf_counter()
+        for row in rows:
+            store[row]
+        store_lookup = time.perf_counter() - start
+
+        assert len(store) == len(chunks)
+        assert all(store[row] == chunks[row] for row in rows), "Chunks differ after the round trip"
+        assert list(store) == chunks, "Chunks differ after the round trip"
+
+        pkl_mb = pkl_path.stat().st_size / (1 << 20)
+        store_mb = dir_size(store_dir) / (1 << 20)
+        pkl_heap = heap_mb(lambda: load_pickle(pkl_path))
+        store_heap = heap_mb(lambda: load_store(store_dir))
+
+    print(f"\n{'format':>8} {'disk MB':>9} {'heap MB':>9} {'save s':>8} {'open s':>8} {'us/lookup':>10}")
+    print(f"{'pickle':>8} {pkl_mb:>9.1f} {pkl_heap:>9.1f} {pkl_save:>8.2f} {pkl_open:>8.2f} "
+          f"{1e6 * pkl_lookup / lookups:>10.2f}")
+    print(f"{'store':>8} {store_mb:>9.1f} {store_heap:>9.1f} {store_save:>8.2f} {store_open:>8.3f} "
+          f"{1e6 * store_lookup / lookups:>10.2f}")
+    print(f"\n{num_chunks} chunks identical after the round trip; store opens "
+          f"{pkl_open / store_open:.0f}x faster holding {pkl_heap / max(store_heap, 1e-3):.0f}x less heap")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk store benchmark")
+    parser.add_argument("--chunks", type=int, default=200000, help="Number of chunks")
+    parser.add_argument("--lookups", type=int, default=100000, help="Random row lookups timed")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    run(args.chunks, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
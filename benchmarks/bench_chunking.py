@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Chunking Benchmark - sliding-window parity and character vs tokenizer-aware chunking
+Checks the span-based chunker against the original list-based one on random documents,
+then times both chunking modes on a synthetic math-heavy corpus and checks that every
+token-aware chunk fits the embedding model's window with an exact token_count
+"""
+
+import argparse
+import random
+import re
+import time
+from pathlib import Path
+
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import get_config
+from modules.m3_rag_pipeline.chunker import DocumentChunker
+
+PROSE = ("we propose a method for training language models with attention over long "
+         "contexts and evaluate it on several benchmarks showing consistent gains").split()
+MATH = ["$\\alpha_{t+1} = \\alpha_t - \\eta \\nabla L(\\theta)$", "x^{(i)}_j", "\\sum_{k=1}^{K}",
+        "O(n \\log n)", "p(y|x;\\theta)", "||W||_2 \\leq 1", "f: \\mathbb{R}^d \\to \\mathbb{R}",
+        "softmax(QK^T/\\sqrt{d_k})V", "1e-4", "(3.2)", "[17]", "Eq.~(4)"]
+
+
+SECTIONS = ["Abstract", "1 Introduction", "2 Related Work", "3 Method", "4 Results", "5 Discussion",
+            "6 Conclusion", "References"]
+
+
+def generate_corpus(num_docs: int, sentences: int, math_ratio: float = 0.3, seed: int = 0) -> list:
+    """Paper-like texts where `math_ratio` of the tokens are LaTeX fragments, under section headers."""
+    rng = random.Random(seed)
+    docs = []
+    for i in range(num_docs):
+        parts = []
+        for j in range(sentences):
+            if j % (sentences // len(SECTIONS) or 1) == 0:
+                parts.append("\n" + SECTIONS[min(j * len(SECTIONS) // sentences, len(SECTIONS) - 1)] + "\n")
+            n = rng.randint(8, 40)
+            words = [rng.choice(MATH) if rng.random() < math_ratio else rng.choice(PROSE) for _ in range(n)]
+            parts.append(" ".join(words).capitalize() + rng.choice([".", ".", "?", "!"]))
+        docs.append({"arxiv_id": f"bench.{i:05d}", "full_text": " ".join(parts)})
+    return docs
+
+
+def legacy_chunk_document(chunker: DocumentChunker, doc_id: str, text: str) -> list:
+    """The original chunker: overlap rebuilt with list.insert(0, ...), offsets from joined lengths."""
+    chunks = []
+    char_chunk_size = chunker.chunk_size * 4
+    char_overlap = chunker.chunk_overlap * 4
+    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+
+    current_chunk = []
+    current_length = 0
+    for sentence in sentences:
+        if current_length + len(sentence) > char_chunk_size and current_chunk:
+            chunk_text = ' '.join(current_chunk)
+            if len(chunk_text) >= chunker.min_chunk_length:
+                chunks.append((f"{doc_id}_chunk_{len(chunks)}", chunk_text, len(chunk_text) // 4))
+            overlap_chars = 0
+            overlap_sentences = []
+            for s in reversed(current_chunk):
+                if overlap_chars + len(s) < char_overlap:
+                    overlap_sentences.insert(0, s)
+                    overlap_chars += len(s)
+                else:
+                    break
+            current_chunk = overlap_sentences
+            current_length = overlap_chars
+        current_chunk.append(sentence)
+        current_length += len(sentence)
+
+    if current_chunk:
+        chunk_text = ' '.join(current_chunk)
+        if len(chunk_text) >= chunker.min_chunk_length:
+            chunks.append((f"{doc_id}_chunk_{len(chunks)}", chunk_text, len(chunk_text) // 4))
+    return chunks
+
+
+def legacy_chunk_by_sections(chunker: DocumentChunker, doc_id: str, text: str) -> list:
+    """The original section chunker: a regex split over the whole text, sub-chunk ids rewritten."""
+    chunks = []
+    section_pattern = r'\n(?=(?:\d+\.?\s+)?(?:Abstract|Introduction|Related Work|Background|Method|Results|Discussion|Conclusion|References))'
+    for idx, section in enumerate(re.split(section_pattern, text, flags=re.IGNORECASE)):
+        section = section.strip()
+        if len(section) < chunker.min_chunk_length:
+            continue
+        section_title = section.split('\n')[0][:100]
+        if len(section) > chunker.chunk_size * 4:
+            for i, (_, chunk_text, tokens) in enumerate(legacy_chunk_document(chunker, doc_id, section)):
+                chunks.append((f"{doc_id}_sec{idx}_chunk_{i}", chunk_text, tokens, section_title, section))
+        else:
+            chunks.append((f"{doc_id}_sec{idx}", section, len(section) // 4, section_title, section))
+    return chunks
+
+
+HEADERS = ["\nAbstract\n", "\n1 Introduction\n", "\n2. Related Work ", "\nmethods\n", "\n3.\tResults",
+           "\nDiscussion.", "\nCONCLUSION\n", "\nReferences\n[1] "]
+
+
+def random_text(rng: random.Random, headers: bool = False) -> str:
+    """Short sentences with irregular whitespace and punctuation, optionally with section headers."""
+    words = ["a", "bb", "method.", "results!", "why?", "e.g.", "x" * 40, "...", "?!", "3.2", "\u00e9t\u00e9."]
+    spaces = [" ", " ", "  ", "\n", "\n\n", "\t", "\u00a0", "\u3000"]
+    if headers:
+        spaces = spaces + HEADERS
+    parts = [rng.choice(spaces) if rng.random() < 0.2 else ""]
+    for _ in range(rng.randint(0, 400)):
+        parts.append(rng.choice(words))
+        parts.append(rng.choice(spaces))
+    return "".join(parts)
+
+
+def check_parity(trials: int, seed: int = 0):
+    """Same chunks as the original chunker, with offsets that point at the chunked text."""
+    rng = random.Random(seed)
+    config = get_config()
+    config.data.token_chunking = False
+    for trial in range(trials):
+        config.data.chunk_size = rng.randint(1, 64)
+        config.data.chunk_overlap = rng.randint(0, 48)
+        config.data.min_chunk_length = rng.choice([0, 20, 100])
+        chunker = DocumentChunker(config)
+        text = random_text(rng)
+
+        chunks = chunker.chunk_document("doc", text)
+        expected = legacy_chunk_document(chunker, "doc", text)
+        assert [(c.chunk_id, c.text, c.token_count) for c in chunks] == expected, f"trial {trial}"
+        for c in chunks:
+            source = text[c.start_idx:c.end_idx]
+            assert source == source.strip() and source.split() == c.text.split(), f"trial {trial}"
+
+        text = random_text(rng, headers=True)
+        chunks = chunker.chunk_by_sections("doc", text)
+        expected = legacy_chunk_by_sections(chunker, "doc", text)
+        assert [(c.chunk_id, c.text, c.token_count, c.metadata["section"]) for c in chunks] == \
+            [e[:4] for e in expected], f"trial {trial}"
+        for c, e in zip(chunks, expected):
+            assert text[c.metadata["section_start"]:c.metadata["section_end"]] == e[4], f"trial {trial}"
+            source = text[c.start_idx:c.end_idx]
+            assert source == source.strip() and source.split() == c.text.split(), f"trial {trial}"
+
+    # Many short sentences per window made the original overlap rebuild quadratic
+    config.data.chunk_size, config.data.chunk_overlap, config.data.min_chunk_length = 8192, 8000, 100
+    chunker = DocumentChunker(config)
+    text = " ".join(f"S{i}." for i in range(50000))
+    start = time.perf_counter()
+    legacy = legacy_chunk_document(chunker, "doc", text)
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    chunks = chunker.chunk_document("doc", text)
+    window_time = time.perf_counter() - start
+    assert [(c.chunk_id, c.text, c.token_count) for c in chunks] == legacy
+
+    print(f"Parity: {trials} random documents chunked identically, plain and by sections, offsets exact")
+    print(f"50k short sentences, 32k-char windows: original {legacy_time:.2f}s, "
+          f"deque window {window_time:.2f}s ({legacy_time / window_time:.1f}x)")
+
+
+def check_workers(docs: list, workers: int):
+    """Process-pool chunk_batch: same chunks in the same order, and its throughput."""
+    config = get_config()
+    config.data.token_chunking = False
+    chunker = DocumentChunker(config)
+    sequential = chunker.chunk_batch(docs, workers=1)
+    sequential_stats = chunker.get_stats()
+    parallel = chunker.chunk_batch(docs, workers=workers)
+    parallel_stats = chunker.get_stats()
+    assert [(c.chunk_id, c.text, c.start_idx) for c in sequential] == \
+        [(c.chunk_id, c.text, c.start_idx) for c in parallel], "Parallel chunks differ"
+
+    print(f"\nchunk_batch: {sequential_stats['docs_per_sec']:.0f} docs/s sequential, "
+          f"{parallel_stats['docs_per_sec']:.0f} docs/s with {workers} workers (identical output)")
+
+
+def time_sections(docs: list, repeats: int):
+    """Section-aware chunking against plain chunking and the original section splitter."""
+    config = get_config()
+    config.data.chunk_size, config.data.chunk_overlap, config.data.min_chunk_length = 512, 50, 100
+    config.data.token_chunking = False
+    chunker = DocumentChunker(config)
+
+    def best(fn):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    plain = best(lambda: [chunker.chunk_doc(doc) for doc in docs])
+    sections = best(lambda: [chunker.chunk_doc(doc, by_sections=True) for doc in docs])
+    legacy = best(lambda: [legacy_chunk_by_sections(chunker, doc["arxiv_id"], doc["full_text"]) for doc in docs])
+    print(f"\nBy sections: {len(docs) / sections:.0f} docs/s vs {len(docs) / plain:.0f} docs/s plain "
+          f"({sections / plain:.2f}x the time) and {len(docs) / legacy:.0f} docs/s for the original splitter")
+
+
+def time_chunker(chunker: DocumentChunker, docs: list, repeats: int) -> tuple:
+    """Chunks plus the time of the first pass and of the best pass."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = [c for doc in docs for c in chunker.chunk_doc(doc)]
+        times.append(time.perf_counter() - start)
+    return chunks, times[0], min(times)
+
+
+def run(num_docs: int, sentences: int, tokenizer_name: str, repeats: int):
+    """Time both modes and verify token-aware chunks."""
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name, use_fast=True)
+    docs = generate_corpus(num_docs, sentences)
+
+    config = get_config()
+    config.data.chunk_size, config.data.chunk_overlap, config.data.min_chunk_length = 512, 50, 100
+    config.data.token_chunking = False
+    heuristic = DocumentChunker(config, tokenizer=tokenizer)
+    heuristic_chunks, _, heuristic_time = time_chunker(heuristic, docs, repeats)
+
+    config.data.token_chunking = True
+    token_aware = DocumentChunker(config, tokenizer=tokenizer)
+    # The first pass also fills the per-word token count cache
+    token_chunks, token_cold, token_time = time_chunker(token_aware, docs, repeats)
+
+    # Re-tokenize every chunk: counts must be exact and within the model window
+    budget = token_aware._token_budget()
+    true_counts = [len(ids) for ids in tokenizer(
+        [c.text for c in token_chunks], add_special_tokens=False
+    )["input_ids"]]
+    wrong = sum(c.token_count != n for c, n in zip(token_chunks, true_counts))
+    over = sum(n > budget for n in true_counts)
+    heuristic_over = sum(
+        len(ids) > budget
+        for ids in tokenizer([c.text for c in heuristic_chunks], add_special_tokens=False)["input_ids"]
+    )
+
+    print(f"\n{'mode':>10} {'seconds':>9} {'docs/s':>9} {'chunks':>8} {'over window':>12}")
+    print(f"{'heuristic':>10} {heuristic_time:>9.2f} {num_docs / heuristic_time:>9.1f} "
+          f"{len(heuristic_chunks):>8} {heuristic_over:>12}")
+    print(f"{'tokens':>10} {token_time:>9.2f} {num_docs / token_time:>9.1f} "
+          f"{len(token_chunks):>8} {over:>12}")
+    print(f"\nToken budget {budget}; token-aware is {token_time / heuristic_time:.2f}x the heuristic's time "
+          f"({token_cold / heuristic_time:.2f}x on the first, cold-cache pass); "
+          f"{wrong} chunks with an inexact token_count")
+    assert wrong == 0 and over == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking benchmark")
+    parser.add_argument("--trials", type=int, default=2000, help="Random documents for the parity check")
+    parser.add_argument("--docs", type=int, default=200, help="Number of documents")
+    parser.add_argument("--sentences", type=int, default=400, help="Sentences per document")
+    parser.add_argument("--tokenizer", default=get_config().model.embedding_model,
+                        help="Tokenizer name or path (default: the embedding model)")
+    parser.add_argument("--workers", type=int, default=1, help="Also compare a process-pool chunk_batch")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes per mode (best is reported)")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    check_parity(args.trials)
+    time_sections(generate_corpus(args.docs, args.sentences), args.repeats)
+    if args.workers > 1:
+        check_workers(generate_corpus(args.docs, args.sentences), args.workers)
+    run(args.docs, args.sentences, args.tokenizer, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
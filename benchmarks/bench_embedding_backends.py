@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Embedding Backend Benchmark - PyTorch vs ONNX Runtime (fp32 and int8) on CPU
+Embeds a sample of chunks and one-at-a-time queries with each backend in its own
+process, reporting chunks/s, queries/s and peak RSS, and checks that every ONNX
+embedding agrees with the PyTorch one to within --min-cosine
+"""
+
+import argparse
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import get_config
+from modules.m3_rag_pipeline import EmbeddingGenerator
+from bench_embedding_batching import sample_chunks
+
+BACKENDS = {
+    "torch": ("torch", False),
+    "onnx": ("onnx", False),
+    "onnx-int8": ("onnx", True)
+}
+
+
+def measure(variant: str, chunks: list, queries: list, threads: int) -> dict:
+    """Runs in a fresh process, so peak RSS is that of one backend."""
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    config = get_config()
+    config.model.embedding_backend, config.model.embedding_onnx_quantize = BACKENDS[variant]
+    config.model.embedding_threads = threads
+    config.model.embedding_cache = False  # Every text must reach the model
+    config.model.query_cache_size = 0
+
+    embedder = EmbeddingGenerator(config=config)
+    start = time.perf_counter()
+    embedder.load_model()
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunk_vectors = embedder.embed_batch(chunks, show_progress=False, normalize=True)
+    chunk_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    query_vectors = np.stack([embedder.embed_text(q, normalize=True) for q in queries])
+    query_s = time.perf_counter() - start
+
+    return {
+        "chunks": chunk_vectors, "queries": query_vectors,
+        "load_s": load_s, "chunk_s": chunk_s, "query_s": query_s,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    }
+
+
+def run(num_chunks: int, num_queries: int, variants: list, threads: int, min_cosine: float):
+    config = get_config()
+    chunks = sample_chunks(config, num_chunks, by_sections=False)
+    queries = [" ".join(chunk.split()[:12]) for chunk in chunks[:num_queries]]
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for variant in ["torch"] + [v for v in variants if v != "torch"]:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[variant] = pool.submit(measure, variant, chunks, queries, threads).result()
+
+    base = results["torch"]
+    print(f"\n{len(chunks)} chunks, {len(queries)} queries, threads: {threads or 'default'}")
+    print(f"\n{'backend':>10} {'load s':>7} {'chunks/s':>9} {'queries/s':>10} {'speedup':>8} "
+          f"{'RSS MB':>7} {'min cos':>8} {'mean cos':>9}")
+    failed = []
+    for variant, result in results.items():
+        # Rows are normalized, so the row-wise dot product is the cosine
+        cosines = np.concatenate([
+            np.sum(result["chunks"] * base["chunks"], axis=1),
+            np.sum(result["queries"] * base["queries"], axis=1)
+        ])
+        if cosines.min() < min_cosine:
+            failed.append(variant)
+        print(f"{variant:>10} {result['load_s']:>7.1f} {len(chunks) / result['chunk_s']:>9.1f} "
+              f"{len(queries) / result['query_s']:>10.1f} {base['query_s'] / result['query_s']:>7.2f}x "
+              f"{result['rss_mb']:>7.0f} {cosines.min():>8.5f} {cosines.mean():>9.5f}")
+
+    assert not failed, f"Cosine similarity to the PyTorch embeddings below {min_cosine}: {', '.join(failed)}"
+    print(f"\nAll embeddings within cosine {min_cosine} of the PyTorch model")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks embedded per backend")
+    parser.add_argument("--queries", type=int, default=200, help="Queries embedded one at a time")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS),
+                        help="Backends compared with torch")
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads (0 = library default)")
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="Lowest allowed cosine similarity to the PyTorch embedding")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    run(args.chunks, args.queries, args.backends, args.threads, args.min_cosine)
+
+
+if __name__ == "__main__":
+    main()
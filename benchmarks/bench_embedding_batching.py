@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Embedding Batching Benchmark - fixed batch_size vs length-bucketed token-budget batches
+Chunks the extracted corpus (or a synthetic one if nothing has been extracted yet) and
+embeds a sample of the chunks on CPU with the fixed 32-text batches and with several
+token budgets, reporting chunks/s, padded tokens and the largest difference in output
+"""
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import get_config
+from modules.m2_data_collection import PDFExtractor, PDFStore
+from modules.m3_rag_pipeline import DocumentChunker, EmbeddingGenerator
+from bench_chunking import generate_corpus
+
+
+def sample_chunks(config, num_chunks: int, by_sections: bool, seed: int = 0) -> list:
+    """Chunk texts from the extracted corpus, falling back to synthetic papers."""
+    corpus = PDFExtractor(PDFStore(), config).open_corpus()
+    chunker = DocumentChunker(config)
+    if len(corpus):
+        texts = [c.text for c in chunker.iter_chunks(corpus, by_sections)]
+        source = f"{len(corpus)} extracted papers"
+    else:
+        texts = [c.text for c in chunker.iter_chunks(generate_corpus(200, 400), by_sections)]
+        source = "200 synthetic papers"
+    corpus.close()
+    random.Random(seed).shuffle(texts)
+    logger.warning(f"Sampled {min(num_chunks, len(texts))} of {len(texts)} chunks from {source}")
+    return texts[:num_chunks]
+
+
+def padded_tokens(lengths: np.ndarray, batches: list) -> int:
+    return sum(len(batch) * int(lengths[batch].max()) for batch in batches)
+
+
+def fixed_batches(texts: list, batch_size: int) -> list:
+    """How SentenceTransformer.encode batches: sorted by character length, `batch_size` at a time."""
+    order = np.argsort([-len(t) for t in texts], kind="stable")
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def budget_batches(lengths: np.ndarray, budget: int) -> list:
+    order = np.argsort(-lengths, kind="stable")
+    batches, start = [], 0
+    while start < len(order):
+        size = max(1, budget // max(1, lengths[order[start]]))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def time_embed(embedder: EmbeddingGenerator, texts: list, budget: int, repeats: int) -> tuple:
+    embedder.config.model.embedding_batch_tokens = budget
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        embeddings = embedder.embed_batch(texts, batch_size=32, show_progress=False)
+        best = min(best, time.perf_counter() - start)
+    return embeddings, best
+
+
+def run(num_chunks: int, budgets: list, repeats: int, chunk_size: int, by_sections: bool):
+    config = get_config()
+    config.model.embedding_cache = False  # Every run must reach the model
+    config.data.chunk_size = chunk_size or config.data.chunk_size
+    texts = sample_chunks(config, num_chunks, by_sections)
+
+    embedder = EmbeddingGenerator(config=config)
+    embedder.load_model()
+    lengths = embedder.token_lengths(texts)
+    print(f"\n{len(texts)} chunks, tokens per chunk: median {int(np.median(lengths))}, "
+          f"p90 {int(np.percentile(lengths, 90))}, max {lengths.max()}")
+
+    baseline, baseline_s = time_embed(embedder, texts, 0, repeats)
+    print(f"\n{'batching':>14} {'chunks/s':>9} {'padded tok':>11} {'pad %':>6} {'speedup':>8} {'max diff':>9}")
+    padded = padded_tokens(lengths, fixed_batches(texts, 32))
+    print(f"{'32 texts':>14} {len(texts) / baseline_s:>9.1f} {padded:>11} "
+          f"{100 * (1 - lengths.sum() / padded):>5.1f}% {1.0:>7.2f}x {0.0:>9.1e}")
+
+    for budget in budgets:
+        embeddings, seconds = time_embed(embedder, texts, budget, repeats)
+        diff = float(np.abs(embeddings - baseline).max())
+        assert diff < 1e-3, f"Budget {budget} changed the embeddings by {diff}"
+        padded = padded_tokens(lengths, budget_batches(lengths, budget))
+        print(f"{f'{budget} tokens':>14} {len(texts) / seconds:>9.1f} {padded:>11} "
+              f"{100 * (1 - lengths.sum() / padded):>5.1f}% {baseline_s / seconds:>7.2f}x {diff:>9.1e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding batching benchmark")
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks embedded per run")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[2048, 4096, 8192, 16384],
+                        help="Token budgets to compare with fixed batches of 32")
+    parser.add_argument("--repeats", type=int, default=2, help="Runs per mode (best is reported)")
+    parser.add_argument("--chunk-size", type=int, default=0, help="Override DataConfig.chunk_size")
+    parser.add_argument("--by-sections", action="store_true", help="Chunk within paper sections")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    run(args.chunks, args.budgets, args.repeats, args.chunk_size, args.by_sections)
+
+
+if __name__ == "__main__":
+    main()
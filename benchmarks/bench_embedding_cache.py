@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Embedding Cache Benchmark - lookups in the persistent text-hash -> embedding cache
+Fills a cache with random vectors, reopens it from disk and times batched lookups
+against a re-chunked corpus (mostly unchanged texts), checking that every hit returns
+the stored vector and that two instances sharing a directory see each other's rows
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from modules.m3_rag_pipeline.embedding_cache import EmbeddingCache, text_key
+
+
+def random_texts(rng: random.Random, n: int) -> list:
+    return [f"chunk {rng.getrandbits(64):016x} " * 20 for _ in range(n)]
+
+
+def run(entries: int, dim: int, batch: int, reuse: float, dtype: str):
+    rng = random.Random(0)
+    texts = random_texts(rng, entries)
+    vectors = np.random.default_rng(0).standard_normal((entries, dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache("bench/model", root=Path(tmp), dtype=dtype, flush_rows=batch * 4)
+        start = time.perf_counter()
+        for i in range(0, entries, batch):
+            cache.put_many([text_key(t) for t in texts[i:i + batch]], vectors[i:i + batch])
+        cache.save()
+        fill_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reopened = EmbeddingCache("bench/model", root=Path(tmp), dtype=dtype)
+        reopened.load()
+        open_s = time.perf_counter() - start
+        assert len(reopened) == entries
+
+        # A rebuild after re-chunking: `reuse` of the texts are unchanged
+        kept = rng.sample(range(entries), int(entries * reuse))
+        queries = [texts[i] for i in kept] + random_texts(rng, entries - len(kept))
+        order = list(range(len(queries)))
+        rng.shuffle(order)
+        queries = [queries[i] for i in order]
+        expected = {texts[i]: vectors[i] for i in kept}
+
+        results = []
+        lookup_s = 0.0
+        for i in range(0, len(queries), batch):
+            part = queries[i:i + batch]
+            start = time.perf_counter()
+            results.append(reopened.get_many([text_key(t) for t in part]))
+            lookup_s += time.perf_counter() - start
+        stats = reopened.get_stats()
+
+        tol = 0 if dtype == "float32" else 1e-2
+        for i, (found_vectors, found) in zip(range(0, len(queries), batch), results):
+            part = queries[i:i + batch]
+            hit_texts = [t for t, f in zip(part, found) if f]
+            assert hit_texts == [t for t in part if t in expected], "Wrong hits"
+            assert all(np.allclose(v, expected[t], atol=tol) for t, v in zip(hit_texts, found_vectors))
+
+        # Rows saved by another instance (e.g. another process) are found after our next save
+        other = EmbeddingCache("bench/model", root=Path(tmp), dtype=dtype)
+        other.put_many([b"0" * 32], np.ones((1, dim), dtype=np.float32))
+        other.save()
+        reopened.put_many([b"1" * 32], np.zeros((1, dim), dtype=np.float32))
+        reopened.save()
+        _, found = reopened.get_many([b"0" * 32, b"1" * 32])
+        assert found.all() and len(reopened) == entries + 2
+
+    print(f"\n{'entries':>8} {'dim':>5} {'dtype':>8} {'MB':>7} {'fill s':>7} {'open ms':>8} "
+          f"{'us/key':>7} {'hit rate':>9}")
+    print(f"{entries:>8} {dim:>5} {dtype:>8} {stats['bytes'] / (1 << 20):>7.1f} {fill_s:>7.2f} "
+          f"{1e3 * open_s:>8.1f} {1e6 * lookup_s / len(queries):>7.2f} {stats['hit_rate']:>9.1%}")
+    print(f"\nAll {stats['hits']} hits returned their stored vectors; "
+          f"{stats['misses']} misses would go to the model")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding cache benchmark")
+    parser.add_argument("--entries", type=int, default=200000, help="Cached embeddings")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--batch", type=int, default=256, help="Texts per lookup")
+    parser.add_argument("--reuse", type=float, default=0.9, help="Share of texts unchanged between builds")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    run(args.entries, args.dim, args.batch, args.reuse, args.dtype)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Embedding Workers Benchmark - one process vs a pool of embedding processes on CPU
+Streams a sample of chunks to an .npy file with EmbeddingGenerator.embed_to_file for
+several worker counts (threads split evenly across workers), reporting pool start-up,
+chunks/s and scaling, and checking the file matches the single-process embeddings
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import get_config
+from modules.m3_rag_pipeline import EmbeddingGenerator
+from bench_embedding_batching import sample_chunks
+
+
+def time_workers(config, texts: list, workers: int, worker_threads: int, out_path: Path) -> tuple:
+    config.model.embedding_workers = workers
+    config.model.embedding_worker_threads = worker_threads
+    embedder = EmbeddingGenerator(config=config)
+
+    # Start the workers (or load the model) before timing
+    start = time.perf_counter()
+    embedder.embed_batch(texts[:2 * workers], show_progress=False)
+    startup_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings = np.array(embedder.embed_to_file(texts, out_path, show_progress=False))
+    seconds = time.perf_counter() - start
+    embedder.close_pool()
+    return embeddings, startup_s, seconds
+
+
+def run(num_chunks: int, worker_counts: list, worker_threads: int, chunk_size: int):
+    config = get_config()
+    config.model.embedding_cache = False  # Every run must reach the model
+    config.data.chunk_size = chunk_size or config.data.chunk_size
+    texts = sample_chunks(config, num_chunks, by_sections=False)
+
+    print(f"\n{len(texts)} chunks, {os.cpu_count()} CPUs")
+    print(f"\n{'workers':>8} {'threads':>8} {'start s':>8} {'chunks/s':>9} {'speedup':>8} {'max diff':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = baseline_s = None
+        for workers in [1] + [w for w in worker_counts if w != 1]:
+            embeddings, startup_s, seconds = time_workers(
+                config, texts, workers, worker_threads, Path(tmp) / f"embeddings_{workers}.npy"
+            )
+            if baseline is None:
+                baseline, baseline_s = embeddings, seconds
+            diff = float(np.abs(embeddings - baseline).max())
+            assert diff < 1e-3, f"{workers} workers changed the embeddings by {diff}"
+            threads = (worker_threads or max(1, (os.cpu_count() or 1) // workers)) if workers > 1 else "default"
+            print(f"{workers:>8} {threads:>8} {startup_s:>8.1f} {len(texts) / seconds:>9.1f} "
+                  f"{baseline_s / seconds:>7.2f}x {diff:>9.1e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding workers benchmark")
+    parser.add_argument("--chunks", type=int, default=4000, help="Chunks embedded per run")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8],
+                        help="Worker counts to compare with a single process")
+    parser.add_argument("--worker-threads", type=int, default=0,
+                        help="Threads per worker (0 = CPU count // workers)")
+    parser.add_argument("--chunk-size", type=int, default=0, help="Override DataConfig.chunk_size")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    run(args.chunks, args.workers, args.worker_threads, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
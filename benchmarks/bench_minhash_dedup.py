@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+MinHash Dedup Benchmark - per-word loop vs DataCleaner.deduplicate_batch
+Builds a synthetic corpus with planted exact and near-duplicates and checks that both
+paths keep exactly the same documents, and that a persistent index keeps a re-versioned
+paper across runs
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from modules.m2_data_collection import DataCleaner
+
+
+def generate_corpus(num_docs: int, words: int, dup_ratio: float = 0.1, exact_ratio: float = 0.1,
+                    seed: int = 0) -> list:
+    """Random documents over a Zipf-like vocabulary.
+
+    `dup_ratio` of them are edited copies of earlier documents (near-duplicates)
+    and `exact_ratio` are re-downloads differing only in case and whitespace.
+    """
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10)))
+             for _ in range(20000)]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocab))]
+
+    docs = []
+    for i in range(num_docs):
+        r = rng.random()
+        if docs and r < exact_ratio:
+            # Exact duplicate after normalization
+            tokens = rng.choice(docs)["full_text"].upper().split()
+            text = "  ".join(tokens) + "\n"
+        elif docs and r < exact_ratio + dup_ratio:
+            # Near-duplicate: copy an earlier document and replace a few words
+            tokens = rng.choice(docs)["full_text"].split()
+            for j in rng.sample(range(len(tokens)), k=max(1, len(tokens) // 30)):
+                tokens[j] = rng.choice(vocab)
+            text = " ".join(tokens)
+        else:
+            text = " ".join(rng.choices(vocab, weights=weights, k=words))
+        docs.append({"arxiv_id": f"bench.{i:05d}", "full_text": text})
+    return docs
+
+
+def legacy_dedup(documents: list) -> list:
+    """The original path: every document MinHashed with one update call per word."""
+    cleaner = DataCleaner()
+    unique = []
+    for doc in documents:
+        m = cleaner._get_minhash(doc["full_text"])
+        if not cleaner.lsh.query(m):
+            cleaner.lsh.insert(doc["arxiv_id"], m)
+            unique.append(doc)
+    return unique
+
+
+def check_reversioned(words: int):
+    """A new version of a paper kept in an earlier run replaces it rather than being its duplicate."""
+    docs = generate_corpus(2, words, dup_ratio=0.0, exact_ratio=0.0, seed=1)
+    v1 = {**docs[0], "arxiv_id": "2401.00001v1"}
+    tokens = v1["full_text"].split()
+    tokens[:5] = ["revised"] * 5
+    v2 = {"arxiv_id": "2401.00001v2", "full_text": " ".join(tokens)}
+    other = {**docs[1], "arxiv_id": "2401.00002v1"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kept_per_run = []
+        for batch in ([v1, other], [v2, other], [v2]):
+            cleaner = DataCleaner(persistent=True, index_dir=Path(tmp))
+            kept_per_run.append([d["arxiv_id"] for d in cleaner.deduplicate_batch([dict(d) for d in batch])])
+            cleaner.save()
+        entries = len(DataCleaner(persistent=True, index_dir=Path(tmp)).index)
+
+    expected = [["2401.00001v1", "2401.00002v1"], ["2401.00001v2", "2401.00002v1"], ["2401.00001v2"]]
+    assert kept_per_run == expected, f"Re-versioned paper handled wrongly: {kept_per_run}"
+    assert entries == 2, f"Expected one index entry per paper, found {entries}"
+    print("Re-versioned paper kept across persistent runs, replacing its old entry")
+
+
+def run(num_docs: int, words: int):
+    """Time both paths and compare their decisions."""
+    logger.info(f"Generating {num_docs} documents x {words} words...")
+    docs = generate_corpus(num_docs, words)
+
+    start = time.perf_counter()
+    legacy = legacy_dedup(docs)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_cleaner = DataCleaner()
+    batch = batch_cleaner.deduplicate_batch(docs)
+    batch_time = time.perf_counter() - start
+
+    # Signatures must match exactly, not just the final decisions
+    cleaner = DataCleaner()
+    sample = docs[:50]
+    for doc, m in zip(sample, cleaner.minhash_batch(d["full_text"] for d in sample)):
+        assert np.array_equal(m.hashvalues, cleaner._get_minhash(doc["full_text"]).hashvalues)
+
+    legacy_ids = [d["arxiv_id"] for d in legacy]
+    batch_ids = [d["arxiv_id"] for d in batch]
+    assert legacy_ids == batch_ids, "Duplicate decisions differ"
+
+    print(f"\n{'path':>8} {'seconds':>9} {'docs/s':>9} {'kept':>7}")
+    print(f"{'legacy':>8} {legacy_time:>9.2f} {num_docs / legacy_time:>9.0f} {len(legacy):>7}")
+    print(f"{'batch':>8} {batch_time:>9.2f} {num_docs / batch_time:>9.0f} {len(batch):>7}")
+    stats = batch_cleaner.dedup_stats
+    print(f"\nSpeedup: {legacy_time / batch_time:.1f}x, identical decisions "
+          f"({num_docs - len(batch)} duplicates removed)")
+    print(f"Tier 1 dropped {stats['exact']} exact duplicates without MinHash; "
+          f"tier 2 MinHashed {stats['minhashed']} and dropped {stats['near']} near-duplicates")
+    check_reversioned(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MinHash deduplication benchmark")
+    parser.add_argument("--docs", type=int, default=10000, help="Number of documents")
+    parser.add_argument("--words", type=int, default=300, help="Words per document")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    run(args.docs, args.words)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+PDF Extraction Benchmark - docs/second at 1, 2, 4 and N workers
+Generates a synthetic PDF corpus and times PDFExtractor.extract_batch
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import get_config
+from modules.m2_data_collection import PDFExtractor, PDFStore, ExtractionCache
+
+WORDS = ("attention transformer language model training corpus token embedding "
+         "retrieval evaluation benchmark gradient layer dataset fine-tuning").split()
+
+
+def generate_corpus(out_dir: Path, num_docs: int, pages: int, seed: int = 0) -> list:
+    """Write `num_docs` multi-page PDFs filled with pseudo-random text."""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(num_docs):
+        doc = fitz.open()
+        for _ in range(pages):
+            page = doc.new_page()
+            text = "\n".join(
+                " ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(45)
+            )
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=9)
+        path = out_dir / f"bench_{i:05d}.pdf"
+        doc.save(str(path))
+        doc.close()
+        paths.append(str(path))
+    return paths
+
+
+def run(num_docs: int, pages: int, worker_counts: list):
+    """Time extraction for each worker count."""
+    config = get_config()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        logger.info(f"Generating {num_docs} PDFs x {pages} pages...")
+        paths = generate_corpus(tmp, num_docs, pages)
+        # Isolated store/cache so the benchmark never touches storage/
+        extractor = PDFExtractor(
+            store=PDFStore(tmp / "store"), config=config, cache=ExtractionCache(tmp / "cache")
+        )
+
+        print(f"\n{'workers':>8} {'seconds':>9} {'docs/s':>9} {'speedup':>8}")
+        baseline = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            docs = extractor.extract_batch(paths, workers=workers, use_cache=False)
+            elapsed = time.perf_counter() - start
+            assert len(docs) == num_docs
+            rate = num_docs / elapsed
+            baseline = baseline or rate
+            print(f"{workers:>8} {elapsed:>9.2f} {rate:>9.1f} {rate / baseline:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF extraction throughput benchmark")
+    parser.add_argument("--docs", type=int, default=200, help="Number of PDFs to generate")
+    parser.add_argument("--pages", type=int, default=8, help="Pages per PDF")
+    args = parser.parse_args()
+
+    n = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, n})
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    run(args.docs, args.pages, worker_counts)
+
+
+if __name__ == "__main__":
+    main()
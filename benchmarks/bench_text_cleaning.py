@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Text Cleaning Benchmark - chained regex passes vs the fused cleaning engine
+Checks byte-for-byte parity on a fixture corpus plus random fuzz strings,
+then times the reference chain, clean_text and clean_many
+"""
+
+import argparse
+import os
+import random
+import re
+import time
+from pathlib import Path
+
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent))
+
+from modules.m2_data_collection import DataCleaner
+from modules.m2_data_collection.data_cleaner import clean_text
+
+# Hand-picked cases around pattern boundaries and pass ordering
+FIXTURES = [
+    "",
+    "   ",
+    "Plain sentence. Nothing to clean!",
+    "<p>Hello <b>world</b></p> <br/> a < b > c",
+    "Contact jane.doe+lab@uni-example.edu or call 555-123-4567.",
+    "Card 1234 5678 9012 3456, card 1234-5678-9012-3456, raw 1234567890123456.",
+    "Phones 555.123.4567 5551234567 (555) 123-4567 +1-555-123-4567",
+    "5551234567@example.com and a@b.co5551234567 and x@y.com-5551234567",
+    "<span>555</span>123-4567 and us<i></i>er@host.org",
+    "1234 5678 9012 3456 7890 123-456-7890-1234 555-1234-5678",
+    "weird | pipes a@b.c|om a@b.x|y and ß@straße.de é%x@y.com",
+    "Unicode: naïve café — “quotes” ‘single’ … ∑ x² ≤ 10 → done",
+    "tabs\tand\nnewlines\r\nand\x0bvertical\x0cfeed\x1cseparators 　end",
+    "Math: $f(x) = \\alpha + \\beta$ & {set} [list] (paren) #hash *star* ~tilde",
+    "__init__ under_score 12_34 1_234_567_890 a_b@c_d.com",
+    "-.-.- ... ,,, !!! ??? ;;; ::: ''' \"\"\"",
+]
+
+FUZZ_ALPHABET = "0123456789" * 3 + "aZ@@.-_ %+|<>\t\n" + "é—$"
+
+
+def reference_clean(text: str, keep_lines: bool = False) -> str:
+    """The original DataCleaner.clean_text: six chained re.sub calls.
+
+    With `keep_lines`, whitespace is normalized as in `clean_text(keep_lines=True)`:
+    non-newline runs become a space, then runs of line breaks one newline.
+    """
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[EMAIL]', text)
+    text = re.sub(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b', '[PHONE]', text)
+    text = re.sub(r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b', '[CARD]', text)
+    text = re.sub(r'[^\w\s.,!?;:\-\'\"()\[\]{}]', ' ', text)
+    if keep_lines:
+        text = re.sub(r'[^\S\n]+', ' ', text)
+        text = re.sub(r' ?\n\s*', '\n', text)
+    else:
+        text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def generate_corpus(num_docs: int, words: int, seed: int = 0) -> list:
+    """Paper-length texts mixing prose with the fixture patterns."""
+    rng = random.Random(seed)
+    vocab = ("model training attention layer results table figure section the of and "
+             "we propose method dataset accuracy loss baseline").split()
+    docs = []
+    for _ in range(num_docs):
+        parts = []
+        for _ in range(words):
+            r = rng.random()
+            if r < 0.01:
+                parts.append(rng.choice(FIXTURES))
+            elif r < 0.05:
+                parts.append(rng.choice(["(1)", "[12]", "x²", "α=0.1", "e.g.,", "—", "%", "<i>", "</i>"]))
+            else:
+                parts.append(rng.choice(vocab))
+            parts.append(rng.choice([" ", " ", " ", "\n", ".  "]))
+        docs.append("".join(parts))
+    return docs
+
+
+def fuzz_strings(count: int, seed: int = 1) -> list:
+    """Short random strings dense in digits, separators and PII punctuation."""
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(1, 40))) for _ in range(count)]
+
+
+def check_parity(texts: list, label: str):
+    for keep_lines in (False, True):
+        mode = f"{label}, keep_lines" if keep_lines else label
+        mismatches = [t for t in texts if clean_text(t, keep_lines) != reference_clean(t, keep_lines)]
+        for text in mismatches[:5]:
+            print(f"MISMATCH ({mode}): {text!r}\n  reference: {reference_clean(text, keep_lines)!r}\n"
+                  f"  fused:     {clean_text(text, keep_lines)!r}")
+        assert not mismatches, f"{len(mismatches)} {mode} texts differ from the reference cleaner"
+        print(f"Parity OK: {len(texts)} {mode} texts")
+
+
+def run(num_docs: int, words: int, fuzz: int):
+    """Verify parity, then time each path."""
+    check_parity(FIXTURES, "fixture")
+    check_parity(fuzz_strings(fuzz), "fuzz")
+
+    docs = generate_corpus(num_docs, words)
+    check_parity(docs, "corpus")
+
+    cleaner = DataCleaner()
+    n = os.cpu_count() or 1
+    print(f"\n{'path':>16} {'seconds':>9} {'docs/s':>9} {'speedup':>8}")
+    baseline = None
+    paths = [("reference", lambda: [reference_clean(d) for d in docs]),
+             ("clean_text", lambda: [clean_text(d) for d in docs])]
+    paths += [(f"clean_many x{w}", lambda w=w: cleaner.clean_many(docs, workers=w)) for w in sorted({2, n})]
+    for name, fn in paths:
+        if name.startswith("clean_many"):
+            fn()  # Start the pool first: streaming ingest reuses it across micro-batches
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{name:>16} {elapsed:>9.2f} {num_docs / elapsed:>9.0f} {baseline / elapsed:>7.2f}x")
+    cleaner.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text cleaning parity and throughput benchmark")
+    parser.add_argument("--docs", type=int, default=500, help="Number of documents")
+    parser.add_argument("--words", type=int, default=8000, help="Words per document")
+    parser.add_argument("--fuzz", type=int, default=200000, help="Number of random fuzz strings")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    run(args.docs, args.words, args.fuzz)
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,19 @@ class ModelConfig:
     """LLM Model configuration."""
     base_model_name: str = "unsloth/Meta-Llama-3.1-8B-Instruct-bnb-4bit"
     embedding_model: str = "sentence-transformers/all-mpnet-base-v2"
+    embedding_cache: bool = True  # Reuse embeddings of texts seen before (stored under INDEX_DIR/embeddings)
+    embedding_cache_dtype: str = "float32"  # "float16" halves the cache; cached vectors are then rounded
+    embedding_cache_flush: int = 4096  # New embeddings held in memory between cache writes
+    query_cache_size: int = 1024  # Recent query embeddings kept in memory by embed_text (0 disables)
+    query_cache_ttl: float = 3600.0  # Seconds a cached query embedding is reused (0 = no expiry)
+    embedding_batch_tokens: int = 0  # >0: embed length-sorted batches of up to this many padded tokens
+    embedding_backend: str = "torch"  # "torch" (sentence-transformers) or "onnx" (ONNX Runtime, CPU)
+    embedding_onnx_dir: str = ""  # ONNX export directory; "" = MODEL_DIR/onnx/<embedding_model>
+    embedding_onnx_quantize: bool = True  # onnx backend: use the dynamically int8-quantized model
+    embedding_threads: int = 0  # Intra-op threads for the embedding model (0 = library default)
+    embedding_workers: int = 1  # >1 encodes batches in a process pool, one model per worker
+    embedding_worker_threads: int = 0  # Intra-op threads per worker (0 = CPU count // workers)
+    embedding_shard_size: int = 256  # Most texts sent to a worker at a time
     max_seq_length: int = 2048
     load_in_4bit: bool = True
     device_map: str = "auto"
@@ -70,6 +83,33 @@ class DataConfig:
     chunk_size: int = 512
     chunk_overlap: int = 50
     min_chunk_length: int = 100
+    token_chunking: bool = False  # Count chunk_size in embedding-model tokens instead of ~4 chars
+    chunk_workers: int = 1  # >1 chunks documents in a process pool
+    chunk_task_chars: int = 2 << 20  # Characters of text per task sent to a chunking worker
+    
+    # PDF downloading
+    download_workers: int = 4
+    download_min_interval: float = 0.5  # Seconds between requests to the same host
+    download_timeout: float = 60.0
+    
+    # PDF extraction
+    extract_workers: int = 1  # >1 extracts in a process pool
+    extract_chunksize: int = 4  # PDFs per task sent to a worker
+    extract_timeout: float = 120.0  # Seconds per PDF before its worker is killed (0 = no limit)
+    extract_isolate: bool = True  # One worker: still extract in a child process, so a hung PDF can be killed
+    
+    # Text cleaning
+    clean_workers: int = 1  # >1 cleans and detects languages in a process pool
+    
+    # Extracted text corpus
+    corpus_compression: str = "none"  # "none" or "zstd" (needs zstandard)
+    corpus_shard_size: int = 256 << 20  # Bytes per shard file
+    corpus_compact_ratio: float = 0.25  # Compact after indexing once this fraction of the shards is dead
+    
+    # Streaming ingestion
+    ingest_doc_batch: int = 16  # Documents per micro-batch
+    ingest_chunk_batch: int = 256  # Chunks per embedding/indexing batch
+    ingest_queue_size: int = 4  # Batches buffered between stages
     
     # Synthetic data
     qa_pairs_per_paper: int = 5
@@ -89,6 +129,9 @@ class RAGConfig:
     vector_weight: float = 0.6
     keyword_weight: float = 0.4
     use_rrf: bool = True  # Reciprocal Rank Fusion
+    
+    # Incremental updates
+    index_compact_ratio: float = 0.25  # Compact after indexing once this fraction of chunk rows is dead
 
 
 @dataclass
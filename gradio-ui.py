@@ -45,9 +45,8 @@ class AcademicLLMInterface:
             self.scraper = ArxivScraper()
             self.extractor = PDFExtractor()
             
-            progress(0.4, desc="Loading embedding model...")
-            self.embedder = EmbeddingGenerator()
-            self.embedder.load_model()
+            progress(0.4, desc="Setting up embedder...")
+            self.embedder = EmbeddingGenerator()  # The model loads on first use (in workers, if any)
             
             progress(0.6, desc="Setting up indexers...")
             self.chunker = DocumentChunker()
@@ -106,7 +105,7 @@ class AcademicLLMInterface:
                 preview += f"... and {len(papers) - 10} more papers"
             
             progress(1.0, desc="Complete!")
-            return f"✅ Collected {len(papers)} papers!", preview
+            return f"✅ Collected {len(papers)} papers! ({self.scraper.paper_store.count()} in store)", preview
             
         except Exception as e:
             logger.error(f"Collection error: {e}")
@@ -118,48 +117,55 @@ class AcademicLLMInterface:
             return "❌ Please initialize modules first!"
         
         try:
+            from modules.m3_rag_pipeline import IndexManifest, IngestionPipeline
+            
             progress(0.1, desc="Loading metadata...")
             papers = self.scraper.load_metadata()
             
-            progress(0.2, desc="Extracting text from PDFs...")
             pdf_paths = [p.local_pdf_path for p in papers if p.local_pdf_path]
             metadata_list = [{"title": p.title, "arxiv_id": p.arxiv_id} for p in papers if p.local_pdf_path]
             
-            documents = self.extractor.extract_batch(pdf_paths, metadata_list)
-            
-            progress(0.4, desc="Chunking documents...")
-            all_chunks = []
-            for doc in documents:
-                chunks = self.chunker.chunk_document(
-                    doc.arxiv_id,
-                    doc.full_text,
-                    {"title": doc.title}
-                )
-                all_chunks.extend(chunks)
-            
-            progress(0.6, desc="Generating embeddings...")
-            embeddings = self.embedder.embed_chunks(all_chunks)
-            
-            progress(0.8, desc="Building FAISS index...")
-            self.indexer.create_index()
-            self.indexer.add_vectors(embeddings, all_chunks)
-            self.indexer.save("academic_index")
-            
-            progress(0.9, desc="Adding to SQLite FTS...")
+            progress(0.2, desc="Preparing indexes...")
             # Reconnect to ensure fresh connection
             if self.sqlite_fts.conn:
                 self.sqlite_fts.close()
             self.sqlite_fts.connect()
             
+            # Update the saved indexes in place; only new, changed and removed papers are processed
+            manifest = IndexManifest("academic_index")
+            loaded = self.indexer.load_or_create("academic_index")
+            
             # Check database integrity before adding data
-            if not self.sqlite_fts.check_integrity():
-                logger.warning("Database integrity check failed, clearing old data...")
+            if not self.sqlite_fts.check_integrity() or not loaded:
+                logger.warning("No usable index to update, rebuilding from scratch...")
+                self.indexer.create_index()
                 self.sqlite_fts.clear_all_data()
+                manifest.clear()
             else:
                 # Just ensure tables exist
                 self.sqlite_fts.create_tables()
             
-            self.sqlite_fts.add_chunks_batch(all_chunks)
+            # Extract, chunk, embed and index as one stream (text is indexed as extracted)
+            corpus = self.extractor.open_corpus()
+            pipeline = IngestionPipeline(
+                self.extractor, self.chunker, self.embedder, self.indexer,
+                fts=self.sqlite_fts, corpus=corpus, manifest=manifest
+            )
+            total = max(1, len(pdf_paths))
+            stats = pipeline.run(
+                pdf_paths, metadata_list,
+                progress=lambda st: progress(
+                    0.2 + 0.7 * min(1.0, st.extracted / total),
+                    desc=f"Indexed {st.chunks} chunks from {st.extracted}/{len(pdf_paths)} PDFs..."
+                ),
+                prune=True
+            )
+            self.indexer.save("academic_index")
+            manifest.save()
+            manifest.close()
+            self.embedder.save_cache()
+            self.embedder.close_pool()  # Queries are embedded in-process
+            corpus.close()
             
             # Setup hybrid retriever
             from modules.m4_hybrid_retrieval import HybridRetriever
@@ -168,7 +174,10 @@ class AcademicLLMInterface:
             )
             
             progress(1.0, desc="Complete!")
-            return f"✅ Indexed {len(all_chunks)} chunks from {len(documents)} documents!"
+            return (
+                f"✅ Indexed {stats.chunks} chunks from {stats.kept} new or changed documents "
+                f"({stats.unchanged} unchanged, {stats.removed} removed)!"
+            )
             
         except Exception as e:
             logger.error(f"Processing error: {e}")
@@ -214,7 +223,7 @@ class AcademicLLMInterface:
             from modules.m5_synthetic_data import QAGenerator, DatasetBuilder
             
             progress(0.1, desc="Loading papers...")
-            papers = self.scraper.load_metadata()[:int(num_papers)]
+            papers = self.scraper.load_metadata(limit=int(num_papers))
             
             # Convert to dict format
             papers_dict = [
@@ -71,6 +71,7 @@ class PipelineStatus(BaseModel):
     qa_pairs_generated: int = 0
     model_trained: bool = False
     last_updated: Optional[str] = None
+    query_cache: Dict = Field(default_factory=dict, description="Query embedding cache size and hit rate")
 
 
 class DataCollectionRequest(BaseModel):
@@ -131,7 +132,7 @@ from loguru import logger
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from config.settings import get_config, INDEX_DIR
+from config.settings import get_config, INDEX_DIR, DATA_DIR
 
 # All schema classes are defined above in this file, so we can use them directly
 # No need to import - they're already in the same namespace
@@ -150,6 +151,7 @@ class AppState:
         self.ft_model = None
         self.ft_tokenizer = None
         self.llm_loader = None
+        self.paper_store = None
         self.initialized = False
 
 
@@ -166,8 +168,13 @@ async def lifespan(app: FastAPI):
         from modules.m3_rag_pipeline import EmbeddingGenerator, FAISSIndexer
         from modules.m4_hybrid_retrieval import SQLiteFTS, HybridRetriever
         from modules.m1_langchain_llama import LLMLoader
+        from modules.m2_data_collection import PaperStore
         
-        # Load embedder
+        # Paper metadata store (imports the legacy JSON file once, when it opens)
+        state.paper_store = PaperStore(legacy_json=DATA_DIR / "processed" / "papers_metadata.json")
+        state.paper_store.connect()
+        
+        # Load embedder (queries are embedded in this process, so its model is needed here)
         state.embedder = EmbeddingGenerator()
         state.embedder.load_model()
         
@@ -203,8 +210,12 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("Shutting down...")
+    if state.embedder:
+        state.embedder.save_cache()  # Query embeddings cached since the last write
     if state.sqlite_fts:
         state.sqlite_fts.close()
+    if state.paper_store:
+        state.paper_store.close()
 
 
 def create_app() -> FastAPI:
@@ -396,20 +407,13 @@ Question: {request.message}"""
     # Pipeline status
     @app.get("/status", response_model=PipelineStatus)
     async def get_status():
-        from config.settings import DATA_DIR
-        import os
-        
-        # Count papers
-        papers_file = DATA_DIR / "processed" / "papers_metadata.json"
+        # Count papers (O(1) lookup in the paper store)
         papers_count = 0
-        if papers_file.exists():
+        if state.paper_store:
             try:
-                import json
-                with open(papers_file) as f:
-                    papers = json.load(f)
-                    papers_count = len(papers) if isinstance(papers, list) else 0
-            except:
-                pass
+                papers_count = state.paper_store.count()
+            except Exception as e:
+                logger.warning(f"Could not count papers: {e}")
         
         # Count QA pairs
         qa_file = DATA_DIR / "synthetic" / "synthetic_qa.jsonl"
@@ -426,7 +430,8 @@ Question: {request.message}"""
             papers_collected=papers_count,
             chunks_indexed=state.faiss_indexer.index.ntotal if state.faiss_indexer else 0,
             qa_pairs_generated=qa_count,
-            model_trained=Path(state.config.training.output_dir).exists()
+            model_trained=Path(state.config.training.output_dir).exists(),
+            query_cache=state.embedder.get_query_cache_stats() if state.embedder else {}
         )
     
     # Data collection endpoint
@@ -466,53 +471,50 @@ Question: {request.message}"""
         """Build RAG index from collected papers."""
         try:
             from modules.m2_data_collection import ArxivScraper, PDFExtractor
-            from modules.m3_rag_pipeline import DocumentChunker, EmbeddingGenerator, FAISSIndexer
+            from modules.m3_rag_pipeline import (
+                DocumentChunker, EmbeddingGenerator, FAISSIndexer, IndexManifest, IngestionPipeline
+            )
             from modules.m4_hybrid_retrieval import SQLiteFTS
             
             def build_task():
                 # Load papers
                 scraper = ArxivScraper()
                 papers = scraper.load_metadata()
-                
-                # Extract text
-                extractor = PDFExtractor()
                 pdf_paths = [p.local_pdf_path for p in papers if p.local_pdf_path]
                 metadata_list = [{"title": p.title, "arxiv_id": p.arxiv_id} for p in papers if p.local_pdf_path]
-                documents = extractor.extract_batch(pdf_paths, metadata_list)
-                
-                # Chunk
-                chunker = DocumentChunker()
-                all_chunks = []
-                for doc in documents:
-                    chunks = chunker.chunk_document(
-                        doc.arxiv_id,
-                        doc.full_text,
-                        {"title": doc.title}
-                    )
-                    all_chunks.extend(chunks)
                 
-                # Generate embeddings
-                embedder = EmbeddingGenerator()
-                embedder.load_model()
-                embeddings = embedder.embed_chunks(all_chunks)
-                
-                # Build FAISS index
+                # Prepare indexes
+                embedder = EmbeddingGenerator()  # The model loads on first use (in workers, if any)
                 indexer = FAISSIndexer(embedder.get_dimension())
-                indexer.create_index()
-                indexer.add_vectors(embeddings, all_chunks)
-                indexer.save("academic_index")
-                
-                # Build SQLite FTS
+                manifest = IndexManifest("academic_index")
+                loaded = indexer.load_or_create("academic_index")  # Updated in place when possible
                 fts = SQLiteFTS()
                 fts.connect()
-                if not fts.check_integrity():
+                if not fts.check_integrity() or not loaded:
+                    indexer.create_index()
                     fts.clear_all_data()
+                    manifest.clear()
                 else:
                     fts.create_tables()
-                fts.add_chunks_batch(all_chunks)
+                
+                # Extract, chunk, embed and index as one stream (text is indexed as extracted)
+                extractor = PDFExtractor(scraper.store)
+                corpus = extractor.open_corpus()
+                pipeline = IngestionPipeline(
+                    extractor, DocumentChunker(), embedder, indexer,
+                    fts=fts, corpus=corpus, manifest=manifest
+                )
+                stats = pipeline.run(pdf_paths, metadata_list, prune=True)
+                
+                indexer.save("academic_index")
+                manifest.save()
+                manifest.close()
+                embedder.save_cache()
+                embedder.close_pool()
                 fts.close()
+                corpus.close()
                 
-                return len(all_chunks), len(documents)
+                return stats.chunks, stats.kept
             
             background_tasks.add_task(build_task)
             
@@ -535,7 +537,7 @@ Question: {request.message}"""
             
             def generate_task():
                 scraper = ArxivScraper()
-                papers = scraper.load_metadata()[:request.num_papers]
+                papers = scraper.load_metadata(limit=request.num_papers)
                 
                 papers_dict = [
                     {
@@ -1,9 +1,19 @@
 # modules/m2_data_collection/__init__.py
 """Module 2: Data Collection and Extraction."""
 
-from .arxiv_scraper import ArxivScraper, PaperMetadata
+from .arxiv_scraper import ArxivScraper
+from .paper_store import PaperStore, PaperMetadata
 from .pdf_extractor import PDFExtractor, ExtractedDocument
 from .data_cleaner import DataCleaner
+from .downloader import PDFDownloader, DownloadTask, DownloadResult
+from .pdf_store import PDFStore, StoredPDF
+from .extraction_cache import ExtractionCache
+from .corpus_store import ShardedCorpus
+from .dedup_index import DedupIndex
+from .language_id import LanguageIdentifier
 
-__all__ = ["ArxivScraper", "PDFExtractor", "DataCleaner", "PaperMetadata", "ExtractedDocument"]
+__all__ = ["ArxivScraper", "PDFExtractor", "DataCleaner", "PaperMetadata", "ExtractedDocument",
+           "PDFDownloader", "DownloadTask", "DownloadResult", "PDFStore", "StoredPDF", "PaperStore",
+           "ExtractionCache", "ShardedCorpus", "DedupIndex",
+           "LanguageIdentifier"]
 
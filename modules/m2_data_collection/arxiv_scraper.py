@@ -2,32 +2,19 @@
 """arXiv paper scraping and downloading."""
 
 import arxiv
-import requests
 from pathlib import Path
 from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import asdict
 from datetime import datetime
 import json
-from tqdm import tqdm
 from loguru import logger
 
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.settings import get_config, DATA_DIR
-
-
-@dataclass
-class PaperMetadata:
-    """Metadata for an arXiv paper."""
-    arxiv_id: str
-    title: str
-    authors: List[str]
-    abstract: str
-    categories: List[str]
-    published: str
-    updated: str
-    pdf_url: str
-    local_pdf_path: Optional[str] = None
+from .downloader import PDFDownloader, DownloadTask
+from .pdf_store import PDFStore
+from .paper_store import PaperStore, PaperMetadata
 
 
 class ArxivScraper:
@@ -36,39 +23,63 @@ class ArxivScraper:
     def __init__(self, config=None):
         self.config = config or get_config()
         self.raw_dir = DATA_DIR / "raw"
+        self.incoming_dir = self.raw_dir / "incoming"
+        self.store = PDFStore(self.raw_dir)
         self.metadata_file = DATA_DIR / "processed" / "papers_metadata.json"
+        self.paper_store = PaperStore(legacy_json=self.metadata_file)  # Imported when the store opens
+        self.cursor_file = DATA_DIR / "processed" / "harvest_cursor.json"
+        self.delta_file = DATA_DIR / "processed" / "papers_delta.json"
         self.papers: List[PaperMetadata] = []
+        self._downloader: Optional[PDFDownloader] = None
+        
+    @property
+    def downloader(self) -> PDFDownloader:
+        """Shared downloader, created on first use so its session is reused."""
+        if self._downloader is None:
+            self._downloader = PDFDownloader(
+                max_workers=self.config.data.download_workers,
+                min_interval=self.config.data.download_min_interval,
+                timeout=self.config.data.download_timeout
+            )
+        return self._downloader
         
     def search_papers(
         self, 
         category: Optional[str] = None,
         query: Optional[str] = None,
-        max_results: Optional[int] = None
+        max_results: Optional[int] = None,
+        since: Optional[str] = None
     ) -> List[PaperMetadata]:
-        """Search arXiv for papers."""
+        """Search arXiv for papers.
+        
+        If `since` (an ISO timestamp) is given, results are ordered by last
+        update and paged until the first entry older than it; `max_results`
+        does not apply, so nothing updated after `since` is missed. Entries
+        updated exactly at `since` are fetched again.
+        """
         category = category or self.config.data.arxiv_category
         max_results = max_results or self.config.data.num_papers
         
         # Build search query
-        if query:
-            search_query = f"cat:{category} AND ({query})"
-        else:
-            search_query = f"cat:{category}"
+        search_query = self._build_query(category, query)
         
-        logger.info(f"Searching arXiv: {search_query}, max_results={max_results}")
+        logger.info(f"Searching arXiv: {search_query}, max_results={max_results}, since={since}")
         
         search = arxiv.Search(
             query=search_query,
-            max_results=max_results,
-            sort_by=arxiv.SortCriterion.SubmittedDate,
+            max_results=None if since else max_results,
+            sort_by=arxiv.SortCriterion.LastUpdatedDate if since else arxiv.SortCriterion.SubmittedDate,
             sort_order=arxiv.SortOrder.Descending
         )
         
         client = arxiv.Client()
-        results = list(client.results(search))
+        since_dt = datetime.fromisoformat(since) if since else None
         
         self.papers = []
-        for result in results:
+        # Results are paged lazily, so stopping early saves API calls
+        for result in client.results(search):
+            if since_dt is not None and result.updated < since_dt:
+                break
             paper = PaperMetadata(
                 arxiv_id=result.entry_id.split("/")[-1],
                 title=result.title.replace("\n", " "),
@@ -84,66 +95,160 @@ class ArxivScraper:
         logger.info(f"Found {len(self.papers)} papers")
         return self.papers
     
+    @staticmethod
+    def _build_query(category: str, query: Optional[str] = None) -> str:
+        """Build an arXiv search query string."""
+        if query:
+            return f"cat:{category} AND ({query})"
+        return f"cat:{category}"
+    
+    def load_cursor(self) -> Dict[str, str]:
+        """Load the per-query high-water marks (latest `updated` timestamp)."""
+        if not self.cursor_file.exists():
+            return {}
+        with open(self.cursor_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def save_cursor(self, cursor: Dict[str, str]):
+        """Persist the high-water marks."""
+        self.cursor_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cursor_file, 'w', encoding='utf-8') as f:
+            json.dump(cursor, f, indent=2)
+    
+    def harvest_incremental(
+        self,
+        category: Optional[str] = None,
+        query: Optional[str] = None,
+        max_results: Optional[int] = None
+    ) -> List[PaperMetadata]:
+        """Fetch only papers updated since the last harvest and merge them in.
+        
+        Returns the delta (new or re-versioned papers), which is also written
+        to `papers_delta.json` for downstream stages. Papers already stored at
+        the same version and update time (e.g. those updated exactly at the
+        cursor, which the search returns again) are left out of it.
+        `max_results` only bounds the first harvest; later ones page back to
+        the cursor.
+        """
+        category = category or self.config.data.arxiv_category
+        key = self._build_query(category, query)
+        cursor = self.load_cursor()
+        
+        fetched = self.search_papers(category, query, max_results, since=cursor.get(key))
+        delta = [p for p in fetched if not self._is_stored(p)]
+        
+        # Upsert into the metadata store; re-versioned papers replace older entries
+        self.papers = delta
+        self.save_metadata()
+        
+        self.save_delta(delta)
+        if fetched:
+            # The search reached the old cursor, so everything newer was fetched
+            cursor[key] = max(p.updated for p in fetched)
+            self.save_cursor(cursor)
+        
+        logger.info(f"Incremental harvest: {len(delta)} new/updated papers, {self.paper_store.count()} total")
+        return delta
+    
+    def _is_stored(self, paper: PaperMetadata) -> bool:
+        """Whether the paper store already holds this version of the paper, equally up to date."""
+        stored = self.paper_store.get(paper.arxiv_id)
+        return stored is not None and (stored.arxiv_id, stored.updated) == (paper.arxiv_id, paper.updated)
+    
+    def save_delta(self, delta: List[PaperMetadata]):
+        """Save the latest harvest delta."""
+        self.delta_file.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "harvested_at": datetime.now().isoformat(),
+            "papers": [asdict(p) for p in delta]
+        }
+        with open(self.delta_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    
+    def load_delta(self) -> List[PaperMetadata]:
+        """Load the papers from the latest incremental harvest."""
+        if not self.delta_file.exists():
+            return []
+        with open(self.delta_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return [PaperMetadata(**p) for p in data["papers"]]
+    
     def download_pdfs(self, papers: Optional[List[PaperMetadata]] = None) -> List[str]:
         """Download PDFs for all papers."""
         papers = papers or self.papers
-        downloaded_paths = []
         
         logger.info(f"Downloading {len(papers)} PDFs...")
         
-        for paper in tqdm(papers, desc="Downloading PDFs"):
-            try:
-                # Create filename from arxiv_id
-                filename = f"{paper.arxiv_id.replace('/', '_')}.pdf"
-                filepath = self.raw_dir / filename
-                
-                if filepath.exists():
-                    logger.debug(f"Already exists: {filename}")
-                    paper.local_pdf_path = str(filepath)
-                    downloaded_paths.append(str(filepath))
+        tasks = []
+        pending = []
+        for paper in papers:
+            entry = self.store.lookup(paper.arxiv_id)
+            if entry is not None and self.store.is_intact(entry):
+                logger.debug(f"Already stored: {paper.arxiv_id}")
+                paper.local_pdf_path = entry.path
+                continue
+            
+            # Create filename from arxiv_id
+            filename = f"{paper.arxiv_id.replace('/', '_')}.pdf"
+            
+            # Adopt files downloaded before the content-addressed store existed
+            legacy_path = self.raw_dir / filename
+            if legacy_path.exists():
+                entry = self.store.add_file(paper.arxiv_id, legacy_path)
+                if entry.is_valid:
+                    paper.local_pdf_path = entry.path
                     continue
-                
-                # Download PDF
-                response = requests.get(paper.pdf_url, timeout=60)
-                response.raise_for_status()
-                
-                filepath.write_bytes(response.content)
-                paper.local_pdf_path = str(filepath)
-                downloaded_paths.append(str(filepath))
-                
-                logger.debug(f"Downloaded: {filename}")
-                
-            except Exception as e:
-                logger.error(f"Failed to download {paper.arxiv_id}: {e}")
+            
+            tasks.append(DownloadTask(key=paper.arxiv_id, url=paper.pdf_url, dest=self.incoming_dir / filename))
+            pending.append(paper)
+        
+        for paper, result in zip(pending, self.downloader.download(tasks)):
+            if not result.ok:
+                continue
+            entry = self.store.add_file(paper.arxiv_id, Path(result.path))
+            if entry.is_valid:
+                paper.local_pdf_path = entry.path
+                logger.debug(f"Downloaded: {paper.arxiv_id}" + (" (resumed)" if result.resumed else ""))
+            else:
+                logger.error(f"Downloaded PDF for {paper.arxiv_id} is corrupt")
         
+        downloaded_paths = [p.local_pdf_path for p in papers if p.local_pdf_path]
         logger.info(f"Downloaded {len(downloaded_paths)} PDFs")
         return downloaded_paths
     
     def save_metadata(self, filepath: Optional[Path] = None):
-        """Save paper metadata to JSON."""
-        filepath = filepath or self.metadata_file
-        filepath.parent.mkdir(parents=True, exist_ok=True)
+        """Upsert paper metadata into the paper store.
         
-        data = {
-            "scraped_at": datetime.now().isoformat(),
-            "category": self.config.data.arxiv_category,
-            "total_papers": len(self.papers),
-            "papers": [asdict(p) for p in self.papers]
-        }
+        If `filepath` is given, the scraped papers are also written there as JSON.
+        """
+        self.paper_store.upsert(self.papers)
+        logger.info(f"Saved {len(self.papers)} papers to {self.paper_store.db_path}")
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
-        logger.info(f"Saved metadata to {filepath}")
+        if filepath is not None:
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            data = {
+                "scraped_at": datetime.now().isoformat(),
+                "category": self.config.data.arxiv_category,
+                "total_papers": len(self.papers),
+                "papers": [asdict(p) for p in self.papers]
+            }
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            logger.info(f"Saved metadata to {filepath}")
     
-    def load_metadata(self, filepath: Optional[Path] = None) -> List[PaperMetadata]:
-        """Load paper metadata from JSON."""
-        filepath = filepath or self.metadata_file
+    def load_metadata(self, filepath: Optional[Path] = None, limit: Optional[int] = None) -> List[PaperMetadata]:
+        """Load paper metadata, most recently published first.
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        Reads the paper store (which imports the legacy JSON file when it opens).
+        If `filepath` is given, that JSON file is read instead.
+        """
+        if filepath is not None:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.papers = [PaperMetadata(**p) for p in data["papers"]][:limit]
+            logger.info(f"Loaded {len(self.papers)} papers from {filepath}")
+            return self.papers
         
-        self.papers = [PaperMetadata(**p) for p in data["papers"]]
-        logger.info(f"Loaded {len(self.papers)} papers from {filepath}")
+        self.papers = list(self.paper_store.iter_papers(limit=limit))
+        logger.info(f"Loaded {len(self.papers)} papers from {self.paper_store.db_path}")
         return self.papers
-
@@ -0,0 +1,295 @@
+"""Sharded, append-only storage for extracted document text."""
+
+import hashlib
+import json
+import mmap
+import sqlite3
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import DATA_DIR
+
+try:
+    import zstandard
+except ImportError:  # Compression is optional
+    zstandard = None
+
+
+CODEC_NONE = 0
+CODEC_ZSTD = 1
+
+# Record header: payload length, codec
+_HEADER = struct.Struct("<IB")
+
+
+class ShardedCorpus:
+    """Documents as length-prefixed JSON records in append-only shard files.
+
+    A SQLite index maps arxiv_id -> (shard, offset, length), so a document can
+    be read with one seek, and sequential scans walk each shard through mmap.
+    Re-adding an id with different content appends a new record and repoints
+    the index; the old record is left in place as dead space until `compact`
+    rewrites the shards. Re-adding an unchanged document writes nothing.
+    """
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        compression: str = "none",
+        shard_size: int = 256 << 20
+    ):
+        if compression not in ("none", "zstd"):
+            raise ValueError(f"Unknown corpus compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compression requires the 'zstandard' package")
+
+        self.root = Path(root) if root else DATA_DIR / "processed" / "corpus"
+        self.db_path = self.root / "index.db"
+        self.codec = CODEC_ZSTD if compression == "zstd" else CODEC_NONE
+        self.shard_size = shard_size
+        self.conn = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Open the index database and create tables."""
+        if self.conn is not None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=10.0, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                arxiv_id TEXT PRIMARY KEY,
+                shard INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                digest TEXT
+            )
+        """)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(documents)")}
+        if "digest" not in columns:
+            # Indexes from before digests: each document is rewritten once on its next add
+            self.conn.execute("ALTER TABLE documents ADD COLUMN digest TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_pos ON documents(shard, offset)")
+        self.conn.commit()
+
+    def shard_path(self, shard: int) -> Path:
+        """Path of a shard file."""
+        return self.root / f"shard-{shard:05d}.bin"
+
+    def _tail_shard(self) -> int:
+        """Number of the shard currently being appended to."""
+        shards = sorted(self.root.glob("shard-*.bin"))
+        return int(shards[-1].stem.split("-")[1]) if shards else 0
+
+    def _encode(self, doc: Dict) -> Tuple[bytes, str]:
+        """Stored payload and digest of the uncompressed record."""
+        payload = json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+        if self.codec == CODEC_ZSTD:
+            payload = zstandard.ZstdCompressor(level=3).compress(payload)
+        return payload, digest
+
+    @staticmethod
+    def _decode(payload: bytes, codec: int) -> Dict:
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise ImportError("Reading zstd records requires the 'zstandard' package")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        return json.loads(payload)
+
+    def add(self, documents: Iterable[Dict]) -> int:
+        """Append documents (dicts with an `arxiv_id`). Returns the number written.
+        
+        Documents stored with identical content are skipped, so adding the
+        same extraction again does not grow the corpus.
+        """
+        self.connect()
+        with self._lock:
+            shard = self._tail_shard()
+            rows = []
+            written = {}  # Digests of this call's records, which the index does not show yet
+            f = open(self.shard_path(shard), "ab")
+            try:
+                for doc in documents:
+                    payload, digest = self._encode(doc)
+                    stored = written.get(doc["arxiv_id"])
+                    if stored is None:
+                        row = self.conn.execute(
+                            "SELECT digest FROM documents WHERE arxiv_id = ?", (doc["arxiv_id"],)
+                        ).fetchone()
+                        stored = row["digest"] if row else None
+                    if stored == digest:
+                        continue
+                    if f.tell() > 0 and f.tell() + _HEADER.size + len(payload) > self.shard_size:
+                        f.close()
+                        shard += 1
+                        f = open(self.shard_path(shard), "ab")
+                    offset = f.tell()
+                    f.write(_HEADER.pack(len(payload), self.codec))
+                    f.write(payload)
+                    rows.append((doc["arxiv_id"], shard, offset, len(payload), digest))
+                    written[doc["arxiv_id"]] = digest
+            finally:
+                f.close()
+
+            # Records are flushed before the index points at them
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO documents (arxiv_id, shard, offset, length, digest) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+        return len(rows)
+
+    def get(self, arxiv_id: str) -> Optional[Dict]:
+        """Read one document by arxiv_id."""
+        self.connect()
+        row = self.conn.execute(
+            "SELECT shard, offset, length FROM documents WHERE arxiv_id = ?", (arxiv_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        with open(self.shard_path(row["shard"]), "rb") as f:
+            f.seek(row["offset"])
+            length, codec = _HEADER.unpack(f.read(_HEADER.size))
+            return self._decode(f.read(length), codec)
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Scan all live documents in storage order."""
+        self.connect()
+        cursor = self.conn.execute("SELECT shard, offset FROM documents ORDER BY shard, offset")
+        shard = None
+        f = mm = None
+        try:
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    if row["shard"] != shard:
+                        if mm is not None:
+                            mm.close()
+                            f.close()
+                        shard = row["shard"]
+                        f = open(self.shard_path(shard), "rb")
+                        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    start = row["offset"] + _HEADER.size
+                    length, codec = _HEADER.unpack_from(mm, row["offset"])
+                    yield self._decode(mm[start:start + length], codec)
+        finally:
+            if mm is not None:
+                mm.close()
+                f.close()
+
+    def __len__(self) -> int:
+        self.connect()
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def __contains__(self, arxiv_id: str) -> bool:
+        self.connect()
+        return self.conn.execute(
+            "SELECT 1 FROM documents WHERE arxiv_id = ?", (arxiv_id,)
+        ).fetchone() is not None
+
+    def ids(self) -> List[str]:
+        """All stored arxiv ids."""
+        self.connect()
+        return [row[0] for row in self.conn.execute("SELECT arxiv_id FROM documents")]
+
+    def get_stats(self) -> Dict:
+        """Document count, bytes of live records and bytes on disk (the rest is dead)."""
+        self.connect()
+        documents, live_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) + COUNT(*) * ? FROM documents", (_HEADER.size,)
+        ).fetchone()
+        disk_bytes = sum(path.stat().st_size for path in self.root.glob("shard-*.bin"))
+        return {
+            "documents": documents,
+            "live_bytes": live_bytes,
+            "disk_bytes": disk_bytes,
+            "dead_bytes": disk_bytes - live_bytes
+        }
+
+    def compact(self, min_dead_ratio: float = 0.0) -> int:
+        """Copy live records into fresh shards and delete the old ones.
+
+        Skipped unless at least `min_dead_ratio` of the bytes on disk are dead.
+        New shards are numbered after the old ones and the index is repointed
+        in one transaction before anything is deleted, so an interrupted
+        compaction leaves the corpus intact. Run it while nothing else reads
+        the corpus. Returns the number of bytes reclaimed.
+        """
+        stats = self.get_stats()
+        if not stats["dead_bytes"] or stats["dead_bytes"] < min_dead_ratio * stats["disk_bytes"]:
+            return 0
+
+        with self._lock:
+            old_shards = sorted(self.root.glob("shard-*.bin"))
+            shard = self._tail_shard() + 1
+            rows = []
+            out = open(self.shard_path(shard), "ab")
+            src = None
+            src_shard = None
+            try:
+                cursor = self.conn.execute(
+                    "SELECT arxiv_id, shard, offset, length FROM documents ORDER BY shard, offset"
+                )
+                for row in cursor:
+                    if row["shard"] != src_shard:
+                        if src is not None:
+                            src.close()
+                        src_shard = row["shard"]
+                        src = open(self.shard_path(src_shard), "rb")
+                    # Records are copied as stored, without decoding
+                    src.seek(row["offset"])
+                    record = src.read(_HEADER.size + row["length"])
+                    if out.tell() > 0 and out.tell() + len(record) > self.shard_size:
+                        out.close()
+                        shard += 1
+                        out = open(self.shard_path(shard), "ab")
+                    rows.append((shard, out.tell(), row["arxiv_id"]))
+                    out.write(record)
+            finally:
+                out.close()
+                if src is not None:
+                    src.close()
+
+            self.conn.executemany("UPDATE documents SET shard = ?, offset = ? WHERE arxiv_id = ?", rows)
+            self.conn.commit()
+            for path in old_shards:
+                path.unlink()
+
+        reclaimed = stats["disk_bytes"] - self.get_stats()["disk_bytes"]
+        logger.info(f"Compacted corpus: {len(rows)} documents, {reclaimed / (1 << 20):.1f} MB reclaimed")
+        return reclaimed
+
+    def import_json_dir(self, json_dir: Path) -> int:
+        """One-time import of the legacy one-JSON-file-per-paper layout."""
+        json_dir = Path(json_dir)
+        if not json_dir.is_dir():
+            return 0
+
+        def load():
+            for path in sorted(json_dir.glob("*.json")):
+                with open(path, 'r', encoding='utf-8') as f:
+                    doc = json.load(f)
+                if doc.get("arxiv_id") and doc["arxiv_id"] not in self:
+                    yield doc
+
+        imported = self.add(load())
+        if imported:
+            logger.info(f"Imported {imported} documents from {json_dir}")
+        return imported
+
+    def close(self):
+        """Close the index database."""
+        if self.conn:
+            self.conn.close()
+            self.conn = None
@@ -1,53 +1,190 @@
 # modules/m2_data_collection/data_cleaner.py
 """Data cleaning and deduplication."""
 
+import hashlib
 import re
-from typing import List, Set
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
 from langdetect import detect, LangDetectException
 from datasketch import MinHash, MinHashLSH
+from datasketch.hashfunc import sha1_hash32
 from loguru import logger
 
+from .dedup_index import DedupIndex
+from .pdf_store import split_version
+from .language_id import LanguageIdentifier, DEFAULT_CACHE_PATH
+
+
+# Cleaning patterns, compiled once
+_HTML_RE = re.compile(r'<[^>]+>')
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_PHONE_RE = re.compile(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b')
+_CARD_RE = re.compile(r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b')
+_SPECIAL_RE = re.compile(r'[^\w\s.,!?;:\-\'\"()\[\]{}]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Every email contains '@', and its match lies inside the run of local-part
+# characters before the '@' and domain characters after it. Scanning only
+# those windows (with the real text around them, so \b still sees the
+# neighbouring characters) finds the same matches as scanning the whole text.
+_EMAIL_LOCAL_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._%+-")
+_EMAIL_DOMAIN_RUN_RE = re.compile(r'[A-Za-z0-9.|-]*')
+
+# Phone and card numbers in one scan. Matching the first digit before checking
+# the word boundary (via lookbehind) lets the engine skip non-digits quickly.
+_NUMBER_PII_RE = re.compile(
+    r'\d(?<=\b\d)(?:'
+    r'(?P<PHONE>\d{2}[-.]?\d{3}[-.]?\d{4}\b)'
+    r'|(?P<CARD>\d{3}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b))'
+)
+
+# A special character becomes a space and then merges with neighbouring
+# whitespace, so both steps reduce to joining the runs of kept characters
+_KEPT_RUN_RE = re.compile(r'[\w.,!?;:\-\'\"()\[\]{}]+')
+
+# With `keep_lines`, the same merge stops at newlines: each run of special and
+# non-newline whitespace characters becomes a space, then each run of line
+# breaks (with the spaces around them) becomes one newline
+_SEPARATOR_RE = re.compile(r'[^\w.,!?;:\-\'\"()\[\]{}\n]+')
+_LINE_BREAK_RE = re.compile(r' ?\n[ \n]*')
+
+
+def _replace_emails(text: str) -> str:
+    k = text.find('@')
+    if k < 0:
+        return text
+    
+    windows = []
+    while k >= 0:
+        start = k
+        while start > 0 and text[start - 1] in _EMAIL_LOCAL_CHARS:
+            start -= 1
+        end = _EMAIL_DOMAIN_RUN_RE.match(text, k + 1).end()
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = end
+        else:
+            windows.append([start, end])
+        k = text.find('@', end)
+    
+    pieces = []
+    pos = 0
+    for start, end in windows:
+        for match in _EMAIL_RE.finditer(text, start, end + 1):
+            pieces.append(text[pos:match.start()])
+            pieces.append('[EMAIL]')
+            pos = match.end()
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+
+
+def _number_token(match: re.Match) -> str:
+    return f"[{match.lastgroup}]"
+
+
+def clean_text(text: str, keep_lines: bool = False) -> str:
+    """Single-text cleaning: HTML, PII, special characters and whitespace.
+    
+    Same output as applying the `DataCleaner._remove_*` steps in order, with
+    fewer and cheaper passes over the text. With `keep_lines`, line breaks
+    survive whitespace normalization (one newline per run of them), so
+    section headers stay at the start of a line for the chunker.
+    """
+    if '<' in text:
+        text = _HTML_RE.sub('', text)
+    text = _replace_emails(text)
+    text = _NUMBER_PII_RE.sub(_number_token, text)
+    if keep_lines:
+        text = _SEPARATOR_RE.sub(' ', text)
+        return _LINE_BREAK_RE.sub('\n', text).strip()
+    return ' '.join(_KEPT_RUN_RE.findall(text))
+
 
 class DataCleaner:
     """Cleans and deduplicates text data."""
     
-    def __init__(self, similarity_threshold: float = 0.7):
+    def __init__(
+        self,
+        similarity_threshold: float = 0.7,
+        num_perm: int = 128,
+        persistent: bool = False,
+        index_dir: Optional[Path] = None,
+        workers: int = 1,
+        language_id: Optional[LanguageIdentifier] = None
+    ):
         self.similarity_threshold = similarity_threshold
-        self.lsh = MinHashLSH(threshold=similarity_threshold, num_perm=128)
-        self.seen_hashes: Set[str] = set()
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None  # Started on first parallel clean, then reused
+        self._pool_workers = 0
+        self.num_perm = num_perm
+        self.lsh = MinHashLSH(threshold=similarity_threshold, num_perm=num_perm)
+        self.seen_hashes: Set[str] = set()  # Fingerprints of every text checked so far
+        self.dedup_stats = {"seen_before": 0, "exact": 0, "near": 0, "minhashed": 0, "kept": 0}
         
-    def clean_text(self, text: str) -> str:
+        # With `persistent`, documents are also compared with those kept in earlier runs
+        self.index = DedupIndex(index_dir, similarity_threshold, num_perm) if persistent else None
+        self.language_id = language_id or LanguageIdentifier(
+            DEFAULT_CACHE_PATH if persistent else None, workers=workers
+        )
+        
+    def clean_text(self, text: str, keep_lines: bool = False) -> str:
         """Apply all cleaning operations to text."""
-        text = self._remove_html(text)
-        text = self._remove_pii(text)
-        text = self._remove_special_chars(text)
-        text = self._normalize_whitespace(text)
-        return text
+        return clean_text(text, keep_lines)
+    
+    def clean_many(
+        self,
+        texts: List[str],
+        workers: Optional[int] = None,
+        chunksize: int = 16,
+        keep_lines: bool = False
+    ) -> List[str]:
+        """Clean many texts, in a process pool when `workers` > 1. Order is preserved.
+        
+        The pool is started once and reused by later calls (e.g. one per
+        micro-batch) until `close`; batches too small to keep every worker
+        busy are cleaned in this process.
+        """
+        workers = workers or self.workers
+        if workers <= 1 or len(texts) < 2 * workers:
+            return [clean_text(t, keep_lines) for t in texts]
+        if self._pool is None or self._pool_workers != workers:
+            self.close_pool()
+            self._pool = ProcessPoolExecutor(max_workers=workers)
+            self._pool_workers = workers
+        # Small batches are spread over all workers rather than sent as one task
+        chunksize = max(1, min(chunksize, len(texts) // workers))
+        clean = partial(clean_text, keep_lines=keep_lines)
+        return list(self._pool.map(clean, texts, chunksize=chunksize))
+    
+    def close_pool(self):
+        """Stop the cleaning worker processes (restarted by the next parallel call)."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
     
     def _remove_html(self, text: str) -> str:
         """Remove HTML tags."""
-        return re.sub(r'<[^>]+>', '', text)
+        return _HTML_RE.sub('', text)
     
     def _remove_pii(self, text: str) -> str:
         """Remove PII (emails, phone numbers, credit cards)."""
         # Email
-        text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[EMAIL]', text)
+        text = _EMAIL_RE.sub('[EMAIL]', text)
         # Phone numbers (various formats)
-        text = re.sub(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b', '[PHONE]', text)
+        text = _PHONE_RE.sub('[PHONE]', text)
         # Credit card numbers
-        text = re.sub(r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b', '[CARD]', text)
+        text = _CARD_RE.sub('[CARD]', text)
         return text
     
     def _remove_special_chars(self, text: str) -> str:
         """Remove special characters but keep essential punctuation."""
         # Keep alphanumeric, common punctuation, and whitespace
-        text = re.sub(r'[^\w\s.,!?;:\-\'\"()\[\]{}]', ' ', text)
-        return text
+        return _SPECIAL_RE.sub(' ', text)
     
     def _normalize_whitespace(self, text: str) -> str:
         """Normalize whitespace."""
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        return _WHITESPACE_RE.sub(' ', text).strip()
     
     def detect_language(self, text: str) -> str:
         """Detect language of text."""
@@ -62,57 +199,179 @@ class DataCleaner:
     
     def _get_minhash(self, text: str) -> MinHash:
         """Create MinHash from text."""
-        m = MinHash(num_perm=128)
+        m = MinHash(num_perm=self.num_perm)
         words = text.lower().split()
         for word in words:
             m.update(word.encode('utf-8'))
         return m
     
+    @staticmethod
+    def _fingerprint(text: str) -> str:
+        """64-bit hash of case- and whitespace-normalized text."""
+        normalized = ' '.join(text.lower().split())
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+    
+    def _is_exact_duplicate(self, fingerprint: str) -> bool:
+        """Tier one: True if the normalized text was already checked, else remember it."""
+        if fingerprint in self.seen_hashes:
+            return True
+        self.seen_hashes.add(fingerprint)
+        return False
+    
+    @staticmethod
+    def _dedup_key(doc_id: Optional[str], fingerprint: str) -> str:
+        """Index key: the arxiv id without version, so a new version replaces the old
+        entry, or the text itself for documents without an id."""
+        return split_version(doc_id)[0] if doc_id else f"text:{fingerprint}"
+    
+    def _seen_before(self, key: str, fingerprint: str) -> bool:
+        """Kept in an earlier run with exactly this text (persistent index only)."""
+        return self.index is not None and self.index.get_tag(key) == fingerprint
+    
     def is_duplicate(self, text: str, doc_id: str) -> bool:
-        """Check if text is duplicate using MinHash LSH."""
+        """Check if text is duplicate: exact fingerprint first, then MinHash LSH."""
+        fingerprint = self._fingerprint(text)
+        key = self._dedup_key(doc_id, fingerprint)
+        if self._seen_before(key, fingerprint):
+            self._is_exact_duplicate(fingerprint)
+            return False
+        
+        if self._is_exact_duplicate(fingerprint):
+            return True
+        
         m = self._get_minhash(text)
+        return not self._keep(key, m, fingerprint)
+    
+    def _keep(self, key: str, m: MinHash, fingerprint: str) -> bool:
+        """Insert `m` unless a similar document is already indexed.
+        
+        Similar entries for the same paper (earlier versions, or a versioned
+        key from an older index) are not duplicates: they are replaced.
+        """
+        index = self.index if self.index is not None else self.lsh
         
         # Query for similar documents
-        result = self.lsh.query(m)
+        matches = index.query(m)
+        own = {match for match in matches if split_version(match)[0] == key}
+        if len(own) < len(matches):
+            return False
         
-        if result:
-            return True
+        # Add to LSH index, in place of the paper's previous entries
+        if key in index:
+            own.add(key)
+        for match in own:
+            index.remove(match)
+        if self.index is not None:
+            self.index.insert(key, m, tag=fingerprint)
+        else:
+            self.lsh.insert(key, m)
+        return True
+    
+    def minhash_batch(self, texts: Iterable[str]) -> List[MinHash]:
+        """MinHashes for many texts, identical to `_get_minhash` per text.
         
-        # Add to LSH index
-        self.lsh.insert(doc_id, m)
-        return False
+        Each text's distinct words are permuted in one vectorized
+        `update_batch` call, and word hashes are computed once per batch
+        instead of once per occurrence.
+        """
+        token_hashes = {}
+        
+        def hashfunc(token: str) -> int:
+            h = token_hashes.get(token)
+            if h is None:
+                h = token_hashes[token] = sha1_hash32(token.encode('utf-8'))
+            return h
+        
+        # Copying a template reuses its permutations instead of regenerating them
+        template = MinHash(num_perm=self.num_perm, hashfunc=hashfunc)
+        minhashes = []
+        for text in texts:
+            m = template.copy()
+            # Repeated words cannot change a minimum, so hash each once
+            m.update_batch(set(text.lower().split()))
+            minhashes.append(m)
+        return minhashes
     
     def deduplicate_batch(self, documents: List[dict]) -> List[dict]:
-        """Remove duplicate documents from a batch."""
-        unique_docs = []
+        """Remove duplicate documents from a batch (and from earlier runs if persistent).
         
+        Exact duplicates (same normalized text) are dropped by fingerprint before
+        any MinHash is computed; only the survivors go through LSH. Decisions are
+        the same as MinHash alone, since identical texts have identical signatures.
+        Documents are keyed by arxiv id without version: a new version of a
+        paper kept in an earlier run replaces that entry instead of counting
+        as its near-duplicate. New persistent entries are written by `save`.
+        """
+        keys = []
+        texts = []
+        fingerprints = []
         for doc in documents:
-            doc_id = doc.get("arxiv_id", str(len(unique_docs)))
             text = doc.get("full_text", doc.get("abstract", ""))
-            
-            if not self.is_duplicate(text, doc_id):
+            fingerprint = self._fingerprint(text)
+            keys.append(self._dedup_key(doc.get("arxiv_id"), fingerprint))
+            texts.append(text)
+            fingerprints.append(fingerprint)
+        
+        # Documents kept before with the same text need no hashing
+        seen = [self._seen_before(key, fp) for key, fp in zip(keys, fingerprints)]
+        exact = [self._is_exact_duplicate(fp) and not was_seen for fp, was_seen in zip(fingerprints, seen)]
+        survivors = [text for text, was_seen, is_exact in zip(texts, seen, exact) if not (was_seen or is_exact)]
+        minhashes = iter(self.minhash_batch(survivors))
+        
+        stats = {
+            "seen_before": sum(seen), "exact": sum(exact), "near": 0,
+            "minhashed": len(survivors), "kept": 0
+        }
+        unique_docs = []
+        for doc, key, fingerprint, was_seen, is_exact in zip(documents, keys, fingerprints, seen, exact):
+            if is_exact:
+                continue
+            # Query before inserting so decisions match `is_duplicate`
+            if was_seen or self._keep(key, next(minhashes), fingerprint):
                 unique_docs.append(doc)
+            else:
+                stats["near"] += 1
+        stats["kept"] = len(unique_docs)
+        for key, value in stats.items():
+            self.dedup_stats[key] += value
         
         removed = len(documents) - len(unique_docs)
         if removed > 0:
             logger.info(f"Removed {removed} duplicate documents")
+        logger.info(
+            f"Dedup tiers: {stats['exact']} exact (no MinHash), {stats['near']} near, "
+            f"{stats['minhashed']}/{len(documents)} MinHashed, {stats['seen_before']} seen in earlier runs"
+        )
         
         return unique_docs
     
-    def process_batch(self, documents: List[dict]) -> List[dict]:
-        """Full processing pipeline for documents."""
+    def save(self):
+        """Persist documents kept since the last save (once per run; no-op if not persistent)."""
+        if self.index is not None:
+            self.index.save()
+    
+    def close(self):
+        """Stop the worker pools and close the language verdict cache."""
+        self.close_pool()
+        self.language_id.close()
+    
+    def process_batch(self, documents: List[dict], keep_lines: bool = False) -> List[dict]:
+        """Full processing pipeline for documents (`keep_lines` as in `clean_text`)."""
         processed = []
         
-        for doc in documents:
-            # Clean text
-            if "full_text" in doc:
-                doc["full_text"] = self.clean_text(doc["full_text"])
-            if "abstract" in doc:
-                doc["abstract"] = self.clean_text(doc["abstract"])
-            
-            # Language filter
-            text = doc.get("full_text", doc.get("abstract", ""))
-            if not self.is_english(text):
+        # Clean text
+        for field in ("full_text", "abstract"):
+            docs = [doc for doc in documents if field in doc]
+            cleaned_texts = self.clean_many([doc[field] for doc in docs], keep_lines=keep_lines)
+            for doc, cleaned in zip(docs, cleaned_texts):
+                doc[field] = cleaned
+        
+        # Language filter
+        languages = self.language_id.detect_many(
+            [doc.get("full_text", doc.get("abstract", "")) for doc in documents]
+        )
+        for doc, language in zip(documents, languages):
+            if language != "en":
                 logger.debug(f"Skipping non-English: {doc.get('arxiv_id', 'unknown')}")
                 continue
             
@@ -0,0 +1,198 @@
+"""Persistent MinHash LSH index for cross-run deduplication."""
+
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from datasketch import MinHash, MinHashLSH
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import DATA_DIR
+
+
+class DedupIndex:
+    """MinHash signatures and LSH buckets of every document kept so far.
+
+    Layout under `root`:
+        keys.txt        per row, the document id and an optional tag
+                        (tab-separated), or an empty line for a replaced row
+        signatures.bin  raw signature rows in the same order, append-only
+        lsh.pkl         pickled MinHashLSH, rewritten on save
+        meta.json       parameters and committed row count, written last
+
+    Nothing is read until the index is first used. Rows past the committed
+    count (from an interrupted save) are ignored, and the LSH is rebuilt from
+    the stored signatures if its pickle is missing or stale. Re-inserting an
+    id appends a new row and leaves the old one dead.
+    """
+
+    def __init__(self, root: Optional[Path] = None, threshold: float = 0.7, num_perm: int = 128):
+        self.root = Path(root) if root else DATA_DIR / "processed" / "dedup"
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self._template = MinHash(num_perm=num_perm)
+        self.dtype = self._template.hashvalues.dtype
+
+        self.lsh: Optional[MinHashLSH] = None
+        self._rows: List[str] = []  # Id of each row, in row order
+        self._positions: Dict[str, int] = {}  # Live row of each id
+        self._tags: Dict[str, str] = {}
+        self._saved: Optional[np.ndarray] = None
+        self._pending_rows: List[np.ndarray] = []
+        self._dirty = False
+
+    @property
+    def loaded(self) -> bool:
+        return self.lsh is not None
+
+    def load(self):
+        """Read the index from disk (no-op if already loaded)."""
+        if self.loaded:
+            return
+
+        meta_path = self.root / "meta.json"
+        count = 0
+        if meta_path.exists():
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            expected = {"threshold": self.threshold, "num_perm": self.num_perm, "dtype": self.dtype.name}
+            found = {k: meta.get(k) for k in expected}
+            if found != expected:
+                raise ValueError(f"Dedup index at {self.root} was built with {found}, not {expected}")
+            count = meta["count"]
+
+        if count:
+            with open(self.root / "keys.txt", 'r', encoding='utf-8') as f:
+                lines = [line.rstrip("\n") for _, line in zip(range(count), f)]
+            for i, line in enumerate(lines):
+                key, _, tag = line.partition("\t")
+                self._rows.append(key)
+                if key:
+                    self._positions[key] = i
+                    if tag:
+                        self._tags[key] = tag
+            self._saved = np.memmap(
+                self.root / "signatures.bin", dtype=self.dtype, mode="r", shape=(count, self.num_perm)
+            )
+
+        lsh_path = self.root / "lsh.pkl"
+        if count and lsh_path.exists() and meta.get("lsh_count") == count:
+            with open(lsh_path, 'rb') as f:
+                self.lsh = pickle.load(f)
+        else:
+            self.lsh = MinHashLSH(threshold=self.threshold, num_perm=self.num_perm)
+            for key, i in self._positions.items():
+                self.lsh.insert(key, self._to_minhash(self._saved[i]))
+            if count:
+                logger.info(f"Rebuilt dedup LSH from {count} stored signatures")
+
+        logger.info(f"Loaded dedup index with {len(self._positions)} documents")
+
+    def _to_minhash(self, row: np.ndarray) -> MinHash:
+        m = self._template.copy()
+        m.hashvalues = np.array(row, dtype=self.dtype)
+        return m
+
+    def __len__(self) -> int:
+        self.load()
+        return len(self._positions)
+
+    def __contains__(self, key: str) -> bool:
+        self.load()
+        return key in self._positions
+
+    def get_tag(self, key: str) -> Optional[str]:
+        """Tag stored with a document by `insert`, if any."""
+        self.load()
+        return self._tags.get(key)
+
+    def get_minhash(self, key: str) -> Optional[MinHash]:
+        """Stored MinHash for a document, without recomputing it from text."""
+        self.load()
+        i = self._positions.get(key)
+        if i is None:
+            return None
+        saved = 0 if self._saved is None else len(self._saved)
+        row = self._saved[i] if i < saved else self._pending_rows[i - saved]
+        return self._to_minhash(row)
+
+    def query(self, m: MinHash) -> List[str]:
+        """Ids of indexed documents likely similar to `m`."""
+        self.load()
+        return self.lsh.query(m)
+
+    def insert(self, key: str, m: MinHash, tag: Optional[str] = None):
+        """Add a document, replacing any entry with the same id; persisted on the next `save`."""
+        self.load()
+        self.remove(key)
+        self.lsh.insert(key, m)
+        self._positions[key] = len(self._rows)
+        self._rows.append(key)
+        if tag:
+            self._tags[key] = tag
+        self._pending_rows.append(np.asarray(m.hashvalues, dtype=self.dtype))
+        self._dirty = True
+
+    def remove(self, key: str):
+        """Drop a document (its row stays on disk, dead); persisted on the next `save`."""
+        self.load()
+        if self._positions.pop(key, None) is None:
+            return
+        self.lsh.remove(key)
+        self._tags.pop(key, None)
+        self._dirty = True
+
+    def save(self):
+        """Append new signatures and rewrite the key list and LSH pickle."""
+        if not self.loaded or not self._dirty:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        saved = 0 if self._saved is None else len(self._saved)
+
+        # Drop rows left behind by an interrupted save before appending
+        sig_path = self.root / "signatures.bin"
+        committed_bytes = saved * self.num_perm * self.dtype.itemsize
+        if sig_path.exists() and sig_path.stat().st_size > committed_bytes:
+            os.truncate(sig_path, committed_bytes)
+        if self._pending_rows:
+            with open(sig_path, 'ab') as f:
+                f.write(np.stack(self._pending_rows).tobytes())
+
+        tmp_path = self.root / "keys.txt.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for i, key in enumerate(self._rows):
+                if self._positions.get(key) != i:
+                    f.write("\n")
+                elif key in self._tags:
+                    f.write(f"{key}\t{self._tags[key]}\n")
+                else:
+                    f.write(f"{key}\n")
+        os.replace(tmp_path, self.root / "keys.txt")
+
+        tmp_path = self.root / "lsh.pkl.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self.lsh, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.root / "lsh.pkl")
+
+        # The committed count makes the appended rows visible
+        count = len(self._rows)
+        meta = {
+            "threshold": self.threshold, "num_perm": self.num_perm, "dtype": self.dtype.name,
+            "count": count, "lsh_count": count
+        }
+        tmp_path = self.root / "meta.json.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.root / "meta.json")
+
+        self._saved = np.memmap(
+            self.root / "signatures.bin", dtype=self.dtype, mode="r", shape=(count, self.num_perm)
+        )
+        self._pending_rows = []
+        self._dirty = False
+        logger.info(f"Saved dedup index with {len(self._positions)} documents")
@@ -0,0 +1,193 @@
+"""Concurrent, resumable PDF downloading."""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from loguru import logger
+
+
+# HTTP statuses worth retrying; others (e.g. 404) fail the task at once
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+@dataclass
+class DownloadTask:
+    """A single file to fetch."""
+    key: str
+    url: str
+    dest: Path
+
+
+@dataclass
+class DownloadResult:
+    """Outcome of a download task."""
+    key: str
+    url: str
+    path: Optional[str] = None
+    bytes_written: int = 0
+    resumed: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.path is not None and self.error is None
+
+
+class HostRateLimiter:
+    """Spaces out request starts to the same host."""
+
+    def __init__(self, min_interval: float = 0.5):
+        self.min_interval = min_interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """Block until the host of `url` may receive another request."""
+        if self.min_interval <= 0:
+            return
+
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PDFDownloader:
+    """Downloads files with a bounded thread pool and a shared session.
+
+    Bodies are streamed to `<dest>.part` and atomically renamed once complete.
+    A leftover `.part` file is resumed with an HTTP Range request. Failed
+    requests are retried by `download_one` alone (the session does not retry),
+    with exponential backoff and each attempt going through the rate limiter.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        min_interval: float = 0.5,
+        timeout: float = 60.0,
+        chunk_size: int = 1 << 16,
+        max_retries: int = 3,
+        backoff_factor: float = 1.0
+    ):
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.rate_limiter = HostRateLimiter(min_interval)
+        self.session = self._create_session()
+
+    def _create_session(self) -> requests.Session:
+        """Create a connection-pooled session (retries are left to `download_one`)."""
+        adapter = HTTPAdapter(
+            pool_connections=self.max_workers,
+            pool_maxsize=self.max_workers,
+            max_retries=0
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def download(self, tasks: List[DownloadTask], desc: str = "Downloading PDFs") -> List[DownloadResult]:
+        """Download all tasks concurrently. Results are returned in task order."""
+        results: List[Optional[DownloadResult]] = [None] * len(tasks)
+        if not tasks:
+            return []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.download_one, task): i for i, task in enumerate(tasks)}
+            for future in tqdm(as_completed(futures), total=len(futures), desc=desc):
+                results[futures[future]] = future.result()
+
+        return results
+
+    def download_one(self, task: DownloadTask) -> DownloadResult:
+        """Download a single task, retrying and resuming interrupted transfers."""
+        result = DownloadResult(key=task.key, url=task.url)
+        task.dest.parent.mkdir(parents=True, exist_ok=True)
+        part_path = task.dest.with_name(task.dest.name + ".part")
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(delay)
+            try:
+                written, resumed = self._fetch(task.url, part_path)
+                os.replace(part_path, task.dest)
+                result.path = str(task.dest)
+                result.bytes_written += written
+                result.resumed = result.resumed or resumed
+                result.error = None
+                return result
+            except (requests.RequestException, IOError) as e:
+                result.error = str(e)
+                logger.debug(f"Attempt {attempt + 1} failed for {task.key}: {e}")
+                response = getattr(e, "response", None)
+                if response is not None and response.status_code not in RETRY_STATUSES:
+                    break
+                delay = self.backoff_factor * 2 ** attempt
+                retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+
+        logger.error(f"Failed to download {task.key}: {result.error}")
+        return result
+
+    def _fetch(self, url: str, part_path: Path):
+        """Stream `url` into `part_path`, resuming from its current size."""
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        self.rate_limiter.wait(url)
+        with self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+            if response.status_code == 416 and offset:
+                # Range past the end: the partial file is either complete or stale
+                total = self._total_from_content_range(response.headers.get("Content-Range", ""))
+                if total == offset:
+                    return 0, True
+                part_path.unlink()
+                raise IOError(f"Discarded stale partial file for {url}")
+
+            response.raise_for_status()
+
+            resumed = bool(offset) and response.status_code == 206
+            if not resumed:
+                offset = 0  # Server ignored the Range header; start over
+
+            expected = response.headers.get("Content-Length")
+            written = 0
+            with open(part_path, "ab" if resumed else "wb") as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        written += len(chunk)
+
+            if expected is not None and written != int(expected):
+                raise IOError(f"Incomplete body for {url}: {written}/{expected} bytes")
+
+        return written, resumed
+
+    @staticmethod
+    def _total_from_content_range(value: str) -> Optional[int]:
+        """Parse the total size from a `bytes */1234` Content-Range header."""
+        total = value.rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+
+    def close(self):
+        """Close the underlying session."""
+        self.session.close()
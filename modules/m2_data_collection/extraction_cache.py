@@ -0,0 +1,72 @@
+"""Cache of extracted PDF text keyed by content hash."""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import DATA_DIR
+
+
+class ExtractionCache:
+    """Stores extraction output per (PDF sha256, extractor version).
+
+    Entries hold `full_text`, page offsets and the page count; document
+    identity (arxiv_id, title, path) is supplied by the caller on load, so
+    the same PDF under two ids shares one entry.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else DATA_DIR / "processed" / "extract_cache"
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, sha256: str, version: int) -> Path:
+        return self.cache_dir / sha256[:2] / f"{sha256}-v{version}.json"
+
+    def contains(self, sha256: str, version: int) -> bool:
+        """Whether an entry exists, without reading it (counts a miss; `get` counts the hit)."""
+        if self._entry_path(sha256, version).exists():
+            return True
+        self.misses += 1
+        return False
+
+    def get(self, sha256: str, version: int) -> Optional[Dict]:
+        """Return the cached entry, or None (counts a hit or a miss)."""
+        path = self._entry_path(sha256, version)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, sha256: str, version: int, full_text: str, page_offsets, num_pages: int):
+        """Write an entry atomically."""
+        path = self._entry_path(sha256, version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"full_text": full_text, "page_offsets": page_offsets, "num_pages": num_pages}
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def reset_stats(self):
+        """Zero the hit/miss counters."""
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters and hit rate."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -0,0 +1,153 @@
+"""Sampled, cached and parallel language identification."""
+
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from langdetect import DetectorFactory, detect, LangDetectException
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import DATA_DIR
+
+
+UNKNOWN = "unknown"
+DEFAULT_CACHE_PATH = DATA_DIR / "processed" / "langid.db"
+
+
+def sample_windows(text: str, num_windows: int = 3, window_chars: int = 300) -> str:
+    """Fixed, evenly spaced windows of `text`, joined (the whole text if short)."""
+    if len(text) <= num_windows * window_chars:
+        return text
+    step = len(text) // num_windows
+    return "\n".join(text[i * step:i * step + window_chars] for i in range(num_windows))
+
+
+def _seed_langdetect(seed: int):
+    # langdetect draws random n-gram samples; a fixed seed makes verdicts repeatable
+    DetectorFactory.seed = seed
+
+
+def _detect_sample(sample: str) -> str:
+    try:
+        return detect(sample)
+    except LangDetectException:
+        return UNKNOWN
+
+
+class LanguageIdentifier:
+    """Language verdicts for many texts.
+
+    Each text is reduced to a few fixed windows before detection, misses are
+    detected in a seeded process pool, and verdicts are cached in SQLite by
+    content hash (plus sampling parameters), so unchanged texts are never
+    re-detected. `cache_path=None` keeps the cache in memory. The pool is
+    started once and reused until `close`; small batches are detected in
+    this process.
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[Path] = None,
+        workers: int = 1,
+        num_windows: int = 3,
+        window_chars: int = 300,
+        seed: int = 0,
+        chunksize: int = 32
+    ):
+        self.cache_path = cache_path
+        self.workers = workers
+        self.num_windows = num_windows
+        self.window_chars = window_chars
+        self.seed = seed
+        self.chunksize = chunksize
+        self.conn = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def connect(self):
+        """Open the verdict cache."""
+        if self.conn is not None:
+            return
+        if self.cache_path is not None:
+            Path(self.cache_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(
+            str(self.cache_path) if self.cache_path else ":memory:", timeout=10.0, check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                key TEXT PRIMARY KEY,
+                lang TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16)
+        # Verdicts depend on the sampling, so it is part of the key
+        digest.update(f"|{self.num_windows}|{self.window_chars}|{self.seed}".encode())
+        return digest.hexdigest()
+
+    def detect_many(self, texts: List[str]) -> List[str]:
+        """Language code per text, in input order (`unknown` if undetectable)."""
+        self.connect()
+        keys = [self._key(t) for t in texts]
+
+        verdicts = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), 500):
+            batch = unique_keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, lang FROM verdicts WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            verdicts.update(rows)
+
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in verdicts and key not in todo:
+                todo[key] = sample_windows(text, self.num_windows, self.window_chars)
+        self.misses += len(todo)
+        self.hits += len(unique_keys) - len(todo)
+
+        if todo:
+            detected = self._detect(list(todo.values()))
+            new = dict(zip(todo, detected))
+            verdicts.update(new)
+            with self._lock:
+                self.conn.executemany("INSERT OR REPLACE INTO verdicts (key, lang) VALUES (?, ?)", new.items())
+                self.conn.commit()
+
+        logger.debug(f"Language ID: {len(unique_keys) - len(todo)} cached, {len(todo)} detected")
+        return [verdicts[k] for k in keys]
+
+    def _detect(self, samples: List[str]) -> List[str]:
+        if self.workers <= 1 or len(samples) < 2 * self.workers:
+            _seed_langdetect(self.seed)
+            return [_detect_sample(s) for s in samples]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_seed_langdetect, initargs=(self.seed,)
+            )
+        chunksize = max(1, min(self.chunksize, len(samples) // self.workers))
+        return list(self._pool.map(_detect_sample, samples, chunksize=chunksize))
+
+    def get_stats(self):
+        """Cache hit/miss counters."""
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self):
+        """Stop the worker pool and close the verdict cache."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self.conn:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,254 @@
+"""SQLite-backed store for arXiv paper metadata."""
+
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import DATA_DIR
+from .pdf_store import split_version
+
+
+@dataclass
+class PaperMetadata:
+    """Metadata for an arXiv paper."""
+    arxiv_id: str
+    title: str
+    authors: List[str]
+    abstract: str
+    categories: List[str]
+    published: str
+    updated: str
+    pdf_url: str
+    local_pdf_path: Optional[str] = None
+
+
+class PaperStore:
+    """Paper metadata with indexed lookups, upserts and O(1) counts.
+
+    Papers are keyed by arxiv id without version, so a re-versioned paper
+    replaces its older entry, but an entry is never replaced by one with an
+    older `updated` timestamp. The row count is maintained by triggers in a
+    small `stats` table instead of scanning `papers`. A `legacy_json` file is
+    imported (once) when the store opens, before anything else is written.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, legacy_json: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path else DATA_DIR / "processed" / "papers.db"
+        self.legacy_json = Path(legacy_json) if legacy_json else None
+        self.conn = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Open the database and create tables."""
+        if self.conn is not None:
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=10.0, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS papers (
+                base_id TEXT PRIMARY KEY,
+                arxiv_id TEXT NOT NULL,
+                title TEXT,
+                authors TEXT,
+                abstract TEXT,
+                categories TEXT,
+                published TEXT,
+                updated TEXT,
+                pdf_url TEXT,
+                local_pdf_path TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_papers_arxiv_id ON papers(arxiv_id);
+            CREATE INDEX IF NOT EXISTS idx_papers_published ON papers(published);
+            CREATE INDEX IF NOT EXISTS idx_papers_updated ON papers(updated);
+
+            CREATE TABLE IF NOT EXISTS paper_categories (
+                category TEXT NOT NULL,
+                base_id TEXT NOT NULL,
+                PRIMARY KEY (category, base_id)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS stats (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO stats (key, value) VALUES ('paper_count', 0);
+
+            CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+                UPDATE stats SET value = value + 1 WHERE key = 'paper_count';
+            END;
+            CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN
+                UPDATE stats SET value = value - 1 WHERE key = 'paper_count';
+                DELETE FROM paper_categories WHERE base_id = old.base_id;
+            END;
+        """)
+        self.conn.commit()
+        if self.legacy_json is not None:
+            self.import_json(self.legacy_json)
+
+    def upsert(self, papers: Iterable[PaperMetadata]) -> int:
+        """Insert or update papers. Returns the number written.
+        
+        A stored paper is only replaced by one updated at the same time or later.
+        """
+        self.connect()
+        rows = []
+        category_rows = []
+        for p in papers:
+            base_id = split_version(p.arxiv_id)[0]
+            rows.append((
+                base_id, p.arxiv_id, p.title, json.dumps(p.authors, ensure_ascii=False),
+                p.abstract, json.dumps(p.categories), p.published, p.updated,
+                p.pdf_url, p.local_pdf_path
+            ))
+            category_rows.extend((c, base_id) for c in p.categories)
+
+        with self._lock:
+            written = []
+            for row in rows:
+                cursor = self.conn.execute("""
+                    INSERT INTO papers (base_id, arxiv_id, title, authors, abstract, categories,
+                                        published, updated, pdf_url, local_pdf_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(base_id) DO UPDATE SET
+                        arxiv_id = excluded.arxiv_id,
+                        title = excluded.title,
+                        authors = excluded.authors,
+                        abstract = excluded.abstract,
+                        categories = excluded.categories,
+                        published = excluded.published,
+                        updated = excluded.updated,
+                        pdf_url = excluded.pdf_url,
+                        local_pdf_path = COALESCE(excluded.local_pdf_path, papers.local_pdf_path)
+                    WHERE papers.updated IS NULL OR excluded.updated >= papers.updated
+                """, row)
+                if cursor.rowcount:
+                    written.append(row[0])
+            # Categories can change between versions, so replace them wholesale
+            kept = set(written)
+            self.conn.executemany(
+                "DELETE FROM paper_categories WHERE base_id = ?", [(base_id,) for base_id in written]
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO paper_categories (category, base_id) VALUES (?, ?)",
+                [r for r in category_rows if r[1] in kept]
+            )
+            self.conn.commit()
+        return len(written)
+
+    @staticmethod
+    def _row_to_paper(row) -> PaperMetadata:
+        return PaperMetadata(
+            arxiv_id=row["arxiv_id"],
+            title=row["title"],
+            authors=json.loads(row["authors"]),
+            abstract=row["abstract"],
+            categories=json.loads(row["categories"]),
+            published=row["published"],
+            updated=row["updated"],
+            pdf_url=row["pdf_url"],
+            local_pdf_path=row["local_pdf_path"]
+        )
+
+    def get(self, arxiv_id: str) -> Optional[PaperMetadata]:
+        """Look up a paper by arxiv id, with or without version."""
+        self.connect()
+        row = self.conn.execute(
+            "SELECT * FROM papers WHERE base_id = ?", (split_version(arxiv_id)[0],)
+        ).fetchone()
+        return self._row_to_paper(row) if row else None
+
+    def count(self) -> int:
+        """Number of stored papers."""
+        self.connect()
+        return self.conn.execute("SELECT value FROM stats WHERE key = 'paper_count'").fetchone()[0]
+
+    def _iter_query(self, sql: str, params=(), batch_size: int = 500) -> Iterator[PaperMetadata]:
+        cursor = self.conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield self._row_to_paper(row)
+
+    def iter_papers(self, limit: Optional[int] = None, batch_size: int = 500) -> Iterator[PaperMetadata]:
+        """Stream papers, most recently published first."""
+        self.connect()
+        return self._iter_query(
+            "SELECT * FROM papers ORDER BY published DESC LIMIT ?",
+            (limit if limit is not None else -1,), batch_size
+        )
+
+    def by_category(self, category: str, limit: Optional[int] = None) -> Iterator[PaperMetadata]:
+        """Stream papers in a category, most recently published first."""
+        self.connect()
+        return self._iter_query("""
+            SELECT p.* FROM paper_categories c JOIN papers p ON p.base_id = c.base_id
+            WHERE c.category = ? ORDER BY p.published DESC LIMIT ?
+        """, (category, limit if limit is not None else -1))
+
+    def by_date(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        field: str = "published"
+    ) -> Iterator[PaperMetadata]:
+        """Stream papers whose `published`/`updated` timestamp is in [start, end)."""
+        if field not in ("published", "updated"):
+            raise ValueError(f"Unknown date field: {field}")
+        self.connect()
+        return self._iter_query(
+            f"SELECT * FROM papers WHERE {field} >= ? AND {field} < ? ORDER BY {field} DESC",
+            (start or "", end or "9999")
+        )
+
+    def delete(self, arxiv_ids: Iterable[str]) -> int:
+        """Delete papers by id. Returns the number removed."""
+        self.connect()
+        base_ids = [(split_version(a)[0],) for a in arxiv_ids]
+        with self._lock:
+            before = self.count()
+            self.conn.executemany("DELETE FROM papers WHERE base_id = ?", base_ids)
+            self.conn.commit()
+        return before - self.count()
+
+    def import_json(self, json_path: Path) -> int:
+        """One-time import of a legacy papers_metadata.json file."""
+        self.connect()
+        key = f"imported:{Path(json_path).resolve()}"
+        if self.conn.execute("SELECT 1 FROM stats WHERE key = ?", (key,)).fetchone():
+            return 0
+        if not Path(json_path).exists():
+            return 0
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        imported = self.upsert(PaperMetadata(**p) for p in data.get("papers", []))
+
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)", (key, imported))
+            self.conn.commit()
+        logger.info(f"Imported {imported} papers from {json_path}")
+        return imported
+
+    def export_json(self, json_path: Path, **extra):
+        """Write all papers to a JSON file in the legacy layout."""
+        papers = [asdict(p) for p in self.iter_papers()]
+        data = {**extra, "total_papers": len(papers), "papers": papers}
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def close(self):
+        """Close the database."""
+        if self.conn:
+            self.conn.close()
+            self.conn = None
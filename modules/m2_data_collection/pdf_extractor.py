@@ -2,16 +2,34 @@
 """PDF text extraction using PyMuPDF."""
 
 import fitz  # PyMuPDF
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
-import json
 from tqdm import tqdm
 from loguru import logger
 
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent))
-from config.settings import DATA_DIR
+from config.settings import get_config, DATA_DIR
+from .pdf_store import PDFStore, STATUS_CORRUPT
+from .extraction_cache import ExtractionCache
+from .corpus_store import ShardedCorpus
+
+
+PAGE_SEPARATOR = "\n\n"
+
+# Bump when extraction output changes so cached results are not reused
+EXTRACTOR_VERSION = 1
+
+# Seconds past a chunk's time budget before the parent kills its worker
+_KILL_GRACE = 5.0
 
 
 @dataclass
@@ -23,51 +41,157 @@ class ExtractedDocument:
     pages: List[str]
     num_pages: int
     source_path: str
+    page_offsets: Optional[List[int]] = None  # Page start offsets into full_text when pages are not kept
+    
+    def get_page(self, page_num: int) -> str:
+        """Text of one page, from `pages` or sliced out of `full_text`."""
+        if self.pages:
+            return self.pages[page_num]
+        start = self.page_offsets[page_num]
+        if page_num + 1 < len(self.page_offsets):
+            end = self.page_offsets[page_num + 1] - len(PAGE_SEPARATOR)
+        else:
+            end = len(self.full_text)
+        return self.full_text[start:end]
+
+
+class ExtractionTimeout(Exception):
+    """Raised when a single PDF exceeds its extraction time budget."""
+
+
+class WorkerCrashed(Exception):
+    """Reported for a PDF whose extraction killed its worker process."""
+
+
+# Failures that say nothing about the PDF itself, so its blob is not marked corrupt
+_NOT_CORRUPT = (ExtractionTimeout.__name__, WorkerCrashed.__name__)
+
+
+@contextmanager
+def _time_limit(seconds: Optional[float]):
+    """Interrupt the block after `seconds` (POSIX main thread only, otherwise a no-op).
+    
+    The alarm only fires between Python bytecodes, so a hang inside MuPDF is
+    not interrupted; the pool in `_iter_parallel` enforces the hard limit.
+    """
+    if (not seconds or not hasattr(signal, "SIGALRM")
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+    
+    def _on_alarm(signum, frame):
+        raise ExtractionTimeout(f"exceeded {seconds}s")
+    
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _page_offsets(pages: List[str]) -> List[int]:
+    """Start offset of each page in the separator-joined full text."""
+    offsets = []
+    offset = 0
+    for text in pages:
+        offsets.append(offset)
+        offset += len(text) + len(PAGE_SEPARATOR)
+    return offsets
+
+
+def _resolve_arxiv_id(pdf_path: Path, metadata: Optional[Dict]) -> str:
+    """Store blobs are hash-named, so prefer the id supplied by the caller."""
+    if metadata and metadata.get("arxiv_id"):
+        return metadata["arxiv_id"]
+    return pdf_path.stem.replace("_", "/")
+
+
+def _extract_pdf(
+    pdf_path: str,
+    metadata: Optional[Dict] = None,
+    keep_pages: bool = True
+) -> ExtractedDocument:
+    """Extract text from a single PDF (shared by the in-process and pool paths).
+    
+    With `keep_pages=False` only page offsets into `full_text` are kept
+    instead of a second copy of every page string.
+    """
+    pdf_path = Path(pdf_path)
+    
+    doc = fitz.open(pdf_path)
+    try:
+        pages = []
+        
+        for page_num in range(len(doc)):
+            page = doc[page_num]
+            text = page.get_text("text")
+            # Clean up text
+            text = PDFExtractor._clean_page_text(text)
+            pages.append(text)
+    finally:
+        doc.close()
+    
+    full_text = PAGE_SEPARATOR.join(pages)
+    
+    page_offsets = None if keep_pages else _page_offsets(pages)
+    
+    arxiv_id = _resolve_arxiv_id(pdf_path, metadata)
+    return ExtractedDocument(
+        arxiv_id=arxiv_id,
+        title=metadata.get("title", arxiv_id) if metadata else arxiv_id,
+        full_text=full_text,
+        pages=pages if keep_pages else [],
+        num_pages=len(pages),
+        source_path=str(pdf_path),
+        page_offsets=page_offsets
+    )
+
+
+def _extract_chunk(
+    tasks: List[Tuple[int, str, Optional[Dict]]],
+    timeout: Optional[float],
+    keep_pages: bool = True
+) -> List[Tuple[int, Optional[ExtractedDocument], Optional[str]]]:
+    """Worker entry point: extract a chunk of (seq, path, metadata) tasks."""
+    results = []
+    for seq, pdf_path, metadata in tasks:
+        try:
+            with _time_limit(timeout):
+                doc = _extract_pdf(pdf_path, metadata, keep_pages)
+            results.append((seq, doc, None))
+        except Exception as e:
+            results.append((seq, None, f"{type(e).__name__}: {e}"))
+    return results
 
 
 class PDFExtractor:
     """Extracts text from PDF files."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        store: Optional[PDFStore] = None,
+        config=None,
+        cache: Optional[ExtractionCache] = None
+    ):
+        self.config = config or get_config()
         self.raw_dir = DATA_DIR / "raw"
         self.processed_dir = DATA_DIR / "processed"
+        self.store = store or PDFStore(self.raw_dir)
+        self.cache = cache or ExtractionCache()
         self.documents: List[ExtractedDocument] = []
         
     def extract_single(self, pdf_path: str, metadata: Optional[Dict] = None) -> ExtractedDocument:
         """Extract text from a single PDF."""
-        pdf_path = Path(pdf_path)
-        
         try:
-            doc = fitz.open(pdf_path)
-            pages = []
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text("text")
-                # Clean up text
-                text = self._clean_page_text(text)
-                pages.append(text)
-            
-            full_text = "\n\n".join(pages)
-            arxiv_id = pdf_path.stem.replace("_", "/")
-            
-            extracted = ExtractedDocument(
-                arxiv_id=arxiv_id,
-                title=metadata.get("title", arxiv_id) if metadata else arxiv_id,
-                full_text=full_text,
-                pages=pages,
-                num_pages=len(pages),
-                source_path=str(pdf_path)
-            )
-            
-            doc.close()
-            return extracted
-            
+            return _extract_pdf(pdf_path, metadata)
         except Exception as e:
             logger.error(f"Failed to extract {pdf_path}: {e}")
             raise
     
-    def _clean_page_text(self, text: str) -> str:
+    @staticmethod
+    def _clean_page_text(text: str) -> str:
         """Clean extracted page text."""
         # Remove excessive whitespace
         lines = text.split('\n')
@@ -80,44 +204,309 @@ class PDFExtractor:
         
         return '\n'.join(cleaned_lines)
     
+    def iter_extract(
+        self,
+        pdf_paths: List[str],
+        metadata_list: Optional[List[Dict]] = None,
+        workers: Optional[int] = None,
+        ordered: bool = True,
+        keep_pages: bool = True,
+        use_cache: bool = True
+    ) -> Iterator[ExtractedDocument]:
+        """Yield extracted documents as they finish, without accumulating them.
+        
+        With `workers` > 1 the PDFs are extracted in a process pool; `ordered`
+        controls whether results keep the input order or completion order.
+        With `keep_pages=False` documents carry page offsets instead of page strings.
+        Unchanged PDFs are served from the extraction cache without opening them.
+        
+        `extract_timeout` is enforced by killing the worker process. With one
+        worker and `extract_isolate` off, PDFs are extracted in this process
+        instead, saving the pool start-up and result pickling; the timeout is
+        then a best-effort alarm that needs the main thread and cannot
+        interrupt a hang inside MuPDF.
+        """
+        workers = workers or self.config.data.extract_workers
+        timeout = self.config.data.extract_timeout
+        self.cache.reset_stats()
+        
+        tasks = []
+        entries = {}
+        hashes = {}
+        hits = []  # Tasks served from the cache, read only when their turn comes
+        for i, pdf_path in enumerate(pdf_paths):
+            # Files already known to be corrupt are skipped without opening them
+            entry = self.store.lookup_path(pdf_path)
+            if entry is not None and not entry.is_valid:
+                logger.warning(f"Skipping {pdf_path}: marked {entry.status} in PDF store")
+                continue
+            metadata = metadata_list[i] if metadata_list else None
+            seq = len(entries)
+            entries[seq] = entry
+            
+            if use_cache:
+                hashes[seq] = self._content_hash(pdf_path, entry)
+                if hashes[seq] and self.cache.contains(hashes[seq], EXTRACTOR_VERSION):
+                    hits.append((seq, pdf_path, metadata))
+                    continue
+            tasks.append((seq, pdf_path, metadata))
+        
+        if workers > 1 or (timeout and self.config.data.extract_isolate):
+            # Even with one worker, only a separate process can be killed when MuPDF hangs
+            results = self._iter_parallel(tasks, max(1, workers), timeout, ordered, keep_pages)
+        else:
+            results = (_extract_chunk([task], timeout, keep_pages)[0] for task in tasks)
+        served = set()
+        
+        def load(task):
+            seq, pdf_path, metadata = task
+            hit = self.cache.get(hashes[seq], EXTRACTOR_VERSION)
+            if hit is None:
+                # Removed or damaged since it was found; extract it here instead
+                return _extract_chunk([task], timeout, keep_pages)[0]
+            served.add(seq)
+            return seq, self._from_cache(hit, pdf_path, metadata, keep_pages), None
+        
+        results = self._merge_cached(hits, load, results, ordered)
+        paths = {seq: path for seq, path, _ in tasks + hits}
+        
+        extracted = 0
+        for seq, doc, error in tqdm(results, total=len(entries), desc="Extracting PDFs"):
+            if doc is not None:
+                extracted += 1
+                if use_cache and seq not in served and hashes[seq]:
+                    offsets = doc.page_offsets if doc.page_offsets is not None else _page_offsets(doc.pages)
+                    self.cache.put(hashes[seq], EXTRACTOR_VERSION, doc.full_text, offsets, doc.num_pages)
+                yield doc
+                continue
+            
+            logger.warning(f"Skipping {paths[seq]}: {error}")
+            entry = entries[seq]
+            if entry is not None and not error.startswith(_NOT_CORRUPT):
+                self.store.mark_status(entry.sha256, STATUS_CORRUPT)
+        
+        logger.info(f"Extracted {extracted} documents")
+        if use_cache:
+            stats = self.cache.get_stats()
+            logger.info(
+                f"Extraction cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} hit rate)"
+            )
+    
+    def _content_hash(self, pdf_path: str, entry) -> Optional[str]:
+        """Content hash of a PDF: free for store blobs, one read pass otherwise."""
+        if entry is not None:
+            return entry.sha256
+        try:
+            return PDFStore.hash_file(Path(pdf_path))
+        except OSError:
+            return None
+    
+    @staticmethod
+    def _from_cache(hit: Dict, pdf_path: str, metadata: Optional[Dict], keep_pages: bool) -> ExtractedDocument:
+        """Rebuild a document from a cache entry."""
+        arxiv_id = _resolve_arxiv_id(Path(pdf_path), metadata)
+        doc = ExtractedDocument(
+            arxiv_id=arxiv_id,
+            title=metadata.get("title", arxiv_id) if metadata else arxiv_id,
+            full_text=hit["full_text"],
+            pages=[],
+            num_pages=hit["num_pages"],
+            source_path=str(pdf_path),
+            page_offsets=hit["page_offsets"]
+        )
+        if keep_pages:
+            doc.pages = [doc.get_page(i) for i in range(doc.num_pages)]
+            doc.page_offsets = None
+        return doc
+    
+    @staticmethod
+    def _merge_cached(
+        hits: List[Tuple[int, str, Optional[Dict]]],
+        load,
+        results: Iterator[Tuple[int, Optional[ExtractedDocument], Optional[str]]],
+        ordered: bool
+    ) -> Iterator[Tuple[int, Optional[ExtractedDocument], Optional[str]]]:
+        """Interleave cache hits, loaded one at a time by `load`, with extraction results."""
+        if not ordered:
+            yield from (load(hit) for hit in hits)
+            yield from results
+            return
+        
+        pos = 0
+        for result in results:
+            while pos < len(hits) and hits[pos][0] < result[0]:
+                yield load(hits[pos])
+                pos += 1
+            yield result
+        yield from (load(hit) for hit in hits[pos:])
+    
     def extract_batch(
         self, 
         pdf_paths: List[str], 
-        metadata_list: Optional[List[Dict]] = None
+        metadata_list: Optional[List[Dict]] = None,
+        workers: Optional[int] = None,
+        ordered: bool = True,
+        use_cache: bool = True
     ) -> List[ExtractedDocument]:
-        """Extract text from multiple PDFs."""
-        self.documents = []
+        """Extract text from multiple PDFs into `self.documents`."""
+        self.documents = list(self.iter_extract(
+            pdf_paths, metadata_list, workers, ordered, use_cache=use_cache
+        ))
+        return self.documents
+    
+    def _iter_parallel(
+        self,
+        tasks: List[Tuple[int, str, Optional[Dict]]],
+        workers: int,
+        timeout: Optional[float],
+        ordered: bool,
+        keep_pages: bool = True
+    ) -> Iterator[Tuple[int, Optional[ExtractedDocument], Optional[str]]]:
+        """Extract tasks in a process pool, yielding (seq, doc, error) as chunks finish.
+        
+        Tasks are submitted in chunks and at most `2 * workers` chunks are in
+        flight, so results stream back without queueing the whole batch.
+        
+        A chunk running past `timeout` per PDF has its worker killed, and a
+        worker that dies breaks the pool; either way the pool is rebuilt and
+        the PDFs it lost are retried one at a time with nothing else in flight,
+        so only the PDF responsible fails (as a timeout or crash, not as corrupt).
+        """
+        chunksize = max(1, self.config.data.extract_chunksize)
+        queue = deque(tasks[i:i + chunksize] for i in range(0, len(tasks), chunksize))
+        suspects = deque()  # Tasks lost with a worker, retried alone to find the culprit
+        pending = {}  # future -> (chunk, runs alone)
+        started = {}  # future -> when it was first seen running
+        pool = ProcessPoolExecutor(max_workers=workers)
+        
+        def submit(chunk, alone):
+            pending[pool.submit(_extract_chunk, chunk, timeout, keep_pages)] = (chunk, alone)
         
-        for i, pdf_path in enumerate(tqdm(pdf_paths, desc="Extracting PDFs")):
+        def fill():
             try:
-                metadata = metadata_list[i] if metadata_list else None
-                doc = self.extract_single(pdf_path, metadata)
-                self.documents.append(doc)
-            except Exception as e:
-                logger.warning(f"Skipping {pdf_path}: {e}")
+                if suspects:
+                    if not pending:
+                        submit([suspects[0]], True)
+                        suspects.popleft()
+                    return
+                while queue and len(pending) < 2 * workers:
+                    submit(queue[0], False)
+                    queue.popleft()
+            except BrokenProcessPool:
+                pass  # Its futures fail too, and the loop below rebuilds the pool
         
-        logger.info(f"Extracted {len(self.documents)} documents")
-        return self.documents
-    
-    def save_extracted(self, output_dir: Optional[Path] = None):
-        """Save extracted documents to JSON files."""
-        output_dir = output_dir or (self.processed_dir / "extracted")
-        output_dir.mkdir(parents=True, exist_ok=True)
+        def kill_workers():
+            # Killing is the only way to stop a worker stuck in C code; the
+            # executor keeps its processes in a private attribute
+            for process in list((pool._processes or {}).values()):
+                process.kill()
+            pool.shutdown(wait=True, cancel_futures=True)
         
-        for doc in self.documents:
-            filename = doc.arxiv_id.replace("/", "_") + ".json"
-            filepath = output_dir / filename
-            
-            data = {
-                "arxiv_id": doc.arxiv_id,
-                "title": doc.title,
-                "full_text": doc.full_text,
-                "num_pages": doc.num_pages,
-                "source_path": doc.source_path
-            }
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+        def restart():
+            nonlocal pool
+            kill_workers()
+            pool = ProcessPoolExecutor(max_workers=workers)
         
-        logger.info(f"Saved {len(self.documents)} documents to {output_dir}")
-
+        buffered = {}
+        order = [task[0] for task in tasks]
+        next_pos = 0
+        
+        def emit(results):
+            nonlocal next_pos
+            if not ordered:
+                yield from results
+                return
+            buffered.update((r[0], r) for r in results)
+            while next_pos < len(order) and order[next_pos] in buffered:
+                yield buffered.pop(order[next_pos])
+                next_pos += 1
+        
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, timeout=1.0 if timeout else None, return_when=FIRST_COMPLETED)
+                failed = []  # (chunk, runs alone, error)
+                for future in done:
+                    chunk, alone = pending.pop(future)
+                    started.pop(future, None)
+                    try:
+                        results = future.result()
+                    except BrokenProcessPool:
+                        failed.append((chunk, alone, f"{WorkerCrashed.__name__}: worker process died"))
+                        continue
+                    except Exception as e:
+                        # The PDFs were parsed, but their results did not make it back
+                        results = [(seq, None, f"{WorkerCrashed.__name__}: {type(e).__name__}: {e}")
+                                   for seq, _, _ in chunk]
+                    yield from emit(results)
+                
+                if timeout:
+                    now = time.monotonic()
+                    for future, (chunk, alone) in list(pending.items()):
+                        if future.running():
+                            started.setdefault(future, now)
+                        if future in started and now - started[future] > timeout * len(chunk) + _KILL_GRACE:
+                            del pending[future], started[future]
+                            failed.append((chunk, True, f"{ExtractionTimeout.__name__}: exceeded {timeout}s"))
+                
+                if failed:
+                    crashed = any(error.startswith(WorkerCrashed.__name__) for _, _, error in failed)
+                    lost = list(pending.values())
+                    pending.clear()
+                    started.clear()
+                    restart()
+                    for chunk, alone, error in failed:
+                        if alone and len(chunk) == 1:
+                            yield from emit([(chunk[0][0], None, error)])
+                        else:
+                            suspects.extend(chunk)
+                    for chunk, alone in lost:
+                        # After a crash any in-flight chunk may hold the culprit;
+                        # after a timeout the others were only collateral
+                        if crashed:
+                            suspects.extend(chunk)
+                        else:
+                            queue.appendleft(chunk)
+                fill()
+        finally:
+            if pending:
+                kill_workers()  # Closed early; nothing is waiting for these results
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    def open_corpus(self, root: Optional[Path] = None) -> ShardedCorpus:
+        """Open the sharded corpus of extracted text (default: `processed/corpus`)."""
+        corpus = ShardedCorpus(
+            root or (self.processed_dir / "corpus"),
+            compression=self.config.data.corpus_compression,
+            shard_size=self.config.data.corpus_shard_size
+        )
+        # Pick up documents saved in the old one-JSON-per-paper layout
+        if root is None and len(corpus) == 0:
+            corpus.import_json_dir(self.processed_dir / "extracted")
+        return corpus
+    
+    def save_extracted(
+        self,
+        output_dir: Optional[Path] = None,
+        documents: Optional[Iterable[ExtractedDocument]] = None
+    ) -> int:
+        """Append extracted documents (default: `self.documents`) to the sharded corpus."""
+        documents = self.documents if documents is None else documents
+        corpus = self.open_corpus(output_dir)
+        try:
+            saved = corpus.add(
+                {
+                    "arxiv_id": doc.arxiv_id,
+                    "title": doc.title,
+                    "full_text": doc.full_text,
+                    "num_pages": doc.num_pages,
+                    "source_path": doc.source_path
+                }
+                for doc in documents
+            )
+        finally:
+            corpus.close()
+        
+        logger.info(f"Saved {saved} documents to {corpus.root}")
+        return saved
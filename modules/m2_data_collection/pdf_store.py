@@ -0,0 +1,198 @@
+"""Content-addressed storage for raw PDFs."""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import DATA_DIR
+
+
+STATUS_VALID = "valid"
+STATUS_CORRUPT = "corrupt"
+
+_VERSION_RE = re.compile(r"^(.*?)(v\d+)?$")
+
+
+@dataclass
+class StoredPDF:
+    """Index entry for a stored PDF."""
+    arxiv_id: str
+    version: str
+    sha256: str
+    size: int
+    status: str
+    path: str
+
+    @property
+    def is_valid(self) -> bool:
+        return self.status == STATUS_VALID
+
+
+def split_version(arxiv_id: str) -> Tuple[str, str]:
+    """Split '2401.12345v2' into ('2401.12345', 'v2')."""
+    match = _VERSION_RE.match(arxiv_id)
+    return match.group(1), match.group(2) or ""
+
+
+class PDFStore:
+    """Hash-named PDF blobs plus a SQLite index of arxiv_id+version -> blob.
+
+    Blobs live under `raw/blobs/<sha[:2]>/<sha>.pdf`. Each entry records the
+    blob size and a validation status computed once at ingest, so callers can
+    skip or reject files with an index lookup instead of reopening them.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root) if root else DATA_DIR / "raw"
+        self.blob_dir = self.root / "blobs"
+        self.db_path = self.root / "pdf_store.db"
+        self.conn = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Open the index database and create tables."""
+        if self.conn is not None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=10.0, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pdfs (
+                arxiv_id TEXT NOT NULL,
+                version TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                stored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (arxiv_id, version)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pdfs_sha256 ON pdfs(sha256)")
+        self.conn.commit()
+
+    def blob_path(self, sha256: str) -> Path:
+        """Path of the blob for a content hash."""
+        return self.blob_dir / sha256[:2] / f"{sha256}.pdf"
+
+    def _row_to_entry(self, row) -> StoredPDF:
+        return StoredPDF(
+            arxiv_id=row["arxiv_id"],
+            version=row["version"],
+            sha256=row["sha256"],
+            size=row["size"],
+            status=row["status"],
+            path=str(self.blob_path(row["sha256"]))
+        )
+
+    def lookup(self, arxiv_id: str) -> Optional[StoredPDF]:
+        """Find the entry for an exact arxiv_id (including version)."""
+        self.connect()
+        base, version = split_version(arxiv_id)
+        row = self.conn.execute(
+            "SELECT * FROM pdfs WHERE arxiv_id = ? AND version = ?", (base, version)
+        ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def lookup_path(self, pdf_path: str) -> Optional[StoredPDF]:
+        """Find the entry for a blob path (its file name is the content hash)."""
+        self.connect()
+        sha256 = Path(pdf_path).stem
+        row = self.conn.execute(
+            "SELECT * FROM pdfs WHERE sha256 = ? LIMIT 1", (sha256,)
+        ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def is_intact(self, entry: StoredPDF) -> bool:
+        """True if the entry is valid and its blob still has the recorded size."""
+        if not entry.is_valid:
+            return False
+        try:
+            return os.stat(entry.path).st_size == entry.size
+        except FileNotFoundError:
+            return False
+
+    def has_valid(self, arxiv_id: str) -> bool:
+        """True if an intact, valid blob is recorded for `arxiv_id`."""
+        entry = self.lookup(arxiv_id)
+        return entry is not None and self.is_intact(entry)
+
+    @staticmethod
+    def validate_file(path: Path, size: int) -> str:
+        """Cheap structural check: PDF header and trailing %%EOF marker."""
+        if size < 16:
+            return STATUS_CORRUPT
+        with open(path, "rb") as f:
+            head = f.read(8)
+            f.seek(max(0, size - 2048))
+            tail = f.read()
+        if not head.startswith(b"%PDF-") or b"%%EOF" not in tail:
+            return STATUS_CORRUPT
+        return STATUS_VALID
+
+    @staticmethod
+    def hash_file(path: Path, chunk_size: int = 1 << 20) -> str:
+        """SHA-256 of a file, read in chunks."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def add_file(self, arxiv_id: str, src_path: Path, move: bool = True) -> StoredPDF:
+        """Ingest a downloaded file into the store and index it."""
+        self.connect()
+        src_path = Path(src_path)
+        size = src_path.stat().st_size
+        sha256 = self.hash_file(src_path)
+        status = self.validate_file(src_path, size)
+
+        blob = self.blob_path(sha256)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        if blob.exists():
+            if move:
+                src_path.unlink()
+        elif move:
+            os.replace(src_path, blob)
+        else:
+            blob.write_bytes(src_path.read_bytes())
+
+        base, version = split_version(arxiv_id)
+        with self._lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO pdfs (arxiv_id, version, sha256, size, status)
+                VALUES (?, ?, ?, ?, ?)
+            """, (base, version, sha256, size, status))
+            self.conn.commit()
+
+        if status != STATUS_VALID:
+            logger.warning(f"Stored {arxiv_id} but it failed validation ({size} bytes)")
+
+        return StoredPDF(base, version, sha256, size, status, str(blob))
+
+    def mark_status(self, sha256: str, status: str):
+        """Update the validation status of every entry pointing at a blob."""
+        self.connect()
+        with self._lock:
+            self.conn.execute("UPDATE pdfs SET status = ? WHERE sha256 = ?", (status, sha256))
+            self.conn.commit()
+
+    def get_stats(self):
+        """Counts of indexed entries by status."""
+        self.connect()
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM pdfs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self):
+        """Close the index database."""
+        if self.conn:
+            self.conn.close()
+            self.conn = None
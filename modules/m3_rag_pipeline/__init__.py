@@ -2,8 +2,13 @@
 """Module 3: RAG Pipeline - Chunking, Embedding, and Indexing."""
 
 from .chunker import DocumentChunker, Chunk
+from .chunk_store import ChunkStore
 from .embedder import EmbeddingGenerator
+from .embedding_backends import EmbeddingBackend, export_onnx
+from .embedding_cache import EmbeddingCache
 from .faiss_indexer import FAISSIndexer
+from .ingest import IngestionPipeline, IngestStats
+from .manifest import IndexManifest, ManifestEntry
 
-__all__ = ["DocumentChunker", "Chunk", "EmbeddingGenerator", "FAISSIndexer"]
-
+__all__ = ["DocumentChunker", "Chunk", "ChunkStore", "EmbeddingGenerator", "EmbeddingBackend", "export_onnx",
+           "EmbeddingCache", "FAISSIndexer", "IngestionPipeline", "IngestStats", "IndexManifest", "ManifestEntry"]
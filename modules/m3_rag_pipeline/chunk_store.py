@@ -0,0 +1,307 @@
+# modules/m3_rag_pipeline/chunk_store.py
+"""Columnar, memory-mappable storage for indexed chunks."""
+
+import json
+import mmap
+import os
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+from loguru import logger
+
+from .chunker import Chunk
+
+
+# Integer fields of a chunk, one row of `rows.npy` each
+_FIELDS = ("doc", "meta", "start", "end", "tokens")
+_WIDTH = len(_FIELDS)
+
+
+class ChunkStore:
+    """Chunks stored column-wise instead of as a list of `Chunk` objects.
+
+    Texts and chunk ids live in UTF-8 blobs addressed by offset arrays, and
+    document ids and metadata dicts are interned, so a paper's title and
+    authors are stored once however many chunks it has. A saved store is
+    memory-mapped on load, so opening it reads only `docs.json`. Indexing
+    by row (the FAISS id) builds a `Chunk` on demand.
+
+    Files in `root`:
+        texts.bin, text_offsets.npy     chunk texts
+        ids.bin, id_offsets.npy         chunk ids
+        rows.npy                        per chunk: doc index, metadata index,
+                                        start_idx, end_idx, token_count
+        deleted.npy                     rows of removed chunks
+        docs.json                       document ids, metadata and chunk count, written last
+
+    Chunks added after a load are kept in memory until the next `save`.
+    Removing a document only marks its rows deleted, so row numbers (and the
+    FAISS ids pointing at them) do not change until `compact` drops the
+    dead rows.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root) if root else None
+        self.doc_ids: List[str] = []
+        self.metadata: List[Dict] = []
+        self._doc_index: Dict[str, int] = {}
+        self._meta_index: Dict[str, int] = {}
+        self._row_of: Optional[Dict[str, int]] = None
+        self._deleted: Set[int] = set()
+
+        # Saved rows (memory-mapped) followed by rows added since
+        self._base_len = 0
+        self._rows = np.zeros((0, _WIDTH), dtype=np.int64)
+        self._texts = self._ids = b""
+        self._text_offsets = self._id_offsets = np.zeros(1, dtype=np.int64)
+        self._reset_tail()
+
+    def _reset_tail(self):
+        self._tail_rows = array("q")
+        self._tail_texts = bytearray()
+        self._tail_text_offsets = array("q", [0])
+        self._tail_ids = bytearray()
+        self._tail_id_offsets = array("q", [0])
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Chunk], root: Optional[Path] = None) -> "ChunkStore":
+        """Build a store from `Chunk` objects (e.g. a legacy pickled list)."""
+        store = cls(root)
+        store.add(chunks)
+        return store
+
+    def exists(self) -> bool:
+        return self.root is not None and (self.root / "docs.json").exists()
+
+    def load(self):
+        """Memory-map a saved store."""
+        with open(self.root / "docs.json", encoding="utf-8") as f:
+            header = json.load(f)
+
+        self.doc_ids = header["doc_ids"]
+        self.metadata = header["metadata"]
+        self._doc_index = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+        self._meta_index = {_meta_key(meta): i for i, meta in enumerate(self.metadata)}
+        self._row_of = None
+
+        self._base_len = header["count"]
+        self._rows = self._map_array("rows")
+        self._text_offsets = self._map_array("text_offsets")
+        self._id_offsets = self._map_array("id_offsets")
+        self._texts = self._map_blob("texts.bin")
+        self._ids = self._map_blob("ids.bin")
+        deleted_path = self.root / "deleted.npy"
+        self._deleted = set(np.load(deleted_path).tolist()) if deleted_path.exists() else set()
+        self._reset_tail()
+
+        logger.info(f"Loaded chunk store with {len(self)} chunks from {self.root}")
+
+    def _map_array(self, name: str) -> np.ndarray:
+        # Plain ndarray view of the memmap: element access skips the subclass overhead
+        return np.asarray(np.load(self.root / f"{name}.npy", mmap_mode="r"))
+
+    def _map_blob(self, filename: str):
+        with open(self.root / filename, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""  # mmap cannot map empty files
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def add(self, chunks: Iterable[Chunk]) -> int:
+        """Append chunks; row numbers continue from the current length."""
+        added = 0
+        for chunk in chunks:
+            self._tail_texts += chunk.text.encode("utf-8")
+            self._tail_text_offsets.append(len(self._tail_texts))
+            self._tail_ids += chunk.chunk_id.encode("utf-8")
+            self._tail_id_offsets.append(len(self._tail_ids))
+            self._tail_rows.extend((
+                self._intern_doc(chunk.doc_id),
+                self._intern_meta(chunk.metadata),
+                chunk.start_idx,
+                chunk.end_idx,
+                chunk.token_count
+            ))
+
+            if self._row_of is not None:
+                self._row_of[chunk.chunk_id] = len(self) - 1
+            added += 1
+        return added
+
+    def _intern_doc(self, doc_id: str) -> int:
+        index = self._doc_index.get(doc_id)
+        if index is None:
+            index = self._doc_index[doc_id] = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+        return index
+
+    def _intern_meta(self, metadata: Dict) -> int:
+        key = _meta_key(metadata)
+        index = self._meta_index.get(key)
+        if index is None:
+            index = self._meta_index[key] = len(self.metadata)
+            # Stored in its JSON form, so a reloaded store returns the same values
+            self.metadata.append(json.loads(key))
+        return index
+
+    def __len__(self) -> int:
+        return self._base_len + len(self._tail_rows) // _WIDTH
+
+    def __getitem__(self, row: int) -> Chunk:
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(f"Chunk row {row} out of range")
+
+        if row < self._base_len:
+            doc, meta, start, end, tokens = self._rows[row].tolist()
+            text = _decode(self._texts, self._text_offsets, row)
+            chunk_id = _decode(self._ids, self._id_offsets, row)
+        else:
+            row -= self._base_len
+            doc, meta, start, end, tokens = self._tail_rows[row * _WIDTH:(row + 1) * _WIDTH]
+            text = _decode(self._tail_texts, self._tail_text_offsets, row)
+            chunk_id = _decode(self._tail_ids, self._tail_id_offsets, row)
+
+        return Chunk(
+            chunk_id=chunk_id,
+            doc_id=self.doc_ids[doc],
+            text=text,
+            start_idx=start,
+            end_idx=end,
+            metadata=dict(self.metadata[meta]),
+            token_count=tokens
+        )
+
+    def __iter__(self) -> Iterator[Chunk]:
+        """Chunks that have not been removed, in row order."""
+        for row in range(len(self)):
+            if row not in self._deleted:
+                yield self[row]
+
+    def chunk_id(self, row: int) -> str:
+        if row < self._base_len:
+            return _decode(self._ids, self._id_offsets, row)
+        return _decode(self._tail_ids, self._tail_id_offsets, row - self._base_len)
+
+    def get(self, chunk_id: str) -> Optional[Chunk]:
+        """Look a chunk up by id (the id -> row map is built on first use)."""
+        if self._row_of is None:
+            self._row_of = {
+                self.chunk_id(row): row for row in range(len(self)) if row not in self._deleted
+            }
+        row = self._row_of.get(chunk_id)
+        # A re-chunked document re-uses its chunk ids, so the map may point at a removed row
+        return None if row is None or row in self._deleted else self[row]
+
+    def _doc_column(self) -> np.ndarray:
+        tail = np.frombuffer(self._tail_rows, dtype=np.int64).reshape(-1, _WIDTH)[:, 0]
+        return np.concatenate([self._rows[:self._base_len, 0], tail])
+
+    def rows_of(self, doc_ids: Iterable[str]) -> np.ndarray:
+        """Rows of the chunks of `doc_ids` that have not been removed."""
+        docs = [self._doc_index[doc_id] for doc_id in doc_ids if doc_id in self._doc_index]
+        if not docs:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.flatnonzero(np.isin(self._doc_column(), docs))
+        return np.array([row for row in rows.tolist() if row not in self._deleted], dtype=np.int64)
+
+    def remove(self, doc_ids: Iterable[str]) -> np.ndarray:
+        """Mark the chunks of `doc_ids` deleted and return their rows."""
+        rows = self.rows_of(doc_ids)
+        self._deleted.update(rows.tolist())
+        return rows
+
+    def document_ids(self) -> Set[str]:
+        """Ids of documents with at least one chunk that has not been removed."""
+        if not self._deleted:
+            return set(self.doc_ids)
+        docs = self._doc_column()
+        live = np.ones(len(docs), dtype=bool)
+        live[list(self._deleted)] = False
+        return {self.doc_ids[doc] for doc in np.unique(docs[live]).tolist()}
+
+    def compact(self) -> np.ndarray:
+        """Drop the deleted rows, renumbering the rest in order.
+
+        Documents and metadata no live chunk refers to are dropped too. The
+        compacted store is kept in memory until the next `save`. Returns the
+        new row of every old row (-1 for deleted ones), to remap FAISS ids.
+        """
+        live = np.ones(len(self), dtype=bool)
+        live[list(self._deleted)] = False
+        remap = np.full(len(self), -1, dtype=np.int64)
+        remap[live] = np.arange(int(live.sum()), dtype=np.int64)
+
+        chunks = [self[row] for row in np.flatnonzero(live).tolist()]
+        self.doc_ids, self.metadata = [], []
+        self._doc_index, self._meta_index = {}, {}
+        self._row_of = None
+        self._deleted = set()
+        self._base_len = 0
+        self._rows = np.zeros((0, _WIDTH), dtype=np.int64)
+        self._texts = self._ids = b""
+        self._text_offsets = self._id_offsets = np.zeros(1, dtype=np.int64)
+        self._reset_tail()
+        self.add(chunks)
+        return remap
+
+    def save(self, root: Optional[Path] = None):
+        """Write the store to `root` and re-open it memory-mapped."""
+        self.root = Path(root) if root else self.root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        tail_rows = np.frombuffer(self._tail_rows, dtype=np.int64).reshape(-1, _WIDTH)
+        self._write_array("rows", np.concatenate([self._rows[:self._base_len], tail_rows]))
+        self._write_array("text_offsets", _merge_offsets(self._text_offsets, self._tail_text_offsets))
+        self._write_array("id_offsets", _merge_offsets(self._id_offsets, self._tail_id_offsets))
+        self._write_blob("texts.bin", self._texts, self._tail_texts)
+        self._write_blob("ids.bin", self._ids, self._tail_ids)
+        self._write_array("deleted", np.array(sorted(self._deleted), dtype=np.int64))
+
+        # Every file is replaced whole; docs.json holds the count and goes last
+        header = {"count": len(self), "doc_ids": self.doc_ids, "metadata": self.metadata}
+        tmp_path = self.root / "docs.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(header, f, ensure_ascii=False)
+        os.replace(tmp_path, self.root / "docs.json")
+
+        self.load()
+
+    def _write_array(self, name: str, values: np.ndarray):
+        tmp_path = self.root / f"{name}.npy.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, values)
+        os.replace(tmp_path, self.root / f"{name}.npy")
+
+    def _write_blob(self, filename: str, base, tail: bytearray):
+        tmp_path = self.root / f"{filename}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(base)
+            f.write(tail)
+        os.replace(tmp_path, self.root / filename)
+
+    def get_stats(self) -> Dict:
+        """Sizes of the store."""
+        return {
+            "num_chunks": len(self),
+            "num_documents": len(self.doc_ids),
+            "num_metadata": len(self.metadata),
+            "deleted_chunks": len(self._deleted),
+            "text_bytes": len(self._texts) + len(self._tail_texts),
+            "unsaved_chunks": len(self._tail_rows) // _WIDTH
+        }
+
+
+def _meta_key(metadata: Dict) -> str:
+    return json.dumps(metadata, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _merge_offsets(base: np.ndarray, tail: array) -> np.ndarray:
+    return np.concatenate([base, np.frombuffer(tail, dtype=np.int64)[1:] + base[-1]])
+
+
+def _decode(blob, offsets, row: int) -> str:
+    return blob[offsets[row]:offsets[row + 1]].decode("utf-8")
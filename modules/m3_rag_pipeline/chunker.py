@@ -1,9 +1,12 @@
 # modules/m3_rag_pipeline/chunker.py
 """Document chunking strategies."""
 
-from typing import List, Optional, Dict
+from typing import Iterable, Iterator, List, Optional, Dict, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from dataclasses import dataclass
 import re
+import time
 from loguru import logger
 
 import sys
@@ -12,6 +15,32 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.settings import get_config
 
 
+# Pre-tokenizers that split on whitespace before the model sees the text, so
+# a sentence's token count is the sum of its words' counts
+_WORD_LEVEL_PRE_TOKENIZERS = {"BertPreTokenizer", "Whitespace", "WhitespaceSplit"}
+# Characters str.split() breaks on but tokenizers strip as control characters
+_SPLIT_MISMATCH_RE = re.compile(r'[\x1c-\x1f]')
+_WORD_CACHE_SIZE = 1_000_000
+# Simple sentence splitting: whitespace after terminal punctuation (group 1).
+# Matching the punctuation itself rather than looking behind for it lets the
+# regex engine skip ahead to candidate characters
+_SENTENCE_BREAK_RE = re.compile(r'[.!?](\s+)')
+# Common section patterns in academic papers: the newline before a header
+_SECTION_BREAK_RE = re.compile(
+    r'\n(?=(?:\d+\.?\s+)?(?:Abstract|Introduction|Related Work|Background|Method|Results|Discussion|Conclusion|References))',
+    re.IGNORECASE
+)
+
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Narrow text[start:end] to exclude leading and trailing whitespace."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
 @dataclass
 class Chunk:
     """A text chunk with metadata."""
@@ -27,92 +56,244 @@ class Chunk:
 class DocumentChunker:
     """Splits documents into chunks for embedding."""
     
-    def __init__(self, config=None):
+    def __init__(self, config=None, tokenizer=None):
         self.config = config or get_config()
         self.chunk_size = self.config.data.chunk_size
         self.chunk_overlap = self.config.data.chunk_overlap
         self.min_chunk_length = self.config.data.min_chunk_length
-        
+        self.token_chunking = self.config.data.token_chunking
+        self._tokenizer = tokenizer
+        self._word_tokens: Dict[str, int] = {}
+        self.stats = {"documents": 0, "chunks": 0, "chars": 0, "seconds": 0.0}
+    
+    @property
+    def tokenizer(self):
+        """Fast tokenizer of the embedding model, loaded on first use."""
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.config.model.embedding_model, use_fast=True)
+        return self._tokenizer
+    
     def chunk_document(
         self, 
         doc_id: str,
         text: str,
         metadata: Optional[Dict] = None
     ) -> List[Chunk]:
-        """Chunk a single document using sliding window."""
-        metadata = metadata or {}
-        chunks = []
+        """Chunk a single document using sliding window.
         
+        `start_idx`/`end_idx` are the offsets in `text` of the chunk's first
+        and last sentence, so `text[start_idx:end_idx]` is the chunked source.
+        """
+        if self.token_chunking:
+            return self.chunk_document_tokens(doc_id, text, metadata)
+        
+        metadata = metadata or {}
+        return self._pack_chars(doc_id, text, self._sentence_spans(text), metadata)
+    
+    def _pack_chars(
+        self,
+        doc_id: str,
+        text: str,
+        spans: List[Tuple[int, int]],
+        metadata: Dict,
+        chunk_prefix: Optional[str] = None
+    ) -> List[Chunk]:
         # Estimate tokens (rough approximation: 1 token ≈ 4 chars)
-        char_chunk_size = self.chunk_size * 4
-        char_overlap = self.chunk_overlap * 4
+        sized = [(start, end, end - start) for start, end in spans]
+        return self._pack_spans(
+            doc_id, text, sized, self.chunk_size * 4, self.chunk_overlap * 4, metadata,
+            chunk_prefix=chunk_prefix
+        )
+    
+    def _pack_spans(
+        self,
+        doc_id: str,
+        text: str,
+        spans: List[Tuple[int, int, int]],
+        budget: int,
+        overlap: int,
+        metadata: Dict,
+        exact: bool = False,
+        chunk_prefix: Optional[str] = None
+    ) -> List[Chunk]:
+        """Pack (start, end, size) sentence spans into overlapping chunks.
         
-        # Split into sentences first for cleaner boundaries
-        sentences = self._split_sentences(text)
+        The window is a deque: after each chunk only the trailing spans under
+        `overlap` stay, so every span is appended and dropped once. With
+        `exact`, sizes are token counts, `token_count` is their sum and the
+        overlap is trimmed until the next span fits the budget. Chunk ids are
+        `{chunk_prefix}_chunk_{i}`, the prefix defaulting to `doc_id`.
+        """
+        chunk_prefix = chunk_prefix or doc_id
+        chunks = []
+        window = deque()
+        window_size = 0
         
-        current_chunk = []
-        current_length = 0
-        chunk_start = 0
-        chunk_idx = 0
+        def emit():
+            chunk_text = ' '.join(text[start:end] for start, end, _ in window)
+            if len(chunk_text) >= self.min_chunk_length:
+                chunks.append(Chunk(
+                    chunk_id=f"{chunk_prefix}_chunk_{len(chunks)}",
+                    doc_id=doc_id,
+                    text=chunk_text,
+                    start_idx=window[0][0],
+                    end_idx=window[-1][1],
+                    metadata=metadata.copy(),
+                    token_count=window_size if exact else len(chunk_text) // 4
+                ))
         
-        for sentence in sentences:
-            sentence_len = len(sentence)
-            
-            if current_length + sentence_len > char_chunk_size and current_chunk:
-                # Save current chunk
-                chunk_text = ' '.join(current_chunk)
-                if len(chunk_text) >= self.min_chunk_length:
-                    chunk = Chunk(
-                        chunk_id=f"{doc_id}_chunk_{chunk_idx}",
-                        doc_id=doc_id,
-                        text=chunk_text,
-                        start_idx=chunk_start,
-                        end_idx=chunk_start + len(chunk_text),
-                        metadata=metadata.copy(),
-                        token_count=len(chunk_text) // 4
-                    )
-                    chunks.append(chunk)
-                    chunk_idx += 1
+        for span in spans:
+            size = span[2]
+            if window_size + size > budget and window:
+                emit()
                 
                 # Start new chunk with overlap
-                overlap_chars = 0
-                overlap_sentences = []
-                for s in reversed(current_chunk):
-                    if overlap_chars + len(s) < char_overlap:
-                        overlap_sentences.insert(0, s)
-                        overlap_chars += len(s)
-                    else:
+                kept = 0
+                kept_size = 0
+                for _, _, prev_size in reversed(window):
+                    if kept_size + prev_size >= overlap:
                         break
+                    kept += 1
+                    kept_size += prev_size
+                for _ in range(len(window) - kept):
+                    window.popleft()
+                window_size = kept_size
                 
-                current_chunk = overlap_sentences
-                current_length = overlap_chars
-                chunk_start = chunk_start + len(chunk_text) - overlap_chars
+                if exact:
+                    # Overlap never pushes a chunk past the budget
+                    while window and window_size + size > budget:
+                        window_size -= window.popleft()[2]
             
-            current_chunk.append(sentence)
-            current_length += sentence_len
+            window.append(span)
+            window_size += size
         
-        # Don't forget last chunk
-        if current_chunk:
-            chunk_text = ' '.join(current_chunk)
-            if len(chunk_text) >= self.min_chunk_length:
-                chunk = Chunk(
-                    chunk_id=f"{doc_id}_chunk_{chunk_idx}",
-                    doc_id=doc_id,
-                    text=chunk_text,
-                    start_idx=chunk_start,
-                    end_idx=chunk_start + len(chunk_text),
-                    metadata=metadata.copy(),
-                    token_count=len(chunk_text) // 4
-                )
-                chunks.append(chunk)
+        if window:
+            emit()
         
         return chunks
     
+    def _token_budget(self) -> int:
+        """Tokens available for text once the model's special tokens are added."""
+        max_length = min(self.chunk_size, self.tokenizer.model_max_length)
+        return max_length - self.tokenizer.num_special_tokens_to_add()
+    
+    def _sentence_token_counts(self, sentences: List[str], text: str) -> List[int]:
+        """Exact token count of each sentence, without special tokens."""
+        backend = getattr(self.tokenizer, "backend_tokenizer", None)
+        if (backend is None
+                or type(backend.pre_tokenizer).__name__ not in _WORD_LEVEL_PRE_TOKENIZERS
+                or _SPLIT_MISMATCH_RE.search(text)):
+            # One batched call for the whole document
+            encoded = self.tokenizer(
+                sentences, add_special_tokens=False,
+                return_attention_mask=False, return_token_type_ids=False
+            )["input_ids"]
+            return [len(ids) for ids in encoded]
+        
+        # Word-level tokenizer: only words not seen before are tokenized
+        counts = self._word_tokens
+        if len(counts) > _WORD_CACHE_SIZE:
+            counts.clear()
+        lookup = counts.__getitem__
+        totals = []
+        pending = []
+        for i, sentence in enumerate(sentences):
+            try:
+                totals.append(sum(map(lookup, sentence.split())))
+            except KeyError:
+                totals.append(0)
+                pending.append(i)
+        
+        if pending:
+            unseen = set().union(*(sentences[i].split() for i in pending)).difference(counts)
+            new_words = list(unseen)
+            encoded = backend.encode_batch(new_words, add_special_tokens=False)
+            counts.update(zip(new_words, (len(e.ids) for e in encoded)))
+            for i in pending:
+                totals[i] = sum(map(lookup, sentences[i].split()))
+        return totals
+    
+    def _tokenized_pieces(
+        self, text: str, spans: List[Tuple[int, int]], budget: int
+    ) -> List[Tuple[int, int, int]]:
+        """(start, end, token count) per sentence, splitting sentences longer than `budget`."""
+        sentences = [text[start:end] for start, end in spans]
+        pieces = []
+        for (start, end), count in zip(spans, self._sentence_token_counts(sentences, text)):
+            if count <= budget:
+                pieces.append((start, end, count))
+            else:
+                pieces.extend(self._split_long_sentence(text, start, end, budget))
+        return pieces
+    
+    def _split_long_sentence(
+        self, text: str, start: int, end: int, budget: int
+    ) -> List[Tuple[int, int, int]]:
+        """Cut an over-budget sentence at word starts into spans of at most `budget` tokens."""
+        offsets = self.tokenizer(
+            text[start:end], add_special_tokens=False, return_offsets_mapping=True
+        )["offset_mapping"]
+        
+        pieces = []
+        first = 0
+        while first < len(offsets):
+            last = min(first + budget, len(offsets))
+            if last < len(offsets):
+                # Back off to a token that begins a word, so no word is split
+                cut = last
+                while cut > first + 1 and offsets[cut][0] == offsets[cut - 1][1]:
+                    cut -= 1
+                if cut > first + 1:
+                    last = cut
+            piece_start, piece_end = _strip_span(
+                text, start + offsets[first][0], start + offsets[last - 1][1]
+            )
+            if piece_end > piece_start:
+                pieces.append((piece_start, piece_end, last - first))
+            first = last
+        return pieces
+    
+    def chunk_document_tokens(
+        self,
+        doc_id: str,
+        text: str,
+        metadata: Optional[Dict] = None
+    ) -> List[Chunk]:
+        """Chunk a document to an exact token budget of the embedding model.
+        
+        Sentences are packed while their token counts fit `chunk_size` (less
+        the model's special tokens); overlap is `chunk_overlap` tokens of
+        trailing sentences. For tokenizers that pre-split on whitespace
+        (BERT/MPNet-style) counts are summed from a per-word cache, so only
+        unseen words reach the tokenizer; others tokenize each document's
+        sentences in one batch. `token_count` is the sum of sentence counts,
+        which equals the chunk's own count for word-level tokenizers.
+        """
+        metadata = metadata or {}
+        budget = self._token_budget()
+        pieces = self._tokenized_pieces(text, self._sentence_spans(text), budget)
+        return self._pack_spans(
+            doc_id, text, pieces, budget, self.chunk_overlap, metadata, exact=True
+        )
+    
+    def _sentence_spans(self, text: str, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(start, end) of each sentence in `text[start:end]`, without surrounding whitespace."""
+        end = len(text) if end is None else end
+        spans = []
+        for match in _SENTENCE_BREAK_RE.finditer(text, start, end):
+            spans.append((start, match.start(1)))
+            start = match.end(1)
+        spans.append((start, end))
+        
+        # Breaks swallow all whitespace, so only the ends of the text need trimming
+        spans[0] = _strip_span(text, *spans[0])
+        spans[-1] = _strip_span(text, *spans[-1])
+        return [(start, end) for start, end in spans if end > start]
+    
     def _split_sentences(self, text: str) -> List[str]:
         """Split text into sentences."""
-        # Simple sentence splitting
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
+        return [text[start:end] for start, end in self._sentence_spans(text)]
     
     def chunk_by_sections(
         self,
@@ -120,73 +301,219 @@ class DocumentChunker:
         text: str,
         metadata: Optional[Dict] = None
     ) -> List[Chunk]:
-        """Chunk by detecting section headers."""
+        """Chunk by detecting section headers.
+        
+        Sections are found in one scan and handled as spans of `text`; chunk
+        metadata records each section's title and `section_start`/`section_end`
+        offsets, and chunk offsets are positions in the whole document.
+        """
         metadata = metadata or {}
         chunks = []
         
-        # Common section patterns in academic papers
-        section_pattern = r'\n(?=(?:\d+\.?\s+)?(?:Abstract|Introduction|Related Work|Background|Method|Results|Discussion|Conclusion|References))'
-        
-        sections = re.split(section_pattern, text, flags=re.IGNORECASE)
-        
-        for idx, section in enumerate(sections):
-            section = section.strip()
-            if len(section) < self.min_chunk_length:
+        for idx, (start, end) in enumerate(self._section_spans(text)):
+            if end - start < self.min_chunk_length:
                 continue
             
-            # Extract section title if present
-            lines = section.split('\n')
-            section_title = lines[0][:100] if lines else f"Section {idx}"
-            
-            # If section is too long, sub-chunk it
-            if len(section) > self.chunk_size * 4:
-                sub_chunks = self.chunk_document(
-                    doc_id=doc_id,
-                    text=section,
-                    metadata={**metadata, "section": section_title}
-                )
-                # Update chunk IDs
-                for i, sc in enumerate(sub_chunks):
-                    sc.chunk_id = f"{doc_id}_sec{idx}_chunk_{i}"
-                chunks.extend(sub_chunks)
-            else:
-                chunk = Chunk(
-                    chunk_id=f"{doc_id}_sec{idx}",
-                    doc_id=doc_id,
-                    text=section,
-                    start_idx=0,
-                    end_idx=len(section),
-                    metadata={**metadata, "section": section_title},
-                    token_count=len(section) // 4
-                )
-                chunks.append(chunk)
+            # Extract section title: its first line
+            line_end = text.find('\n', start, end)
+            section_title = text[start:end if line_end == -1 else line_end][:100]
+            section_metadata = {
+                **metadata, "section": section_title, "section_start": start, "section_end": end
+            }
+            chunks.extend(self._chunk_section(doc_id, idx, text, start, end, section_metadata))
         
         return chunks
     
+    def _section_spans(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) of each section, split at the newline before a header and stripped."""
+        spans = []
+        start = 0
+        for match in _SECTION_BREAK_RE.finditer(text):
+            spans.append(_strip_span(text, start, match.start()))
+            start = match.end()
+        spans.append(_strip_span(text, start, len(text)))
+        return spans
+    
+    def _chunk_section(
+        self,
+        doc_id: str,
+        idx: int,
+        text: str,
+        start: int,
+        end: int,
+        metadata: Dict
+    ) -> List[Chunk]:
+        """One chunk for a section that fits, otherwise sliding-window sub-chunks of its span."""
+        sentences = self._sentence_spans(text, start, end)
+        if self.token_chunking:
+            budget = self._token_budget()
+            pieces = self._tokenized_pieces(text, sentences, budget)
+            token_count = sum(tokens for _, _, tokens in pieces)
+            fits = token_count <= budget
+        else:
+            token_count = (end - start) // 4
+            fits = end - start <= self.chunk_size * 4
+        
+        if fits:
+            return [Chunk(
+                chunk_id=f"{doc_id}_sec{idx}",
+                doc_id=doc_id,
+                text=text[start:end],
+                start_idx=start,
+                end_idx=end,
+                metadata=metadata,
+                token_count=token_count
+            )]
+        
+        # If section is too long, sub-chunk it
+        prefix = f"{doc_id}_sec{idx}"
+        if self.token_chunking:
+            return self._pack_spans(
+                doc_id, text, pieces, budget, self.chunk_overlap, metadata,
+                exact=True, chunk_prefix=prefix
+            )
+        return self._pack_chars(doc_id, text, sentences, metadata, chunk_prefix=prefix)
+    
+    def chunk_doc(self, doc: Dict, by_sections: bool = False) -> List[Chunk]:
+        """Chunk a document dict (`arxiv_id`/`id`, `full_text`/`text`, `title`, `authors`)."""
+        doc_id = doc.get("arxiv_id", doc.get("id", "unknown"))
+        text = _doc_text(doc)
+        metadata = {
+            "title": doc.get("title", ""),
+            "authors": doc.get("authors", []),
+            "arxiv_id": doc_id
+        }
+        
+        if by_sections:
+            return self.chunk_by_sections(doc_id, text, metadata)
+        return self.chunk_document(doc_id, text, metadata)
+    
     def chunk_batch(
         self,
-        documents: List[Dict],
-        by_sections: bool = False
+        documents: Iterable[Dict],
+        by_sections: bool = False,
+        workers: Optional[int] = None
     ) -> List[Chunk]:
-        """Chunk multiple documents."""
-        all_chunks = []
-        
-        for doc in documents:
-            doc_id = doc.get("arxiv_id", doc.get("id", "unknown"))
-            text = doc.get("full_text", doc.get("text", ""))
-            metadata = {
-                "title": doc.get("title", ""),
-                "authors": doc.get("authors", []),
-                "arxiv_id": doc_id
-            }
+        """Chunk multiple documents.
+        
+        `documents` may be any iterable of dicts, including a `ShardedCorpus`,
+        which is then scanned sequentially without loading it into memory.
+        """
+        return list(self.iter_chunks(documents, by_sections, workers))
+    
+    def iter_chunks(
+        self,
+        documents: Iterable[Dict],
+        by_sections: bool = False,
+        workers: Optional[int] = None
+    ) -> Iterator[Chunk]:
+        """Chunk documents lazily, in a process pool when `workers` > 1.
+        
+        Chunks are yielded in document order either way. Throughput of the
+        run is logged at the end and kept in `get_stats()`.
+        """
+        workers = workers or self.config.data.chunk_workers
+        self.stats = {"documents": 0, "chunks": 0, "chars": 0, "seconds": 0.0}
+        start = time.perf_counter()
+        
+        if workers <= 1:
+            batches = (([doc], self.chunk_doc(doc, by_sections)) for doc in documents)
+        else:
+            batches = self._iter_parallel(documents, by_sections, workers)
+        
+        for docs, chunks in batches:
+            self.stats["documents"] += len(docs)
+            self.stats["chars"] += sum(len(_doc_text(doc)) for doc in docs)
+            self.stats["chunks"] += len(chunks)
+            yield from chunks
+        
+        self.stats["seconds"] = time.perf_counter() - start
+        stats = self.get_stats()
+        logger.info(
+            f"Created {stats['chunks']} chunks from {stats['documents']} documents "
+            f"in {stats['seconds']:.1f}s ({stats['docs_per_sec']:.1f} docs/s, "
+            f"{stats['ms_per_doc']:.1f} ms/doc, {stats['mb_per_sec']:.1f} MB/s)"
+        )
+    
+    def _iter_parallel(
+        self,
+        documents: Iterable[Dict],
+        by_sections: bool,
+        workers: int
+    ) -> Iterator[Tuple[List[Dict], List[Chunk]]]:
+        """Chunk size-balanced batches of documents in a process pool, in input order.
+        
+        Consecutive documents are grouped until they hold `chunk_task_chars`
+        characters, so tasks cost about the same however uneven the papers
+        are. At most `2 * workers` tasks are in flight and later results are
+        buffered until the earlier ones arrive.
+        """
+        tasks = enumerate(_size_batches(documents, self.config.data.chunk_task_chars))
+        
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(self.config, self._tokenizer)
+        ) as pool:
+            pending = {}
             
-            if by_sections:
-                chunks = self.chunk_by_sections(doc_id, text, metadata)
-            else:
-                chunks = self.chunk_document(doc_id, text, metadata)
+            def submit_next():
+                task = next(tasks, None)
+                if task is not None:
+                    seq, docs = task
+                    pending[pool.submit(_chunk_docs, docs, by_sections)] = (seq, docs)
             
-            all_chunks.extend(chunks)
-        
-        logger.info(f"Created {len(all_chunks)} chunks from {len(documents)} documents")
-        return all_chunks
+            for _ in range(2 * workers):
+                submit_next()
+            
+            buffered = {}
+            next_seq = 0
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    seq, docs = pending.pop(future)
+                    submit_next()
+                    buffered[seq] = (docs, future.result())
+                while next_seq in buffered:
+                    yield buffered.pop(next_seq)
+                    next_seq += 1
+    
+    def get_stats(self) -> Dict:
+        """Throughput of the last `chunk_batch`/`iter_chunks` run."""
+        stats = dict(self.stats)
+        seconds = stats["seconds"] or 1e-9
+        stats["docs_per_sec"] = stats["documents"] / seconds
+        stats["ms_per_doc"] = 1000 * seconds / max(stats["documents"], 1)
+        stats["chunks_per_sec"] = stats["chunks"] / seconds
+        stats["mb_per_sec"] = stats["chars"] / seconds / (1 << 20)
+        return stats
+
+
+def _doc_text(doc: Dict) -> str:
+    return doc.get("full_text", doc.get("text", ""))
+
+
+def _size_batches(documents: Iterable[Dict], max_chars: int) -> Iterator[List[Dict]]:
+    """Group consecutive documents into batches of about `max_chars` characters."""
+    batch = []
+    chars = 0
+    for doc in documents:
+        batch.append(doc)
+        chars += len(_doc_text(doc))
+        if chars >= max_chars:
+            yield batch
+            batch = []
+            chars = 0
+    if batch:
+        yield batch
+
+
+# Chunker of a pool worker process, built once by the pool initializer
+_worker_chunker: Optional[DocumentChunker] = None
+
+
+def _init_worker(config, tokenizer) -> None:
+    global _worker_chunker
+    _worker_chunker = DocumentChunker(config, tokenizer)
+
 
+def _chunk_docs(docs: List[Dict], by_sections: bool) -> List[Chunk]:
+    return [chunk for doc in docs for chunk in _worker_chunker.chunk_doc(doc, by_sections)]
@@ -1,9 +1,12 @@
 # modules/m3_rag_pipeline/embedder.py
-"""Embedding generation using sentence-transformers."""
+"""Embedding generation using sentence-transformers or an exported ONNX model."""
 
+import multiprocessing
+import os
 import numpy as np
-from typing import List, Union, Optional
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Union, Optional
 from tqdm import tqdm
 from loguru import logger
 
@@ -11,6 +14,31 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.settings import get_config
+from .embedding_backends import EmbeddingBackend, get_backend
+from .embedding_cache import EmbeddingCache, QueryEmbeddingCache, text_key
+
+
+_worker_embedder = None
+
+
+def _init_worker(model_name: str, config, threads: int):
+    """Load the model once per pool process, with a fixed number of intra-op threads."""
+    global _worker_embedder
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    config.model.embedding_threads = threads
+    config.model.embedding_workers = 1
+    config.model.embedding_cache = False  # The parent looks up and stores cached embeddings
+    _worker_embedder = EmbeddingGenerator(model_name, config)
+    _worker_embedder.load_model()
+
+
+def _encode_shard(texts: List[str], batch_size: int, normalize: bool) -> np.ndarray:
+    return _worker_embedder._encode(texts, batch_size, False, normalize)
+
+
+def _worker_dimension() -> int:
+    return _worker_embedder.get_dimension()
 
 
 class EmbeddingGenerator:
@@ -19,53 +47,305 @@ class EmbeddingGenerator:
     def __init__(self, model_name: Optional[str] = None, config=None):
         self.config = config or get_config()
         self.model_name = model_name or self.config.model.embedding_model
-        self.model = None
+        self.backend = get_backend(self.config.model.embedding_backend)
+        self.model_id = self.backend.model_id(self.model_name, self.config)
+        self.model: Optional[EmbeddingBackend] = None
         self.embedding_dim = None
+        self._caches: Dict[bool, EmbeddingCache] = {}
+        self.query_cache = QueryEmbeddingCache(
+            self.config.model.query_cache_size, self.config.model.query_cache_ttl
+        )
+        self._pool: Optional[ProcessPoolExecutor] = None
         
     def load_model(self):
         """Load the embedding model."""
-        logger.info(f"Loading embedding model: {self.model_name}")
-        self.model = SentenceTransformer(self.model_name)
-        self.embedding_dim = self.model.get_sentence_embedding_dimension()
+        logger.info(f"Loading embedding model: {self.model_name} ({self.backend.name} backend)")
+        self.model = self.backend(self.model_name, self.config)
+        self.query_cache.clear()
+        self.embedding_dim = self.model.get_dimension()
         logger.info(f"Embedding dimension: {self.embedding_dim}")
         
-    def embed_text(self, text: str) -> np.ndarray:
-        """Embed a single text."""
-        if self.model is None:
-            self.load_model()
-        return self.model.encode(text, convert_to_numpy=True)
+    def get_cache(self, normalize: bool = False) -> Optional[EmbeddingCache]:
+        """Persistent cache for this model, backend and normalization (None if disabled)."""
+        if not self.config.model.embedding_cache:
+            return None
+        if normalize not in self._caches:
+            self._caches[normalize] = EmbeddingCache(
+                self.model_id,
+                normalize,
+                dtype=self.config.model.embedding_cache_dtype,
+                flush_rows=self.config.model.embedding_cache_flush
+            )
+        return self._caches[normalize]
+        
+    def embed_text(self, text: str, normalize: bool = False) -> np.ndarray:
+        """Embed a single text (e.g. a search query); recent ones are served from memory."""
+        embedding = self.query_cache.get((text, normalize))
+        if embedding is None:
+            embedding = self.embed_batch([text], show_progress=False, normalize=normalize)[0]
+            self.query_cache.put((text, normalize), embedding)
+        return embedding
     
     def embed_batch(
         self, 
         texts: List[str],
         batch_size: int = 32,
-        show_progress: bool = True
+        show_progress: bool = True,
+        normalize: bool = False
     ) -> np.ndarray:
-        """Embed multiple texts."""
+        """Embed multiple texts.
+        
+        Texts found in the embedding cache are not encoded again, and a text
+        repeated within `texts` is encoded once.
+        """
+        cache = self.get_cache(normalize)
+        if cache is None or not texts:
+            return self._encode(texts, batch_size, show_progress, normalize)
+        
+        keys = [text_key(text) for text in texts]
+        cached, found = cache.get_many(keys)
+        if found.all():
+            return cached
+        
+        # Send each missing text to the model once and scatter the results back in order
+        missing = {}
+        for i in np.flatnonzero(~found).tolist():
+            missing.setdefault(keys[i], texts[i])
+        encoded = self._encode(list(missing.values()), batch_size, show_progress, normalize)
+        cache.put_many(list(missing), encoded)
+        
+        embeddings = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        if found.any():
+            embeddings[found] = cached
+        position = {key: i for i, key in enumerate(missing)}
+        embeddings[~found] = encoded[[position[keys[i]] for i in np.flatnonzero(~found).tolist()]]
+        return embeddings
+    
+    def _encode(self, texts: List[str], batch_size: int, show_progress: bool, normalize: bool) -> np.ndarray:
+        if self.config.model.embedding_workers > 1 and len(texts) > 1:
+            return self._encode_parallel(texts, batch_size, show_progress, normalize)
         if self.model is None:
             self.load_model()
         
+        token_budget = self.config.model.embedding_batch_tokens
+        if token_budget > 0 and len(texts) > 1:
+            return self._encode_bucketed(texts, token_budget, show_progress, normalize)
+        
         embeddings = self.model.encode(
             texts,
             batch_size=batch_size,
             show_progress_bar=show_progress,
-            convert_to_numpy=True
+            normalize_embeddings=normalize
         )
         
         return embeddings
     
+    def _encode_bucketed(
+        self,
+        texts: List[str],
+        token_budget: int,
+        show_progress: bool,
+        normalize: bool
+    ) -> np.ndarray:
+        """Encode texts sorted by token length, in batches padded to at most `token_budget` tokens.
+        
+        Short texts go in large batches and long ones in small batches, so
+        little compute is spent on padding; results are returned in input order.
+        """
+        lengths = self.token_lengths(texts)
+        order = np.argsort(-lengths, kind="stable")
+        
+        batches = []
+        start = 0
+        while start < len(order):
+            # The first text of a batch is its longest, so it sets the padded length
+            size = max(1, token_budget // max(1, lengths[order[start]]))
+            batches.append(order[start:start + size])
+            start += size
+        
+        embeddings = None
+        for batch in tqdm(batches, desc="Batches", disable=not show_progress):
+            encoded = self.model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+                normalize_embeddings=normalize
+            )
+            if embeddings is None:
+                embeddings = np.empty((len(texts), encoded.shape[1]), dtype=encoded.dtype)
+            embeddings[batch] = encoded
+        
+        return embeddings
+    
+    def _encode_parallel(
+        self,
+        texts: List[str],
+        batch_size: int,
+        show_progress: bool,
+        normalize: bool
+    ) -> np.ndarray:
+        """Encode shards of `texts` in the worker pool, each worker running its own model.
+        
+        At most `2 * workers` shards are in flight and rows are placed by
+        position, so results come back in input order.
+        """
+        pool = self._get_pool()
+        workers = self.config.model.embedding_workers
+        shard_size = max(1, min(self.config.model.embedding_shard_size, -(-len(texts) // workers)))
+        shards = iter(range(0, len(texts), shard_size))
+        
+        embeddings = None
+        pending = {}
+        
+        def submit_next():
+            start = next(shards, None)
+            if start is not None:
+                shard = texts[start:start + shard_size]
+                pending[pool.submit(_encode_shard, shard, batch_size, normalize)] = start
+        
+        try:
+            for _ in range(2 * workers):
+                submit_next()
+            with tqdm(total=len(texts), desc="Embedding", disable=not show_progress) as progress:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        start = pending.pop(future)
+                        encoded = future.result()
+                        submit_next()
+                        if embeddings is None:
+                            embeddings = np.empty((len(texts), encoded.shape[1]), dtype=encoded.dtype)
+                        embeddings[start:start + len(encoded)] = encoded
+                        progress.update(len(encoded))
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise
+        
+        return embeddings
+    
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """Drop a pool whose worker died (e.g. killed for memory); the next call starts a new one."""
+        logger.error("An embedding worker died; the pool will be restarted on the next call")
+        pool.shutdown(wait=False, cancel_futures=True)
+        if self._pool is pool:
+            self._pool = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            workers = self.config.model.embedding_workers
+            threads = self.config.model.embedding_worker_threads or max(1, (os.cpu_count() or 1) // workers)
+            logger.info(f"Starting {workers} embedding workers with {threads} threads each")
+            # Spawned, not forked: a fork of a process already running torch threads can deadlock
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.config, threads)
+            )
+        return self._pool
+    
+    def close_pool(self):
+        """Stop the embedding worker processes (an in-process model stays loaded)."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+    
+    def token_lengths(self, texts: List[str]) -> np.ndarray:
+        """Tokens per text as the model sees them (with special tokens, truncated)."""
+        if self.model is None:
+            self.load_model()
+        input_ids = self.model.tokenizer(
+            texts,
+            truncation=True,
+            max_length=self.model.max_seq_length,
+            return_attention_mask=False,
+            return_token_type_ids=False
+        )["input_ids"]
+        return np.fromiter((len(ids) for ids in input_ids), dtype=np.int64, count=len(texts))
+    
     def embed_chunks(
         self,
         chunks: List,  # List[Chunk]
-        batch_size: int = 32
+        batch_size: int = 32,
+        out_path: Optional[Path] = None
     ) -> np.ndarray:
-        """Embed chunk objects."""
+        """Embed chunk objects (streamed to an .npy file at `out_path` if given)."""
         texts = [chunk.text for chunk in chunks]
+        if out_path is not None:
+            return self.embed_to_file(texts, out_path, batch_size)
         return self.embed_batch(texts, batch_size)
     
+    def embed_to_file(
+        self,
+        texts: List[str],
+        out_path: Path,
+        batch_size: int = 32,
+        normalize: bool = False,
+        show_progress: bool = True
+    ) -> np.ndarray:
+        """Embed texts into an .npy file, in order, a window at a time.
+        
+        Only one window of embeddings is held in memory, so corpora larger
+        than RAM can be embedded; returns the file memory-mapped read-only.
+        """
+        workers = max(1, self.config.model.embedding_workers)
+        window = 8 * workers * self.config.model.embedding_shard_size
+        out = None
+        with tqdm(total=len(texts), desc="Embedding", disable=not show_progress) as progress:
+            for start in range(0, len(texts), window):
+                embeddings = self.embed_batch(
+                    texts[start:start + window], batch_size, show_progress=False, normalize=normalize
+                )
+                if out is None:
+                    out = np.lib.format.open_memmap(
+                        out_path, mode="w+", dtype=np.float32, shape=(len(texts), embeddings.shape[1])
+                    )
+                out[start:start + len(embeddings)] = embeddings
+                out.flush()
+                progress.update(len(embeddings))
+        if out is None:
+            out = np.lib.format.open_memmap(
+                out_path, mode="w+", dtype=np.float32, shape=(0, self.get_dimension())
+            )
+        del out
+        return np.load(out_path, mmap_mode="r")
+    
+    def save_cache(self):
+        """Write embeddings cached since the last save."""
+        for cache in self._caches.values():
+            cache.save()
+    
+    def get_cache_stats(self) -> Dict:
+        """Embedding cache size and hit rate, over both normalization settings."""
+        stats = {"entries": 0, "hits": 0, "misses": 0, "bytes": 0}
+        for cache in self._caches.values():
+            for key, value in cache.get_stats().items():
+                if key in stats:
+                    stats[key] += value
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+    
+    def get_query_cache_stats(self) -> Dict:
+        """In-memory query cache size and hit rate."""
+        return self.query_cache.get_stats()
+    
     def get_dimension(self) -> int:
-        """Get embedding dimension."""
+        """Get embedding dimension.
+        
+        With `embedding_workers` > 1 it is asked of a worker rather than
+        loading the model in this process, which then only loads it if it
+        embeds single texts (e.g. queries) itself.
+        """
         if self.embedding_dim is None:
-            self.load_model()
+            if self.config.model.embedding_workers > 1:
+                pool = self._get_pool()
+                try:
+                    self.embedding_dim = pool.submit(_worker_dimension).result()
+                except BrokenProcessPool:
+                    self._discard_pool(pool)
+                    raise
+            else:
+                self.load_model()
         return self.embedding_dim
 
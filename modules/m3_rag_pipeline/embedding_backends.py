@@ -0,0 +1,259 @@
+# modules/m3_rag_pipeline/embedding_backends.py
+"""Embedding backends: sentence-transformers on PyTorch, or an exported ONNX Runtime model."""
+
+import json
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Type
+
+import numpy as np
+from tqdm import tqdm
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import MODEL_DIR
+
+
+class EmbeddingBackend(ABC):
+    """What EmbeddingGenerator needs from an embedding model.
+
+    Backends expose a Hugging Face `tokenizer`, the `max_seq_length` texts
+    are truncated to, `encode` returning float32 rows in input order and
+    `get_dimension`. `model_id` names the vectors a backend produces, and
+    keys the embedding cache and the index manifest.
+    """
+
+    name = ""
+
+    def __init__(self, model_name: str, config):
+        self.model_name = model_name
+        self.config = config
+        self.tokenizer = None
+        self.max_seq_length = 512
+
+    @classmethod
+    def model_id(cls, model_name: str, config) -> str:
+        return model_name
+
+    @abstractmethod
+    def encode(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = False
+    ) -> np.ndarray:
+        """Embed `texts`, returning float32 rows in input order."""
+
+    @abstractmethod
+    def get_dimension(self) -> int:
+        """Length of the embedding vectors."""
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """The full-precision PyTorch model, through sentence-transformers."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str, config):
+        super().__init__(model_name, config)
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if config.model.embedding_threads > 0:
+            torch.set_num_threads(config.model.embedding_threads)
+        self.model = SentenceTransformer(model_name)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+
+    def encode(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = False
+    ) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True,
+            normalize_embeddings=normalize_embeddings
+        )
+
+    def get_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+class ONNXBackend(EmbeddingBackend):
+    """A sentence-transformers model exported to ONNX, run with ONNX Runtime on CPU.
+
+    Needs only onnxruntime and transformers (for the tokenizer) at run time.
+    The model is exported by `export_onnx` on first use if it is not found
+    in the export directory; that step needs torch and sentence-transformers.
+    With `embedding_onnx_quantize` the dynamically int8-quantized copy is loaded,
+    made from an existing fp32 export if there is one.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, config):
+        super().__init__(model_name, config)
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The onnx embedding backend requires the 'onnxruntime' package")
+        from transformers import AutoTokenizer
+
+        quantize = config.model.embedding_onnx_quantize
+        export_dir = onnx_export_dir(model_name, config)
+        model_path = export_dir / ("model_int8.onnx" if quantize else "model.onnx")
+        if not model_path.exists():
+            if quantize and (export_dir / "export.json").exists():
+                # A complete fp32 export (export.json is written last): only the int8 copy is missing
+                quantize_onnx(export_dir)
+            else:
+                export_onnx(model_name, export_dir, quantize=quantize)
+
+        with open(export_dir / "export.json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta["model_name"] != model_name:
+            raise ValueError(f"ONNX export at {export_dir} is of {meta['model_name']}, not {model_name}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if config.model.embedding_threads > 0:
+            options.intra_op_num_threads = config.model.embedding_threads
+        logger.info(f"Loading ONNX embedding model: {model_path}")
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(export_dir))
+        self.max_seq_length = meta["max_seq_length"]
+        self.dim = meta["dim"]
+
+    @classmethod
+    def model_id(cls, model_name: str, config) -> str:
+        # Quantized (and, marginally, exported) vectors differ from the PyTorch ones
+        return f"{model_name}+onnx{'-int8' if config.model.embedding_onnx_quantize else ''}"
+
+    def encode(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = False
+    ) -> np.ndarray:
+        # Like SentenceTransformer.encode: batches of similar length, results in input order
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in tqdm(range(0, len(texts), batch_size), desc="Batches", disable=not show_progress_bar):
+            batch = order[start:start + batch_size]
+            inputs = self.tokenizer(
+                [texts[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            feeds = {name: inputs[name].astype(np.int64) for name in self.input_names}
+            embeddings[batch] = self.session.run(None, feeds)[0]
+
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
+
+    def get_dimension(self) -> int:
+        return self.dim
+
+
+BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    ONNXBackend.name: ONNXBackend
+}
+
+
+def get_backend(name: str) -> Type[EmbeddingBackend]:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]
+
+
+def onnx_export_dir(model_name: str, config) -> Path:
+    """Where the ONNX export of `model_name` lives (ModelConfig.embedding_onnx_dir if set)."""
+    if config.model.embedding_onnx_dir:
+        return Path(config.model.embedding_onnx_dir)
+    return MODEL_DIR / "onnx" / re.sub(r"[^\w.-]+", "_", model_name)
+
+
+def export_onnx(model_name: str, output_dir: Path, quantize: bool = True, opset: int = 14) -> Path:
+    """Export a sentence-transformers model to ONNX, with its pooling and normalization.
+
+    Writes model.onnx, the tokenizer files, export.json and, with `quantize`,
+    model_int8.onnx. Needs torch and sentence-transformers; the directory can
+    then be copied to machines that only have onnxruntime.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Exporting {model_name} to ONNX in {output_dir}")
+    model = SentenceTransformer(model_name, device="cpu").eval()
+    tokenizer = model.tokenizer
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in tokenizer.model_input_names]
+
+    class SentenceEmbedding(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(dict(zip(input_names, inputs)))["sentence_embedding"]
+
+    sample = tokenizer(["An example sentence.", "A second, longer example sentence."],
+                       padding=True, return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["sentence_embedding"] = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            SentenceEmbedding(model),
+            tuple(sample[name] for name in input_names),
+            str(output_dir / "model.onnx"),
+            input_names=input_names,
+            output_names=["sentence_embedding"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    tokenizer.save_pretrained(str(output_dir))
+
+    meta = {
+        "model_name": model_name,
+        "max_seq_length": model.max_seq_length,
+        "dim": model.get_sentence_embedding_dimension(),
+        "inputs": input_names,
+        "opset": opset
+    }
+    with open(output_dir / "export.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    if quantize:
+        quantize_onnx(output_dir)
+    return output_dir
+
+
+def quantize_onnx(export_dir: Path) -> Path:
+    """Dynamic int8 quantization of an exported model's weights (model.onnx -> model_int8.onnx)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    export_dir = Path(export_dir)
+    output_path = export_dir / "model_int8.onnx"
+    quantize_dynamic(
+        str(export_dir / "model.onnx"),
+        str(output_path),
+        per_channel=True,
+        weight_type=QuantType.QInt8
+    )
+    logger.info(f"Saved int8 model to {output_path}")
+    return output_path
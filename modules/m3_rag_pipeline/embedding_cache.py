@@ -0,0 +1,298 @@
+# modules/m3_rag_pipeline/embedding_cache.py
+"""Persistent cache of text embeddings keyed by text hash."""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import INDEX_DIR
+
+
+_KEY_DTYPE = "S32"  # Hex blake2b-128 of the text
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest().encode("ascii")
+
+
+class EmbeddingCache:
+    """Embeddings of one (model, normalization) pair, stored by text hash.
+
+    Layout under `root/<model>-<raw|normalized>-<dtype>/`:
+        keys.bin        text hashes, one per row, append-only
+        vectors.bin     embedding rows in the same order, append-only
+        index_keys.npy  sorted hashes of the first `indexed` rows
+        index_rows.npy  their row numbers
+        meta.json       model, dimension and committed row count, written last
+
+    Lookups binary-search the memory-mapped sorted index; rows appended
+    since it was last rebuilt are held in a dict until it is rebuilt (once
+    they exceed a quarter of the indexed rows). New embeddings are kept in
+    memory until `save`, which runs automatically every `flush_rows` rows.
+    Saves hold a file lock and re-read the files, so processes sharing a
+    cache directory see each other's rows.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        normalize: bool = False,
+        root: Optional[Path] = None,
+        dtype: str = "float32",
+        flush_rows: int = 4096
+    ):
+        self.model_name = model_name
+        self.normalize = normalize
+        self.dtype = np.dtype(dtype)
+        self.flush_rows = flush_rows
+        name = re.sub(r"[^\w.-]+", "_", model_name)
+        self.root = (Path(root) if root else INDEX_DIR / "embeddings") / (
+            f"{name}-{'normalized' if normalize else 'raw'}-{self.dtype.name}"
+        )
+        self._lock = threading.Lock()
+        self.loaded = False
+
+        self.dim: Optional[int] = None
+        self._count = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._index_keys = np.zeros(0, dtype=_KEY_DTYPE)
+        self._index_rows = np.zeros(0, dtype=np.int64)
+        self._recent: Dict[bytes, int] = {}
+        self._pending_keys: List[bytes] = []
+        self._pending_vectors: List[np.ndarray] = []
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Map the saved cache (no-op if already loaded)."""
+        if self.loaded:
+            return
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        meta_path = self.root / "meta.json"
+        meta = {}
+        if meta_path.exists():
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            expected = {"model_name": self.model_name, "normalize": self.normalize, "dtype": self.dtype.name}
+            found = {k: meta.get(k) for k in expected}
+            if found != expected:
+                raise ValueError(f"Embedding cache at {self.root} was built with {found}, not {expected}")
+
+        self._count = meta.get("count", 0)
+        indexed = meta.get("indexed", 0)
+        self.dim = meta.get("dim", self.dim)
+        self._vectors = None
+        self._index_keys = np.zeros(0, dtype=_KEY_DTYPE)
+        self._index_rows = np.zeros(0, dtype=np.int64)
+        self._recent = {}
+        if self._count:
+            self._vectors = np.memmap(
+                self.root / "vectors.bin", dtype=self.dtype, mode="r", shape=(self._count, self.dim)
+            )
+            if indexed:
+                self._index_keys = np.load(self.root / "index_keys.npy", mmap_mode="r")
+                self._index_rows = np.load(self.root / "index_rows.npy", mmap_mode="r")
+            keys = np.memmap(self.root / "keys.bin", dtype=_KEY_DTYPE, mode="r", shape=(self._count,))
+            self._recent = {key: row for row, key in enumerate(keys[indexed:].tolist(), indexed)}
+        self.loaded = True
+
+    def __len__(self) -> int:
+        self.load()
+        return self._count + len(self._pending_keys)
+
+    def get_many(self, keys: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+        """Cached vectors of `keys`: (rows found, mask of the keys found).
+
+        Rows come back as float32 in the order of the found keys.
+        """
+        self.load()
+        with self._lock:
+            rows = np.full(len(keys), -1, dtype=np.int64)
+            if len(self._index_keys):
+                query = np.array(keys, dtype=_KEY_DTYPE)
+                pos = np.minimum(np.searchsorted(self._index_keys, query), len(self._index_keys) - 1)
+                found = self._index_keys[pos] == query
+                rows[found] = self._index_rows[pos[found]]
+            if self._recent:
+                for i in np.flatnonzero(rows < 0).tolist():
+                    rows[i] = self._recent.get(keys[i], -1)
+
+            found = rows >= 0
+            hits = rows[found]
+            vectors = np.empty((len(hits), self.dim or 0), dtype=np.float32)
+            saved = hits < self._count
+            if saved.any():
+                vectors[saved] = self._vectors[hits[saved]]
+            for i in np.flatnonzero(~saved).tolist():
+                vectors[i] = self._pending_vectors[hits[i] - self._count]
+
+            self.hits += len(hits)
+            self.misses += len(keys) - len(hits)
+        return vectors, found
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        """Add embeddings; written on the next `save`."""
+        self.load()
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            for key, vector in zip(keys, vectors):
+                if key in self._recent:
+                    continue
+                self._recent[key] = self._count + len(self._pending_keys)
+                self._pending_keys.append(key)
+                self._pending_vectors.append(np.array(vector, dtype=self.dtype))
+            pending = len(self._pending_keys)
+        if pending >= self.flush_rows:
+            self.save()
+
+    def save(self):
+        """Append new embeddings and rebuild the sorted index when enough rows are unindexed."""
+        with self._lock:
+            if not self._pending_keys:
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / "cache.lock", "w") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                self._append()
+
+    def _append(self):
+        # Another process may have appended since we loaded; rows go after the committed ones
+        meta_path = self.root / "meta.json"
+        meta = {}
+        if meta_path.exists():
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        count = meta.get("count", 0)
+        indexed = meta.get("indexed", 0)
+
+        # Drop rows left behind by an interrupted save before appending
+        for filename, row_bytes in (("keys.bin", np.dtype(_KEY_DTYPE).itemsize),
+                                    ("vectors.bin", self.dim * self.dtype.itemsize)):
+            path = self.root / filename
+            if path.exists() and path.stat().st_size > count * row_bytes:
+                os.truncate(path, count * row_bytes)
+        with open(self.root / "keys.bin", 'ab') as f:
+            f.write(b"".join(self._pending_keys))
+        with open(self.root / "vectors.bin", 'ab') as f:
+            f.write(np.stack(self._pending_vectors).tobytes())
+        count += len(self._pending_keys)
+
+        if count - indexed > max(self.flush_rows, indexed // 4):
+            keys = np.memmap(self.root / "keys.bin", dtype=_KEY_DTYPE, mode="r", shape=(count,))
+            order = np.argsort(keys, kind="stable")
+            self._write_array("index_keys", keys[order])
+            self._write_array("index_rows", order.astype(np.int64))
+            indexed = count
+
+        # The committed count makes the appended rows visible
+        meta = {
+            "model_name": self.model_name, "normalize": self.normalize, "dtype": self.dtype.name,
+            "dim": self.dim, "count": count, "indexed": indexed
+        }
+        tmp_path = self.root / "meta.json.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+        self._pending_keys = []
+        self._pending_vectors = []
+        self._open()
+        logger.info(f"Saved embedding cache with {count} embeddings to {self.root}")
+
+    def _write_array(self, name: str, values: np.ndarray):
+        tmp_path = self.root / f"{name}.npy.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, values)
+        os.replace(tmp_path, self.root / f"{name}.npy")
+
+    def get_stats(self) -> Dict:
+        """Size and hit rate since the cache was created."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": len(self) * (self.dim or 0) * self.dtype.itemsize
+        }
+
+
+class QueryEmbeddingCache:
+    """Bounded in-memory LRU of recent query embeddings, with a time-to-live.
+
+    Sits in front of the model (and the persistent cache) for `embed_text`,
+    so a repeated query costs a dict lookup. Safe to share between threads.
+    Callers get a copy, since search normalizes query vectors in place.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1].copy()
+
+    def put(self, key: Hashable, vector: np.ndarray):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), np.array(vector))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """Size and hit rate since the cache was created."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -5,13 +5,14 @@ import faiss
 import numpy as np
 import pickle
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict
+from typing import Iterable, List, Tuple, Optional, Dict, Set
 from loguru import logger
 
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.settings import get_config, INDEX_DIR
 from .chunker import Chunk
+from .chunk_store import ChunkStore
 
 
 class FAISSIndexer:
@@ -21,8 +22,7 @@ class FAISSIndexer:
         self.config = config or get_config()
         self.embedding_dim = embedding_dim
         self.index = None
-        self.chunks: List[Chunk] = []
-        self.id_to_chunk: Dict[str, Chunk] = {}
+        self.chunks = ChunkStore()
         self.index_dir = INDEX_DIR / "faiss"
         
     def create_index(self, index_type: Optional[str] = None):
@@ -31,10 +31,10 @@ class FAISSIndexer:
         
         if index_type == "IndexFlatIP":
             # Inner product (for normalized vectors = cosine similarity)
-            self.index = faiss.IndexFlatIP(self.embedding_dim)
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.embedding_dim))
         elif index_type == "IndexFlatL2":
             # L2 distance
-            self.index = faiss.IndexFlatL2(self.embedding_dim)
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.embedding_dim))
         elif index_type == "IndexIVFFlat":
             # IVF index for larger datasets
             quantizer = faiss.IndexFlatIP(self.embedding_dim)
@@ -42,6 +42,9 @@ class FAISSIndexer:
         else:
             raise ValueError(f"Unknown index type: {index_type}")
         
+        # A new index has no vectors, so no chunks either
+        self.chunks = ChunkStore()
+        
         logger.info(f"Created FAISS index: {index_type}")
         
     def add_vectors(
@@ -58,13 +61,12 @@ class FAISSIndexer:
         if normalize:
             faiss.normalize_L2(embeddings)
         
-        # Add to index
-        self.index.add(embeddings)
+        # Add to index; the FAISS id of a vector is its chunk's row in the store
+        ids = np.arange(len(self.chunks), len(self.chunks) + len(chunks), dtype=np.int64)
+        self.index.add_with_ids(embeddings, ids)
         
-        # Store chunk mappings
-        for chunk in chunks:
-            self.chunks.append(chunk)
-            self.id_to_chunk[chunk.chunk_id] = chunk
+        # Store chunks
+        self.chunks.add(chunks)
         
         logger.info(f"Added {len(chunks)} vectors to index (total: {self.index.ntotal})")
         
@@ -109,9 +111,7 @@ class FAISSIndexer:
         faiss.write_index(self.index, str(index_path))
         
         # Save chunks
-        chunks_path = self.index_dir / f"{name}_chunks.pkl"
-        with open(chunks_path, 'wb') as f:
-            pickle.dump(self.chunks, f)
+        self.chunks.save(self.index_dir / f"{name}_chunks")
         
         logger.info(f"Saved index to {self.index_dir}")
         
@@ -121,22 +121,98 @@ class FAISSIndexer:
         index_path = self.index_dir / f"{name}.faiss"
         self.index = faiss.read_index(str(index_path))
         
-        # Load chunks
-        chunks_path = self.index_dir / f"{name}_chunks.pkl"
-        with open(chunks_path, 'rb') as f:
-            self.chunks = pickle.load(f)
+        # Load chunks (memory-mapped), or the pickled list written by older versions
+        self.chunks = ChunkStore(self.index_dir / f"{name}_chunks")
+        if self.chunks.exists():
+            self.chunks.load()
+        else:
+            chunks_path = self.index_dir / f"{name}_chunks.pkl"
+            with open(chunks_path, 'rb') as f:
+                self.chunks.add(pickle.load(f))
+            logger.info(f"Loaded legacy {chunks_path.name}; it is converted on the next save")
         
-        # Rebuild mapping
-        self.id_to_chunk = {chunk.chunk_id: chunk for chunk in self.chunks}
+        if isinstance(self.index, faiss.IndexFlat):
+            self.index = _with_ids(self.index)
+            logger.info(f"Converted {index_path.name} to an id-mapped index; it is rewritten on the next save")
         
         logger.info(f"Loaded index with {self.index.ntotal} vectors")
         
+    def load_or_create(self, name: str = "academic_index") -> bool:
+        """Load the saved index to update it, or create a new one.
+        
+        Returns False if a new index was created: none was saved, or it holds
+        vectors of another dimension (the embedding model changed).
+        """
+        if (self.index_dir / f"{name}.faiss").exists():
+            self.load(name)
+            if self.index.d == self.embedding_dim:
+                return True
+            logger.warning(f"Saved index has dimension {self.index.d}, not {self.embedding_dim}; rebuilding")
+        self.create_index()
+        return False
+        
+    def remove_documents(self, doc_ids: Iterable[str]) -> int:
+        """Remove the vectors and chunks of documents; returns the number of chunks removed."""
+        rows = self.chunks.remove(doc_ids)
+        if len(rows):
+            self.index.remove_ids(rows)
+            logger.info(f"Removed {len(rows)} vectors from index (total: {self.index.ntotal})")
+        return len(rows)
+        
+    def compact(self, min_dead_ratio: float = 0.0) -> int:
+        """Drop the rows of removed chunks and renumber the vectors to match.
+        
+        Skipped unless at least `min_dead_ratio` of the chunk rows are dead.
+        Vectors whose row moved are re-added under their new id; those before
+        the first dead row keep theirs. Takes effect on disk with the next
+        `save`. Returns the number of rows dropped.
+        """
+        stats = self.chunks.get_stats()
+        dead = stats["deleted_chunks"]
+        if not dead or dead < min_dead_ratio * stats["num_chunks"]:
+            return 0
+        if not isinstance(self.index, faiss.IndexIDMap2):
+            logger.warning(f"Cannot renumber the vectors of a {type(self.index).__name__}; not compacting")
+            return 0
+        
+        ids = faiss.vector_to_array(self.index.id_map)
+        remap = self.chunks.compact()
+        moved = np.flatnonzero(remap[ids] != ids)
+        if len(moved):
+            vectors = self.index.index.reconstruct_n(0, self.index.ntotal)[moved]
+            self.index.remove_ids(ids[moved])
+            self.index.add_with_ids(vectors, remap[ids[moved]])
+        
+        logger.info(f"Compacted index: {dead} dead rows dropped, {len(moved)} vectors renumbered")
+        return dead
+        
+    def document_ids(self) -> Set[str]:
+        """Ids of the documents with vectors in the index."""
+        return self.chunks.document_ids()
+        
+    def get_chunk(self, chunk_id: str) -> Optional[Chunk]:
+        """Look up an indexed chunk by id."""
+        return self.chunks.get(chunk_id)
+    
     def get_stats(self) -> Dict:
         """Get index statistics."""
         return {
             "total_vectors": self.index.ntotal if self.index else 0,
             "embedding_dim": self.embedding_dim,
             "num_chunks": len(self.chunks),
+            "deleted_chunks": self.chunks.get_stats()["deleted_chunks"],
             "index_type": type(self.index).__name__ if self.index else None
         }
 
+
+def _with_ids(index):
+    """Move the vectors of a plain flat index (written by older versions) into an IndexIDMap2.
+    
+    Their implicit ids (positions) become explicit, so later removals leave
+    the ids of the remaining vectors unchanged.
+    """
+    vectors = index.reconstruct_n(0, index.ntotal)
+    index.reset()
+    mapped = faiss.IndexIDMap2(index)
+    mapped.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+    return mapped
@@ -0,0 +1,275 @@
+# modules/m3_rag_pipeline/ingest.py
+"""Streaming ingestion: extract -> clean -> chunk -> embed -> index."""
+
+import queue
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+from loguru import logger
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import get_config
+from .manifest import ManifestEntry, chunker_hash, content_hash
+
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries an exception from a stage thread to the consumer."""
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put with back-pressure; gives up (False) once the consumer has stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _prefetch(items: Iterable, maxsize: int) -> Iterator:
+    """Run `items` in a background thread, handing results over a bounded queue.
+
+    The queue bounds how far a stage can run ahead of the next one, so memory
+    stays at `maxsize` items per stage however large the input is.
+    """
+    q = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                if not _put(q, item, stop):
+                    break
+            else:
+                _put(q, _DONE, stop)
+        except BaseException as e:
+            _put(q, _Failure(e), stop)
+        finally:
+            if hasattr(items, "close"):
+                items.close()
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@dataclass
+class IngestStats:
+    """Counters for one ingestion run."""
+    extracted: int = 0
+    unchanged: int = 0
+    kept: int = 0
+    chunks: int = 0
+    batches: int = 0
+    removed: int = 0
+
+
+class IngestionPipeline:
+    """Streams PDFs through extraction, cleaning, chunking, embedding and indexing.
+
+    Each stage is a generator running in its own thread, connected to the next
+    by a bounded queue, and work moves in micro-batches of documents/chunks.
+    Memory is bounded by the queue sizes rather than by the corpus, and stages
+    overlap (e.g. extraction continues while a batch is being embedded).
+
+    The caller prepares and saves the indexes; `run` only appends to them.
+    The final stage runs on the calling thread, so a SQLite connection opened
+    there can be passed as `fts`.
+
+    With a `manifest`, extracted documents whose text, chunker settings and
+    embedding model match their manifest entry are skipped before cleaning.
+    The old chunks of the others are removed from the indexes before their
+    new ones are added, and the caller saves the manifest after the indexes.
+    """
+
+    def __init__(
+        self,
+        extractor,
+        chunker,
+        embedder,
+        indexer,
+        fts=None,
+        cleaner=None,
+        corpus=None,
+        by_sections: bool = False,
+        manifest=None,
+        config=None
+    ):
+        self.config = config or get_config()
+        self.extractor = extractor
+        self.cleaner = cleaner
+        self.corpus = corpus
+        self.chunker = chunker
+        self.embedder = embedder
+        self.indexer = indexer
+        self.fts = fts
+        self.by_sections = by_sections
+        self.manifest = manifest
+        self.doc_batch_size = self.config.data.ingest_doc_batch
+        self.chunk_batch_size = self.config.data.ingest_chunk_batch
+        self.queue_size = self.config.data.ingest_queue_size
+
+    def run(
+        self,
+        pdf_paths: List[str],
+        metadata_list: Optional[List[Dict]] = None,
+        progress: Optional[Callable[[IngestStats], None]] = None,
+        prune: bool = False
+    ) -> IngestStats:
+        """Ingest PDFs into the indexes. `progress` is called after each indexed batch.
+
+        With a manifest and `prune`, the PDFs are taken to be the whole corpus:
+        indexed documents that were not extracted in this run are removed.
+        """
+        stats = IngestStats()
+        seen: Set[str] = set()
+        changed: Dict[str, ManifestEntry] = {}
+
+        documents = _prefetch(self._extract(pdf_paths, metadata_list, stats), self.queue_size)
+        if self.manifest is not None:
+            documents = _prefetch(self._diff(documents, stats, seen, changed), self.queue_size)
+        documents = _prefetch(self._clean(documents, stats), self.queue_size)
+        chunk_batches = _prefetch(self._chunk(documents), self.queue_size)
+        embedded = _prefetch(self._embed(chunk_batches), self.queue_size)
+
+        replaced: Set[str] = set()
+        counts = Counter()
+        for chunks, embeddings in embedded:
+            if self.manifest is not None:
+                # Old chunks go before the first new ones of a document arrive
+                new_docs = {c.doc_id for c in chunks} - replaced
+                self._remove(new_docs)
+                replaced |= new_docs
+                counts.update(c.doc_id for c in chunks)
+            self.indexer.add_vectors(embeddings, chunks)
+            if self.fts is not None:
+                self.fts.add_chunks_batch(chunks)
+            stats.chunks += len(chunks)
+            stats.batches += 1
+            if progress:
+                progress(stats)
+
+        if self.cleaner is not None:
+            self.cleaner.save()  # Dedup index, written once per run rather than per batch
+        if self.manifest is not None:
+            # Changed documents that no longer produce chunks (e.g. now dropped by the cleaner)
+            self._remove(set(changed) - replaced)
+            if prune:
+                gone = (self.manifest.doc_ids() | self.indexer.document_ids()) - seen
+                self._remove(gone)
+                self.manifest.forget(gone)
+                stats.removed = len(gone)
+            for doc_id, entry in changed.items():
+                entry.num_chunks = counts[doc_id]
+            self.manifest.record(changed.values())
+
+        logger.info(
+            f"Ingested {stats.chunks} chunks from {stats.kept} documents "
+            f"({stats.extracted} extracted, {stats.unchanged} unchanged, {stats.removed} removed) "
+            f"in {stats.batches} batches"
+        )
+        return stats
+
+    def _remove(self, doc_ids: Set[str]):
+        """Remove documents' chunks from the indexes."""
+        if doc_ids:
+            self.indexer.remove_documents(doc_ids)
+            if self.fts is not None:
+                self.fts.delete_documents(doc_ids)
+
+    def _extract(self, pdf_paths, metadata_list, stats: IngestStats) -> Iterator[List[Dict]]:
+        docs = self.extractor.iter_extract(pdf_paths, metadata_list, keep_pages=False)
+        for batch in _batched(docs, self.doc_batch_size):
+            records = [
+                {
+                    "arxiv_id": doc.arxiv_id,
+                    "title": doc.title,
+                    "full_text": doc.full_text,
+                    "num_pages": doc.num_pages,
+                    "source_path": doc.source_path
+                }
+                for doc in batch
+            ]
+            if self.corpus is not None:
+                # Every document, so the corpus is complete even when the
+                # manifest skips it; the corpus only appends changed records
+                self.corpus.add(records)
+            stats.extracted += len(records)
+            yield records
+
+    def _diff(
+        self,
+        batches: Iterator[List[Dict]],
+        stats: IngestStats,
+        seen: Set[str],
+        changed: Dict[str, ManifestEntry]
+    ) -> Iterator[List[Dict]]:
+        """Drop documents the manifest says are indexed as they are; collect entries for the rest."""
+        build = (chunker_hash(self.chunker, self.by_sections), self.embedder.model_id)
+        for batch in batches:
+            saved = self.manifest.lookup(doc["arxiv_id"] for doc in batch)
+            todo = []
+            for doc in batch:
+                doc_id = doc["arxiv_id"]
+                seen.add(doc_id)
+                entry = ManifestEntry(doc_id, content_hash(doc), *build)
+                old = saved.get(doc_id)
+                if old is not None and (old.content_hash, old.chunker_hash, old.embedding_model) == (
+                    entry.content_hash, entry.chunker_hash, entry.embedding_model
+                ):
+                    stats.unchanged += 1
+                else:
+                    changed[doc_id] = entry
+                    todo.append(doc)
+            if todo:
+                yield todo
+
+    def _clean(self, batches: Iterator[List[Dict]], stats: IngestStats) -> Iterator[List[Dict]]:
+        for batch in batches:
+            if self.cleaner is not None:
+                # Dedup state carries over between batches, so later batches
+                # are still compared with earlier ones. Section chunking needs
+                # the line breaks that cleaning otherwise collapses.
+                batch = self.cleaner.process_batch(batch, keep_lines=self.by_sections)
+            stats.kept += len(batch)
+            if batch:
+                yield batch
+
+    def _chunk(self, batches: Iterator[List[Dict]]) -> Iterator[List]:
+        # One chunker run (and worker pool, with chunk_workers > 1) for the whole stream
+        documents = (doc for batch in batches for doc in batch)
+        chunks = self.chunker.iter_chunks(documents, self.by_sections)
+        yield from _batched(chunks, self.chunk_batch_size)
+
+    def _embed(self, chunk_batches: Iterator[List]) -> Iterator:
+        for chunks in chunk_batches:
+            embeddings = self.embedder.embed_batch([c.text for c in chunks], show_progress=False)
+            yield chunks, embeddings
@@ -0,0 +1,172 @@
+# modules/m3_rag_pipeline/manifest.py
+"""Document-level manifest of what the indexes were built from."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+from loguru import logger
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import INDEX_DIR
+
+
+# SQLite's default limit on host parameters is 999
+_LOOKUP_BATCH = 500
+
+
+@dataclass
+class ManifestEntry:
+    """How one document's indexed chunks were produced."""
+    doc_id: str
+    content_hash: str
+    chunker_hash: str
+    embedding_model: str
+    num_chunks: int = 0
+
+
+def content_hash(doc: Dict) -> str:
+    """Hash of the text and title a document is chunked from."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(doc.get("title", "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(doc.get("full_text", doc.get("text", "")).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def chunker_hash(chunker, by_sections: bool = False) -> str:
+    """Hash of the chunker settings that decide chunk boundaries."""
+    settings = {
+        "chunk_size": chunker.chunk_size,
+        "chunk_overlap": chunker.chunk_overlap,
+        "min_chunk_length": chunker.min_chunk_length,
+        "token_chunking": chunker.token_chunking,
+        "by_sections": by_sections
+    }
+    return hashlib.blake2b(json.dumps(settings, sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class IndexManifest:
+    """SQLite table of doc_id -> content hash, chunker hash and embedding model.
+
+    An index build compares each document with its entry and only chunks and
+    embeds documents whose entry is missing or differs. Updates are staged in
+    memory and written by `save`, which the caller runs after the indexes
+    themselves are saved, so an interrupted build never leaves entries for
+    chunks that were not written.
+    """
+
+    def __init__(self, name: str = "academic_index", root: Optional[Path] = None):
+        self.root = Path(root) if root else INDEX_DIR / "faiss"
+        self.db_path = self.root / f"{name}_manifest.db"
+        self.conn = None
+        self._lock = threading.Lock()
+        # doc_id -> new entry, or None to drop the entry
+        self._pending: Dict[str, Optional[ManifestEntry]] = {}
+
+    def connect(self):
+        """Open the database and create the table."""
+        if self.conn is not None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=10.0, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                chunker_hash TEXT NOT NULL,
+                embedding_model TEXT NOT NULL,
+                num_chunks INTEGER NOT NULL,
+                indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.conn.commit()
+
+    def lookup(self, doc_ids: Iterable[str]) -> Dict[str, ManifestEntry]:
+        """Saved entries of `doc_ids` (documents without one are left out)."""
+        self.connect()
+        doc_ids = list(doc_ids)
+        entries = {}
+        with self._lock:
+            for i in range(0, len(doc_ids), _LOOKUP_BATCH):
+                batch = doc_ids[i:i + _LOOKUP_BATCH]
+                rows = self.conn.execute(
+                    f"SELECT * FROM documents WHERE doc_id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for row in rows:
+                    entries[row["doc_id"]] = ManifestEntry(
+                        doc_id=row["doc_id"],
+                        content_hash=row["content_hash"],
+                        chunker_hash=row["chunker_hash"],
+                        embedding_model=row["embedding_model"],
+                        num_chunks=row["num_chunks"]
+                    )
+        return entries
+
+    def doc_ids(self) -> Set[str]:
+        """Ids of all saved entries."""
+        self.connect()
+        with self._lock:
+            return {row[0] for row in self.conn.execute("SELECT doc_id FROM documents")}
+
+    def record(self, entries: Iterable[ManifestEntry]):
+        """Stage new or changed entries until `save`."""
+        with self._lock:
+            for entry in entries:
+                self._pending[entry.doc_id] = entry
+
+    def forget(self, doc_ids: Iterable[str]):
+        """Stage the removal of entries until `save`."""
+        with self._lock:
+            for doc_id in doc_ids:
+                self._pending[doc_id] = None
+
+    def save(self):
+        """Write staged updates in one transaction."""
+        self.connect()
+        with self._lock:
+            upserts: List[tuple] = []
+            deletes: List[tuple] = []
+            for doc_id, entry in self._pending.items():
+                if entry is None:
+                    deletes.append((doc_id,))
+                else:
+                    upserts.append((
+                        entry.doc_id, entry.content_hash, entry.chunker_hash,
+                        entry.embedding_model, entry.num_chunks
+                    ))
+            with self.conn:
+                self.conn.executemany("DELETE FROM documents WHERE doc_id = ?", deletes)
+                self.conn.executemany("""
+                    INSERT OR REPLACE INTO documents
+                        (doc_id, content_hash, chunker_hash, embedding_model, num_chunks)
+                    VALUES (?, ?, ?, ?, ?)
+                """, upserts)
+            self._pending.clear()
+        logger.info(f"Saved manifest: {len(upserts)} documents updated, {len(deletes)} removed")
+
+    def clear(self):
+        """Drop every entry, e.g. when the indexes are rebuilt from scratch."""
+        self.connect()
+        with self._lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM documents")
+            self._pending.clear()
+        logger.info("Cleared index manifest")
+
+    def __len__(self) -> int:
+        self.connect()
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def close(self):
+        """Close the database connection."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
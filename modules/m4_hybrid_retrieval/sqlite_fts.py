@@ -3,7 +3,7 @@
 
 import sqlite3
 from pathlib import Path
-from typing import List, Tuple, Dict, Optional
+from typing import Iterable, List, Tuple, Dict, Optional
 from loguru import logger
 
 import sys
@@ -33,6 +33,8 @@ class SQLiteFTS:
         self.conn.row_factory = sqlite3.Row
         # Enable WAL mode for better concurrency
         self.conn.execute("PRAGMA journal_mode=WAL")
+        # Rows displaced by INSERT OR REPLACE fire the delete trigger too
+        self.conn.execute("PRAGMA recursive_triggers=ON")
         
     def create_tables(self):
         """Create FTS5 tables."""
@@ -76,6 +78,8 @@ class SQLiteFTS:
             )
         """)
         
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks(doc_id)")
+        
         # Triggers to keep FTS in sync
         cursor.execute("""
             CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
@@ -83,6 +87,20 @@ class SQLiteFTS:
                 VALUES (new.rowid, new.chunk_id, new.doc_id, new.text, new.section);
             END
         """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts(chunks_fts, rowid, chunk_id, doc_id, text, section)
+                VALUES ('delete', old.rowid, old.chunk_id, old.doc_id, old.text, old.section);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE ON chunks BEGIN
+                INSERT INTO chunks_fts(chunks_fts, rowid, chunk_id, doc_id, text, section)
+                VALUES ('delete', old.rowid, old.chunk_id, old.doc_id, old.text, old.section);
+                INSERT INTO chunks_fts(rowid, chunk_id, doc_id, text, section)
+                VALUES (new.rowid, new.chunk_id, new.doc_id, new.text, new.section);
+            END
+        """)
         
         self.conn.commit()
         logger.info("Created SQLite FTS tables")
@@ -137,6 +155,19 @@ class SQLiteFTS:
         self.conn.commit()
         logger.info(f"Added {len(chunks)} chunks to SQLite")
         
+    def delete_documents(self, doc_ids: Iterable[str]) -> int:
+        """Delete the chunks (and FTS entries) of documents; returns the number of chunks deleted."""
+        cursor = self.conn.cursor()
+        
+        params = [(doc_id,) for doc_id in doc_ids]
+        cursor.executemany("DELETE FROM chunks WHERE doc_id = ?", params)
+        deleted = cursor.rowcount
+        cursor.executemany("DELETE FROM documents WHERE doc_id = ?", params)
+        
+        self.conn.commit()
+        logger.info(f"Deleted chunks of {len(params)} documents from SQLite")
+        return deleted
+        
     def _sanitize_fts5_query(self, query: str) -> str:
         """Sanitize query string for FTS5 syntax.
         
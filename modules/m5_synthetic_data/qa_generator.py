@@ -140,13 +140,23 @@ Format as JSON array:
         self,
         papers: List[Dict],
         qa_per_paper: Optional[int] = None,
-        include_edge_cases: bool = True
+        include_edge_cases: bool = True,
+        corpus=None
     ) -> List[Dict]:
-        """Generate Q&A for multiple papers."""
+        """Generate Q&A for multiple papers.
+        
+        If a `corpus` (e.g. `ShardedCorpus`) is given, papers without `full_text`
+        have it read from the corpus by arxiv_id.
+        """
         qa_per_paper = qa_per_paper or self.config.data.qa_pairs_per_paper
         all_qa = []
         
         for paper in tqdm(papers, desc="Generating Q&A pairs"):
+            if corpus is not None and not paper.get("full_text"):
+                doc = corpus.get(paper.get("arxiv_id", ""))
+                if doc is not None:
+                    paper = {**paper, "full_text": doc["full_text"]}
+            
             # Regular Q&A
             qa_pairs = self.generate_qa_pairs(paper, qa_per_paper)
             all_qa.extend(qa_pairs)
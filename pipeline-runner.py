@@ -11,69 +11,105 @@ sys.path.append(str(Path(__file__).parent.parent))
 from config.settings import get_config, DATA_DIR, MODEL_DIR
 
 
-def run_data_collection(config, num_papers: int = 50, category: str = "cs.CL"):
-    """Step 1: Collect papers from arXiv."""
+def run_data_collection(config, num_papers: int = 50, category: str = "cs.CL", incremental: bool = False):
+    """Step 1: Collect papers from arXiv and extract their text into the corpus."""
     logger.info("=" * 50)
     logger.info("STEP 1: Data Collection")
     logger.info("=" * 50)
     
-    from modules.m2_data_collection import ArxivScraper, PDFExtractor, DataCleaner
+    from modules.m2_data_collection import ArxivScraper, PDFExtractor
     
-    # Scrape papers
+    # Scrape papers (incremental mode only fetches papers newer than the last run)
     scraper = ArxivScraper(config)
-    papers = scraper.search_papers(category=category, max_results=num_papers)
+    if incremental:
+        papers = scraper.harvest_incremental(category=category, max_results=num_papers)
+    else:
+        papers = scraper.search_papers(category=category, max_results=num_papers)
     scraper.download_pdfs(papers)
     scraper.save_metadata()
-    
-    # Extract text
-    extractor = PDFExtractor()
-    pdf_paths = [p.local_pdf_path for p in papers if p.local_pdf_path]
-    metadata = [{"title": p.title, "arxiv_id": p.arxiv_id, "abstract": p.abstract} for p in papers if p.local_pdf_path]
-    
-    documents = extractor.extract_batch(pdf_paths, metadata)
-    extractor.save_extracted()
-    
-    # Clean data
-    cleaner = DataCleaner()
-    docs_dict = [{"arxiv_id": d.arxiv_id, "title": d.title, "full_text": d.full_text} for d in documents]
-    cleaned_docs = cleaner.process_batch(docs_dict)
-    
-    logger.info(f"Collected and processed {len(cleaned_docs)} papers")
-    return cleaned_docs
+    if incremental:
+        scraper.save_delta(papers)
+    
+    # Extract text (only papers with an intact, valid PDF in the store) into the
+    # corpus read by synthetic data generation; the indexing step then reuses
+    # the extraction cache
+    extractor = PDFExtractor(scraper.store, config)
+    ready = [p for p in papers if p.local_pdf_path and scraper.store.has_valid(p.arxiv_id)]
+    pdf_paths = [p.local_pdf_path for p in ready]
+    metadata = [{"title": p.title, "arxiv_id": p.arxiv_id, "abstract": p.abstract} for p in ready]
+    extractor.save_extracted(documents=extractor.iter_extract(pdf_paths, metadata, keep_pages=False))
+    
+    logger.info(f"Collected {len(papers)} papers")
+    return papers
 
 
-def run_rag_indexing(config, documents: list):
-    """Step 2: Build RAG index."""
+def run_rag_indexing(config, papers: list, prune: bool = True):
+    """Step 2: Extract, clean, chunk, embed and index papers as one stream.
+    
+    The saved indexes are updated in place: only new and changed papers are
+    chunked and embedded, and with `prune` indexed papers missing from
+    `papers` are removed.
+    """
     logger.info("=" * 50)
     logger.info("STEP 2: RAG Indexing")
     logger.info("=" * 50)
     
-    from modules.m3_rag_pipeline import DocumentChunker, EmbeddingGenerator, FAISSIndexer
+    from modules.m2_data_collection import PDFExtractor, PDFStore, DataCleaner
+    from modules.m3_rag_pipeline import (
+        DocumentChunker, EmbeddingGenerator, FAISSIndexer, IndexManifest, IngestionPipeline
+    )
     from modules.m4_hybrid_retrieval import SQLiteFTS
     
-    # Chunk documents
-    chunker = DocumentChunker(config)
-    all_chunks = chunker.chunk_batch(documents)
-    
-    # Generate embeddings
-    embedder = EmbeddingGenerator(config=config)
-    embedder.load_model()
-    embeddings = embedder.embed_chunks(all_chunks)
+    # Only papers with an intact, valid PDF in the store
+    store = PDFStore()
+    ready = [p for p in papers if p.local_pdf_path and store.has_valid(p.arxiv_id)]
+    pdf_paths = [p.local_pdf_path for p in ready]
+    metadata = [{"title": p.title, "arxiv_id": p.arxiv_id, "abstract": p.abstract} for p in ready]
     
-    # Build FAISS index
+    extractor = PDFExtractor(store, config)
+    embedder = EmbeddingGenerator(config=config)  # The model loads on first use (in workers, if any)
     indexer = FAISSIndexer(embedder.get_dimension(), config)
-    indexer.create_index()
-    indexer.add_vectors(embeddings, all_chunks)
-    indexer.save("academic_index")
-    
-    # Build SQLite FTS
+    manifest = IndexManifest("academic_index")
     fts = SQLiteFTS()
     fts.connect()
-    fts.create_tables()
-    fts.add_chunks_batch(all_chunks)
+    if indexer.load_or_create("academic_index"):
+        fts.create_tables()
+    else:
+        # New index: whatever the FTS tables and manifest describe is gone
+        fts.clear_all_data()
+        manifest.clear()
+    corpus = extractor.open_corpus()
+    cleaner = DataCleaner(persistent=True, workers=config.data.clean_workers)  # Dedupe against earlier runs too
+    
+    pipeline = IngestionPipeline(
+        extractor,
+        DocumentChunker(config),
+        embedder,
+        indexer,
+        fts=fts,
+        cleaner=cleaner,
+        corpus=corpus,  # Extracted text is kept for synthetic data generation
+        manifest=manifest,
+        config=config
+    )
+    stats = pipeline.run(pdf_paths, metadata, prune=prune)
+    
+    indexer.compact(config.rag.index_compact_ratio)  # Drop chunks of removed and re-indexed papers
+    indexer.save("academic_index")
+    manifest.save()  # Only after the indexes it describes are saved
+    manifest.close()
+    embedder.save_cache()
+    embedder.close_pool()
+    cleaner.close()
     fts.close()
+    corpus.compact(config.data.corpus_compact_ratio)  # Drop records replaced by re-extracted papers
+    corpus.close()
     
-    logger.info(f"Indexed {len(all_chunks)} chunks")
+    logger.info(
+        f"Indexed {stats.chunks} chunks from {stats.kept} new or changed papers "
+        f"({stats.unchanged} unchanged, {stats.removed} removed)"
+    )
+    logger.info(f"Embedding cache hit rate: {embedder.get_cache_stats()['hit_rate']:.1%}")
     return indexer, embedder
 
 
@@ -83,21 +119,23 @@ def run_synthetic_generation(config, num_papers: int = 50, qa_per_paper: int = 5
     logger.info("STEP 3: Synthetic Data Generation")
     logger.info("=" * 50)
     
-    from modules.m2_data_collection import ArxivScraper
+    from modules.m2_data_collection import ArxivScraper, PDFExtractor
     from modules.m5_synthetic_data import QAGenerator, DatasetBuilder
     
     # Load paper metadata
     scraper = ArxivScraper(config)
-    papers = scraper.load_metadata()[:num_papers]
+    papers = scraper.load_metadata(limit=num_papers)
     
     papers_dict = [
         {"arxiv_id": p.arxiv_id, "title": p.title, "abstract": p.abstract}
         for p in papers
     ]
     
-    # Generate Q&A
+    # Generate Q&A (paper text is read from the extracted corpus)
     generator = QAGenerator(config)
-    qa_pairs = generator.generate_batch(papers_dict, qa_per_paper=qa_per_paper)
+    corpus = PDFExtractor(scraper.store, config).open_corpus()
+    qa_pairs = generator.generate_batch(papers_dict, qa_per_paper=qa_per_paper, corpus=corpus)
+    corpus.close()
     
     # Build dataset
     builder = DatasetBuilder(config)
@@ -202,8 +240,14 @@ def main():
                        default="all", help="Pipeline step to run")
     parser.add_argument("--papers", type=int, default=50, help="Number of papers to collect")
     parser.add_argument("--category", default="cs.CL", help="arXiv category")
+    parser.add_argument("--incremental", action="store_true",
+                       help="Only collect papers updated since the last harvest")
     parser.add_argument("--qa-per-paper", type=int, default=5, help="Q&A pairs per paper")
     parser.add_argument("--epochs", type=int, default=2, help="Training epochs")
+    parser.add_argument("--embedding-backend", choices=["torch", "onnx"],
+                       help="Embedding backend (default: ModelConfig.embedding_backend)")
+    parser.add_argument("--embedding-workers", type=int,
+                       help="Embedding processes for indexing (default: ModelConfig.embedding_workers)")
     
     args = parser.parse_args()
     config = get_config()
@@ -213,21 +257,25 @@ def main():
     config.data.arxiv_category = args.category
     config.data.qa_pairs_per_paper = args.qa_per_paper
     config.training.num_train_epochs = args.epochs
+    if args.embedding_backend:
+        config.model.embedding_backend = args.embedding_backend
+    if args.embedding_workers:
+        config.model.embedding_workers = args.embedding_workers
     
     logger.info("Starting Academic LLM Pipeline")
     logger.info(f"Step: {args.step}")
     
     if args.step in ["all", "collect"]:
-        documents = run_data_collection(config, args.papers, args.category)
+        papers = run_data_collection(config, args.papers, args.category, args.incremental)
         
     if args.step in ["all", "index"]:
         if args.step != "all":
-            # Load existing documents
+            # Load existing papers
             from modules.m2_data_collection import ArxivScraper
             scraper = ArxivScraper(config)
             papers = scraper.load_metadata()
-            documents = [{"arxiv_id": p.arxiv_id, "title": p.title} for p in papers]
-        run_rag_indexing(config, documents)
+        # An incremental harvest only returns new papers, so keep the rest indexed
+        run_rag_indexing(config, papers, prune=not args.incremental)
         
     if args.step in ["all", "synthetic"]:
         run_synthetic_generation(config, args.papers, args.qa_per_paper)